@@ -24,11 +24,11 @@ COPYING = """\
 
 from fakelargefile.errors import (
     NoContainingSegment, MemoryLimitError)
-from fakelargefile.fakelargefile import FakeLargeFile
+from fakelargefile.fakelargefile import FakeLargeFile, SEEK_DATA, SEEK_HOLE
 from fakelargefile.segment import (
     LiteralSegment, RepeatingSegment, HomogenousSegment)
 from fakelargefile.config import get_memory_limit, set_memory_limit
 
 __all__ = [
     "FakeLargeFile", "NoContainingSegment", "LiteralSegment",
-    "RepeatingSegment", "HomogenousSegment"]
+    "RepeatingSegment", "HomogenousSegment", "SEEK_DATA", "SEEK_HOLE"]
@@ -0,0 +1,170 @@
+'''
+Cooperative reading of a FakeLargeFile from an event loop
+'''
+
+from __future__ import absolute_import, division
+
+COPYING = """\
+    Copyright 2014 Lauritz Vesteraas Thaulow
+
+    This file is part of the FakeLargeFile python package.
+
+    FakeLargeFile is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License version 3,
+    as published by the Free Software Foundation.
+
+    FakeLargeFile is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU General Affero Public License
+    along with FakeLargeFile.  If not, see <http://www.gnu.org/licenses/>.
+    """
+
+from fakelargefile.errors import IncompleteReadError
+
+
+class AsyncFakeLargeFile(object):
+    """
+    Read a FakeLargeFile in steps of bounded size, for use in event loops.
+
+    The methods mirror those of ``asyncio.StreamReader``, but since they
+    may have to cover terabytes, they return generators which do the work
+    in steps of at most ``self.chunk_size`` bytes each. The caller can
+    hand control back to its event loop between the steps, with
+    whichever coroutine library it uses::
+
+        for piece in async_file.read(10 * 1024 ** 3):
+            sink.write(piece)
+            yield  # Let other tasks run
+
+    The position of the wrapped file is updated as the steps are taken, so
+    a read which is stopped early has only consumed what it has yielded.
+    """
+
+    chunk_size = 1024 ** 2
+
+    def __init__(self, flf, chunk_size=None):
+        """
+        Initialize an AsyncFakeLargeFile.
+
+        :param FakeLargeFile flf: The file to read from, starting at its
+            current position.
+        :param int chunk_size: The number of bytes to handle per step.
+            Defaults to ``AsyncFakeLargeFile.chunk_size``.
+
+        """
+        self.flf = flf
+        if chunk_size is not None:
+            self.chunk_size = chunk_size
+
+    def at_eof(self):
+        """
+        Return True if the position is at or beyond the end of the file.
+        """
+        return self.flf.size <= self.flf.pos
+
+    def read(self, n=-1):
+        """
+        Iterate over the pieces of the next n bytes.
+
+        :param int n: The number of bytes to read. If negative, which is
+            the default, read to the end of the file.
+        :returns: A generator of strings of at most self.chunk_size bytes,
+            which together are the bytes read.
+
+        """
+        flf = self.flf
+        stop = flf.size if n < 0 else min(flf.size, flf.pos + n)
+        while flf.pos < stop:
+            start = flf.pos
+            piece = flf[start:min(stop, start + self.chunk_size)]
+            flf.pos = start + len(piece)
+            yield piece
+
+    def readexactly(self, n):
+        """
+        Iterate over the pieces of exactly the next n bytes.
+
+        Unlike ``asyncio.StreamReader.readexactly``, this raises the error
+        at once if there are not enough bytes, without reading any.
+
+        :param int n: The number of bytes to read.
+        :raises IncompleteReadError: If fewer than n bytes are left. Its
+            ``partial`` attribute is empty.
+        :returns: A generator like the one from :py:meth:`read`.
+
+        """
+        if self.flf.size - self.flf.pos < n:
+            raise IncompleteReadError("", n)
+        return self.read(n)
+
+    def readline(self):
+        """
+        Iterate over the pieces of the next line, including the newline.
+
+        The newline is searched for one chunk at a time, so even a line of
+        terabytes takes many small steps.
+
+        :returns: A generator like the one from :py:meth:`read`. It yields
+            nothing at the end of the file.
+
+        """
+        flf = self.flf
+        while flf.pos < flf.size:
+            start = flf.pos
+            stop = min(flf.size, start + self.chunk_size)
+            try:
+                stop = flf.index("\n", start, stop, end_pos=True)
+            except ValueError:
+                pass
+            piece = flf[start:stop]
+            flf.pos = stop
+            yield piece
+            if piece.endswith("\n"):
+                return
+
+    def __iter__(self):
+        """
+        Iterate over the remaining lines, each as a single string.
+
+        Every line is read with :py:meth:`readline`, but joined before it
+        is yielded, so use readline directly for lines which may be long.
+        """
+        while not self.at_eof():
+            yield "".join(self.readline())
+
+    def finditer(self, string, start=0, stop=None, end_pos=False):
+        """
+        Iterate over indices of occurences of string, in steps.
+
+        This finds the same non-overlapping matches as
+        :py:meth:`fakelargefile.segmentchain.SegmentChain.finditer`, but
+        also yields None after searching each chunk of self.chunk_size
+        bytes, so the caller gets a chance to yield to its event loop even
+        where there are no matches for a long stretch.
+
+        :param str string: The string to search for.
+        :param int start: Where to start searching. Default is 0.
+        :param int stop: Where to stop searching. Default is the end of
+            the file.
+        :param bool end_pos: Yield the indices of the first byte after each
+            match instead of the indices of the beginning.
+
+        """
+        flf = self.flf
+        if stop is None:
+            stop = flf.size
+        pos = start
+        for chunk_start in xrange(start, stop, self.chunk_size):
+            chunk_stop = min(stop, chunk_start + self.chunk_size)
+            # Matches starting in the chunk may reach beyond it
+            for index in flf.finditer(
+                    string, max(pos, chunk_start),
+                    min(stop, chunk_stop + len(string) - 1)):
+                if chunk_stop <= index:
+                    break
+                pos = index + len(string)
+                yield pos if end_pos else index
+            yield None
@@ -0,0 +1,223 @@
+'''
+Structural comparison of segment chains
+'''
+
+from __future__ import absolute_import, division
+
+COPYING = """\
+    Copyright 2014 Lauritz Vesteraas Thaulow
+
+    This file is part of the FakeLargeFile python package.
+
+    FakeLargeFile is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License version 3,
+    as published by the Free Software Foundation.
+
+    FakeLargeFile is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU General Affero Public License
+    along with FakeLargeFile.  If not, see <http://www.gnu.org/licenses/>.
+    """
+
+
+def _spans(chain, start, stop):
+    """
+    Return the spans of the chain from start to stop.
+
+    Each span is a list [pos, size, key, offset, period, segment], where
+    key, offset and period come from the
+    :py:meth:`~fakelargefile.segment.abc.AbstractSegment.source` method of
+    the segment. The segment is kept so that the ids in the keys stay
+    unique while the spans are in use.
+    """
+    spans = []
+    if start == stop:
+        return spans
+    for segment in chain._part_iter(start):
+        if stop <= segment.start:
+            break
+        key, offset, period = segment.source()
+        pos = max(start, segment.start)
+        offset += pos - segment.start
+        size = min(stop, segment.stop) - pos
+        spans.append([pos, size, key, offset, period, segment])
+    return spans
+
+
+def _same(key_a, offset_a, key_b, offset_b, period):
+    """
+    Return True if the sources are equal at the given offsets.
+    """
+    if key_a != key_b:
+        return False
+    if period:
+        return (offset_a - offset_b) % period == 0
+    return offset_a == offset_b
+
+
+def _common_prefix(spans_a, spans_b):
+    """
+    Return the number of leading bytes known to be equal.
+    """
+    total = i = j = done_a = done_b = 0
+    while i < len(spans_a) and j < len(spans_b):
+        _, size_a, key_a, offset_a, period, _ = spans_a[i]
+        _, size_b, key_b, offset_b, _, _ = spans_b[j]
+        if not _same(key_a, offset_a + done_a, key_b, offset_b + done_b,
+                     period):
+            break
+        length = min(size_a - done_a, size_b - done_b)
+        total += length
+        done_a += length
+        done_b += length
+        if done_a == size_a:
+            i += 1
+            done_a = 0
+        if done_b == size_b:
+            j += 1
+            done_b = 0
+    return total
+
+
+def _common_suffix(spans_a, spans_b, limit):
+    """
+    Return the number of trailing bytes known to be equal, at most limit.
+    """
+    total = done_a = done_b = 0
+    i = len(spans_a) - 1
+    j = len(spans_b) - 1
+    while i >= 0 and j >= 0 and total < limit:
+        _, size_a, key_a, offset_a, period, _ = spans_a[i]
+        _, size_b, key_b, offset_b, _, _ = spans_b[j]
+        if not _same(key_a, offset_a + size_a - done_a,
+                     key_b, offset_b + size_b - done_b, period):
+            break
+        length = min(size_a - done_a, size_b - done_b, limit - total)
+        total += length
+        done_a += length
+        done_b += length
+        if done_a == size_a:
+            i -= 1
+            done_a = 0
+        if done_b == size_b:
+            j -= 1
+            done_b = 0
+    return total
+
+
+def _matching_blocks(spans_a, spans_b):
+    """
+    Return a list of (pos_a, pos_b, size) of bytes known to be equal.
+
+    The blocks are increasing in both positions. Each span of b is matched
+    greedily against the first span of a after the previous match which
+    shares its source.
+    """
+    candidates = {}
+    for span in spans_a:
+        candidates.setdefault(span[2], []).append(span)
+    first = dict.fromkeys(candidates, 0)
+    blocks = []
+    last_a = spans_a[0][0] if spans_a else 0
+    shift = (spans_b[0][0] if spans_b else 0) - last_a
+    for pos_b, size_b, key, offset_b, period, _ in spans_b:
+        spans = candidates.get(key, ())
+        stop_b = pos_b + size_b
+        # Skip the candidates which end before the last match for good
+        while first.get(key, 0) < len(spans):
+            pos_a, size_a = spans[first[key]][:2]
+            if last_a < pos_a + size_a:
+                break
+            first[key] += 1
+        index = first.get(key, 0)
+        while pos_b < stop_b and index < len(spans):
+            pos_a, size_a, _, offset_a = spans[index][:4]
+            start_a = max(pos_a, last_a)
+            if period:
+                # The first position in span a with the right phase, from
+                # where the previous match would continue if it fits, since
+                # any other choice leaves a change elsewhere to make up for
+                # the shift
+                if start_a <= pos_b - shift < pos_a + size_a:
+                    start_a = pos_b - shift
+                phase = offset_b - (offset_a + start_a - pos_a)
+                match_a = start_a + phase % period
+                match_b = pos_b
+            else:
+                # Where the source ranges of the spans overlap
+                source = max(offset_a + start_a - pos_a, offset_b)
+                match_a = pos_a + source - offset_a
+                match_b = pos_b + source - offset_b
+            length = min(pos_a + size_a - match_a, stop_b - match_b)
+            if length <= 0:
+                index += 1
+                continue
+            blocks.append((match_a, match_b, length))
+            last_a = match_a + length
+            shift = match_b - match_a
+            offset_b += match_b + length - pos_b
+            pos_b = match_b + length
+    return blocks
+
+
+def diff(chain_a, chain_b, max_compare_size=1024 ** 2):
+    """
+    Return the changes that turn chain_a into chain_b.
+
+    The segments of the two chains are compared by where their bytes come
+    from, without reading them: segments sharing a payload, a memory
+    mapping or a repeating pattern at the same offset are equal. This is
+    linear in the number of segments for chains derived from each other.
+    Where the structure differs, ranges of at most max_compare_size bytes
+    on both sides are compared byte by byte to trim equal bytes from the
+    ends of a change.
+
+    :returns: A list of (tag, start_a, stop_a, start_b, stop_b) tuples,
+        like the opcodes of :py:class:`difflib.SequenceMatcher` but without
+        the "equal" ones. The tag is "insert", "delete" or "replace".
+    """
+    spans_a = _spans(chain_a, 0, chain_a.size)
+    spans_b = _spans(chain_b, 0, chain_b.size)
+    prefix = _common_prefix(spans_a, spans_b)
+    suffix = _common_suffix(
+        spans_a, spans_b, min(chain_a.size, chain_b.size) - prefix)
+    stop_a = chain_a.size - suffix
+    stop_b = chain_b.size - suffix
+    blocks = _matching_blocks(
+        _spans(chain_a, prefix, stop_a), _spans(chain_b, prefix, stop_b))
+    blocks.append((stop_a, stop_b, 0))
+
+    ops = []
+    pos_a = pos_b = prefix
+    for match_a, match_b, length in blocks:
+        start_a, end_a, start_b, end_b = pos_a, match_a, pos_b, match_b
+        if (start_a < end_a and start_b < end_b and
+                end_a - start_a <= max_compare_size and
+                end_b - start_b <= max_compare_size):
+            string_a = chain_a[start_a:end_a]
+            string_b = chain_b[start_b:end_b]
+            common = 0
+            limit = min(len(string_a), len(string_b))
+            while common < limit and string_a[common] == string_b[common]:
+                common += 1
+            start_a += common
+            start_b += common
+            common = 0
+            limit = min(end_a - start_a, end_b - start_b)
+            while (common < limit and
+                   string_a[-1 - common] == string_b[-1 - common]):
+                common += 1
+            end_a -= common
+            end_b -= common
+        if start_a < end_a and start_b < end_b:
+            ops.append(("replace", start_a, end_a, start_b, end_b))
+        elif start_a < end_a:
+            ops.append(("delete", start_a, end_a, start_b, end_b))
+        elif start_b < end_b:
+            ops.append(("insert", start_a, end_a, start_b, end_b))
+        pos_a = match_a + length
+        pos_b = match_b + length
+    return ops
@@ -0,0 +1,133 @@
+'''
+CRC-32 arithmetic for checksumming segments without reading them
+
+The CRC-32 of a concatenation can be computed from the CRC-32s of its
+parts, with the same GF(2) matrix arithmetic as zlib's ``crc32_combine``.
+This makes the checksum of a string repeated N times take O(log N) steps.
+
+All CRC-32 values here are unsigned, like ``zlib.crc32(data) & 0xffffffff``.
+'''
+
+from __future__ import absolute_import, division
+
+COPYING = """\
+    Copyright 2014 Lauritz Vesteraas Thaulow
+
+    This file is part of the FakeLargeFile python package.
+
+    FakeLargeFile is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License version 3,
+    as published by the Free Software Foundation.
+
+    FakeLargeFile is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU General Affero Public License
+    along with FakeLargeFile.  If not, see <http://www.gnu.org/licenses/>.
+    """
+
+import zlib
+
+
+MASK = 0xffffffff
+
+# The reversed CRC-32 polynomial
+POLYNOMIAL = 0xedb88320
+
+
+def _matrix_times(matrix, vector):
+    """
+    Return the product of a GF(2) matrix and a vector of 32 bits.
+    """
+    result = 0
+    i = 0
+    while vector:
+        if vector & 1:
+            result ^= matrix[i]
+        vector >>= 1
+        i += 1
+    return result
+
+
+def _matrix_square(matrix):
+    """
+    Return the square of a GF(2) matrix.
+    """
+    return [_matrix_times(matrix, row) for row in matrix]
+
+
+def _zero_operators():
+    """
+    Return a list of operators, where item n appends 2**n zero bytes.
+
+    Each operator is a matrix which, applied to the CRC-32 register, gives
+    the register after that many zero bytes.
+    """
+    # One zero bit, squared three times to make one zero byte
+    operator = [POLYNOMIAL] + [1 << i for i in xrange(31)]
+    for _ in xrange(3):
+        operator = _matrix_square(operator)
+    operators = [operator]
+    for _ in xrange(63):
+        operators.append(_matrix_square(operators[-1]))
+    return operators
+
+
+_operators = []
+
+
+def crc32(data, value=0):
+    """
+    Return the unsigned CRC-32 of data, continuing from value.
+
+    :param data: A string or read-only buffer.
+    :param int value: The CRC-32 of the bytes before data.
+
+    """
+    return zlib.crc32(data, value) & MASK
+
+
+def crc32_combine(crc1, crc2, length2):
+    """
+    Return the CRC-32 of two concatenated byte strings.
+
+    :param int crc1: The CRC-32 of the first string.
+    :param int crc2: The CRC-32 of the second string.
+    :param int length2: The length of the second string.
+
+    """
+    if not _operators:
+        _operators.extend(_zero_operators())
+    # Move crc1 past length2 zero bytes, the effect of which cancels out
+    # with the initial and final complement of crc2
+    n = 0
+    while length2:
+        if length2 & 1:
+            crc1 = _matrix_times(_operators[n], crc1)
+        length2 >>= 1
+        n += 1
+    return crc1 ^ crc2
+
+
+def crc32_repeat(crc, length, count):
+    """
+    Return the CRC-32 of a byte string repeated count times.
+
+    This takes O(log count) steps.
+
+    :param int crc: The CRC-32 of the string.
+    :param int length: The length of the string.
+    :param int count: The number of repetitions.
+
+    """
+    result = 0
+    while count:
+        if count & 1:
+            result = crc32_combine(result, crc, length)
+        count >>= 1
+        if count:
+            crc = crc32_combine(crc, crc, length)
+            length *= 2
+    return result
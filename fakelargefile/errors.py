@@ -35,3 +35,19 @@ class MemoryLimitError(Exception):
     is raised.
     """
     pass
+
+
+class IncompleteReadError(EOFError):
+    """
+    Raised when fewer bytes are left than an exact read asks for.
+
+    Like ``asyncio.IncompleteReadError``, it has the attributes ``partial``,
+    the bytes which could be read, and ``expected``, the number of bytes
+    asked for.
+    """
+    def __init__(self, partial, expected):
+        super(IncompleteReadError, self).__init__(
+            "{} bytes read on a total of {} expected bytes".format(
+                len(partial), expected))
+        self.partial = partial
+        self.expected = expected
@@ -22,13 +22,33 @@ COPYING = """\
     along with FakeLargeFile.  If not, see <http://www.gnu.org/licenses/>.
     """
 
+import errno
+from functools import wraps
+import os
+
 from fakelargefile.config import get_memory_limit
 from fakelargefile.errors import MemoryLimitError
 from fakelargefile.segmentchain import SegmentChain
+from fakelargefile.segment.filebacked import FileBackedSegment
 from fakelargefile.segment.literal import LiteralSegment
 from fakelargefile.segment.repeating import RepeatingSegment
 
 
+SEEK_DATA = getattr(os, "SEEK_DATA", 3)
+SEEK_HOLE = getattr(os, "SEEK_HOLE", 4)
+
+
+def flushing(method):
+    """
+    Decorate a method so it flushes the write buffer before running.
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self.flush()
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
 class FakeLargeFile(SegmentChain):
     """
     A FakeLargeFile can mimic a very very large file.
@@ -72,11 +92,75 @@ class FakeLargeFile(SegmentChain):
     - creating files whose non-null content is much larger than the
       available storage space
 
+    Many small writes, like a logger writing one line at a time, would each
+    become a segment of their own. Give a write_buffer_size to collect
+    contiguous writes in a buffer instead, which becomes a single segment
+    when it is flushed. The buffer is flushed by :py:meth:`flush`, when it
+    grows beyond write_buffer_size bytes, by a write elsewhere in the file
+    and before any other method reads or changes the file. The size
+    attribute does not include the buffer until it is flushed.
+
     """
-    def __init__(self, segments=None):
-        super(FakeLargeFile, self).__init__(segments, "\x00")
+    def __init__(self, segments=None, search_cache=False,
+                 write_buffer_size=0):
         self.pos = 0
         self.softspace = 0
+        self.write_buffer_size = write_buffer_size
+        self.write_buffer = []
+        self.write_buffer_start = 0
+        self.write_buffer_length = 0
+        super(FakeLargeFile, self).__init__(segments, "\x00", search_cache)
+
+    @classmethod
+    def open_overlay(cls, path, **kwargs):
+        """
+        Return a FakeLargeFile with the content of a real file.
+
+        The file is memory mapped as a single FileBackedSegment, and all
+        changes are kept in memory as segments, so the file itself is never
+        modified. This makes it cheap to edit huge files: inserting a line
+        at the start of a 200 GB log only adds a segment. Use
+        :py:meth:`export` to write the result to a new file.
+
+        .. warning::
+
+           Don't export the result to the file it was opened from, or to
+           anything that changes that file while the overlay is in use.
+
+        :param str path: The path of the file.
+        :param kwargs: Passed on to the FakeLargeFile constructor.
+
+        """
+        if os.path.getsize(path):
+            return cls([FileBackedSegment(0, path)], **kwargs)
+        return cls(**kwargs)
+
+    # While writes are buffered the segments are out of date, so these
+    # SegmentChain methods flush the write buffer first. The lookups they
+    # use internally, like segment_containing and segment_iter, are left
+    # alone, as they run many times for each call of these.
+    finditer = flushing(SegmentChain.finditer)
+    parallel_finditer = flushing(SegmentChain.parallel_finditer)
+    rfinditer = flushing(SegmentChain.rfinditer)
+    index = flushing(SegmentChain.index)
+    rindex = flushing(SegmentChain.rindex)
+    insert = flushing(SegmentChain.insert)
+    delete = flushing(SegmentChain.delete)
+    overwrite = flushing(SegmentChain.overwrite)
+    append = flushing(SegmentChain.append)
+    append_literal = flushing(SegmentChain.append_literal)
+    replace_all = flushing(SegmentChain.replace_all)
+    export = flushing(SegmentChain.export)
+    export_gzip = flushing(SegmentChain.export_gzip)
+    pipe_to = flushing(SegmentChain.pipe_to)
+    save = flushing(SegmentChain.save)
+    next_data = flushing(SegmentChain.next_data)
+    next_hole = flushing(SegmentChain.next_hole)
+    crc32 = flushing(SegmentChain.crc32)
+    snapshot = flushing(SegmentChain.snapshot)
+    view = flushing(SegmentChain.view)
+    __len__ = flushing(SegmentChain.__len__)
+    __getitem__ = flushing(SegmentChain.__getitem__)
 
     def readline(self, size=None):
         """
@@ -88,6 +172,7 @@ class FakeLargeFile(SegmentChain):
             `len(s) >= size` when size is given.
 
         """
+        self.flush()
         start_pos = self.pos
         if size is None:
             max_end_pos = self.size
@@ -118,6 +203,7 @@ class FakeLargeFile(SegmentChain):
             after the self.pos + sizehint position.
 
         """
+        self.flush()
         if sizehint is None:
             sizehint = self.size - self.pos
         stop = self.pos + sizehint
@@ -142,16 +228,32 @@ class FakeLargeFile(SegmentChain):
         Implements the python file object seek functionality.
 
         It does not specify what to do if whence is not 0, 1 or 2. This method
-        will raise a ValueError in that case.
+        also accepts SEEK_DATA and SEEK_HOLE (3 and 4, as in ``os.lseek`` on
+        Linux), where null segments count as holes (see
+        :py:meth:`next_data`), and raises a ValueError for anything else.
+        Like ``os.lseek``, those raise an IOError with errno ENXIO if offset
+        is not inside the file, or if there is no data after it.
         """
+        self.flush()
         if whence == 0:
             self.pos = offset
         elif whence == 1:
             self.pos += offset
         elif whence == 2:
             self.pos = self.size + offset
+        elif whence in (SEEK_DATA, SEEK_HOLE):
+            pos = None
+            if 0 <= offset < self.size:
+                if whence == SEEK_DATA:
+                    pos = self.next_data(offset)
+                else:
+                    pos = self.next_hole(offset)
+            if pos is None:
+                raise IOError(errno.ENXIO, os.strerror(errno.ENXIO))
+            self.pos = pos
         else:
-            raise ValueError("Valid values for whence is 0, 1 or 2.")
+            raise ValueError(
+                "Valid values for whence is 0, 1, 2, SEEK_DATA or SEEK_HOLE.")
 
     def tell(self):
         """
@@ -169,6 +271,7 @@ class FakeLargeFile(SegmentChain):
             is the default, read until the end of the file.
 
         """
+        self.flush()
         if size is None:
             ret = self[self.pos:]
             self.pos = self.size
@@ -181,19 +284,55 @@ class FakeLargeFile(SegmentChain):
         """
         Write the string to the file at the current position.
 
-        Any existing bytes will be overwritten.
+        Any existing bytes will be overwritten, and the position is moved to
+        the end of the written string.
         """
-        if self.pos >= self.size:
-            self.insert_literal(self.pos, string)
+        if self.write_buffer_size:
+            if self.pos != self.write_buffer_start + self.write_buffer_length:
+                self.flush()
+                self.write_buffer_start = self.pos
+            self.write_buffer.append(string)
+            self.write_buffer_length += len(string)
+            self.pos += len(string)
+            if self.write_buffer_length >= self.write_buffer_size:
+                self.flush()
         else:
-            segment = LiteralSegment(self.pos, string)
-            self.overwrite(segment)
+            self._write(self.pos, string)
+            self.pos += len(string)
+
+    def _write(self, pos, string):
+        """
+        Write the string at the given position, bypassing the write buffer.
+        """
+        if not string:
+            return
+        if pos >= self.size:
+            self.insert_literal(pos, string)
+        else:
+            self.overwrite(LiteralSegment(pos, string))
 
     def flush(self):
         """
-        Do nothing, since there is no cache.
+        Write the contents of the write buffer to the segments.
+        """
+        if self.write_buffer:
+            string = "".join(self.write_buffer)
+            self.write_buffer = []
+            self.write_buffer_length = 0
+            self._write(self.write_buffer_start, string)
+        self.write_buffer_start = self.pos
+
+    @flushing
+    def diff(self, other):
+        """
+        Return the changes that turn this file into another one.
+
+        The write buffers of both are flushed first. See
+        :py:meth:`SegmentChain.diff`.
         """
-        pass
+        if isinstance(other, FakeLargeFile):
+            other.flush()
+        return super(FakeLargeFile, self).diff(other)
 
     def __iter__(self):
         """
@@ -220,6 +359,7 @@ class FakeLargeFile(SegmentChain):
         If size is given, the current position is unchanged after the
         operation, even if it is then past the end of the file.
         """
+        self.flush()
         if size is None:
             size = self.pos
         if self.size < size:
@@ -231,8 +371,13 @@ class FakeLargeFile(SegmentChain):
         """
         Write the sequence of strings to the file
 
-        Does not add newlines to each string in sequence.
+        Does not add newlines to each string in sequence. If there is a
+        write buffer, the strings are written to it one by one.
         """
+        if self.write_buffer_size:
+            for string in sequence:
+                self.write(string)
+            return
         lines = "".join(sequence)
         self.overwrite(LiteralSegment(self.pos, lines))
         self.pos += len(lines)
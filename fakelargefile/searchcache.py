@@ -0,0 +1,153 @@
+'''
+A cache of search results for a SegmentChain.
+'''
+
+from __future__ import absolute_import, division
+
+COPYING = """\
+    Copyright 2014 Lauritz Vesteraas Thaulow
+
+    This file is part of the FakeLargeFile python package.
+
+    FakeLargeFile is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License version 3,
+    as published by the Free Software Foundation.
+
+    FakeLargeFile is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU General Affero Public License
+    along with FakeLargeFile.  If not, see <http://www.gnu.org/licenses/>.
+    """
+
+from bisect import bisect, bisect_left, bisect_right
+
+
+class SearchCache(object):
+    """
+    Remember where strings were found in a SegmentChain.
+
+    For each search string the cache holds a sorted list of covered ranges
+    and a sorted list of positions. Within a covered range, the positions
+    are the start positions of *all* occurences of the string. Looking up
+    the next occurence from a covered position is then a binary search.
+
+    The covered ranges only ever tell where occurences *start*, so appending
+    to the chain never invalidates them. Other edits must be reported with
+    :py:meth:`invalidate`, which :py:class:`SegmentChain` does by itself.
+    """
+    def __init__(self):
+        """
+        Initialize an empty SearchCache instance.
+        """
+        self.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        """
+        Forget all search results.
+        """
+        self.entries = {}
+
+    @property
+    def hit_rate(self):
+        """
+        Return the fraction of lookups answered without searching.
+        """
+        lookups = self.hits + self.misses
+        if lookups:
+            return self.hits / lookups
+        else:
+            return 0.0
+
+    def index(self, chain, string, start, stop):
+        """
+        Return the index of the next occurence of string in chain.
+
+        Searches chain only from the end of the covered range containing
+        start, if any, and remembers the result.
+
+        :param SegmentChain chain: The chain to search.
+        :param str string: The string to search for.
+        :param int start: The position at which to start searching.
+        :param int stop: The position at which to stop searching.
+
+        If the string is not found, a ValueError will be raised.
+        """
+        starts, stops, positions = self.entries.setdefault(
+            string, ([], [], []))
+        search_start = start
+        i = bisect(starts, start) - 1
+        if 0 <= i and start < stops[i]:
+            j = bisect_left(positions, start)
+            if j < len(positions) and positions[j] < stops[i]:
+                self.hits += 1
+                if stop < positions[j] + len(string):
+                    raise ValueError()
+                return positions[j]
+            if stop - len(string) < stops[i]:
+                self.hits += 1
+                raise ValueError()
+            search_start = stops[i]
+        self.misses += 1
+        for index in chain.finditer(string, search_start, stop):
+            self.cover(string, search_start, index + 1, index)
+            return index
+        self.cover(string, search_start, stop - len(string) + 1)
+        raise ValueError()
+
+    def cover(self, string, start, stop, index=None):
+        """
+        Mark the range from start to stop as covered for string.
+
+        :param int index: The only position from start to stop where string
+            occurs, or None if there is no such position.
+        """
+        if stop <= start:
+            return
+        starts, stops, positions = self.entries.setdefault(
+            string, ([], [], []))
+        lo = bisect_left(stops, start)
+        hi = bisect_right(starts, stop)
+        if lo < hi:
+            start = min(start, starts[lo])
+            stop = max(stop, stops[hi - 1])
+        starts[lo:hi] = [start]
+        stops[lo:hi] = [stop]
+        if index is not None:
+            j = bisect_left(positions, index)
+            if positions[j:j + 1] != [index]:
+                positions.insert(j, index)
+
+    def invalidate(self, start, stop, shift=0):
+        """
+        Forget results affected by replacing the bytes from start to stop.
+
+        Occurences which overlap the replaced bytes are forgotten, and the
+        positions after stop are moved by shift bytes.
+
+        :param int start: The start of the replaced bytes.
+        :param int stop: The stop of the replaced bytes, equal to start for
+            an insertion.
+        :param int shift: How much the size of the chain changed.
+        """
+        for string, (starts, stops, positions) in self.entries.items():
+            dirty_start = start - len(string) + 1
+            i = bisect_left(stops, dirty_start)
+            new_starts = []
+            new_stops = []
+            for a, b in zip(starts[i:], stops[i:]):
+                if a < dirty_start:
+                    new_starts.append(a)
+                    new_stops.append(dirty_start)
+                if stop < b:
+                    new_starts.append(max(a, stop) + shift)
+                    new_stops.append(b + shift)
+            starts[i:] = new_starts
+            stops[i:] = new_stops
+            i = bisect_left(positions, dirty_start)
+            j = bisect_left(positions, stop)
+            positions[i:] = [index + shift for index in positions[j:]]
@@ -22,6 +22,13 @@ COPYING = """\
 
 from fakelargefile.segment.abc import (
     AbstractSegment, register_segment, segment_types)
+from fakelargefile.segment.chainview import ChainViewSegment
+from fakelargefile.segment.compressed import CompressedLiteralSegment
+from fakelargefile.segment.filebacked import FileBackedSegment
+from fakelargefile.segment.growable import GrowableSegment
 from fakelargefile.segment.homogenous import HomogenousSegment
 from fakelargefile.segment.literal import LiteralSegment
+from fakelargefile.segment.patched import PatchedSegment
+from fakelargefile.segment.pseudorandom import PseudoRandomSegment
 from fakelargefile.segment.repeating import RepeatingSegment
+from fakelargefile.segment.template import TemplateSegment
@@ -24,6 +24,7 @@ COPYING = """\
 
 from abc import ABCMeta, abstractmethod
 
+from fakelargefile import crc
 from fakelargefile.tools import (
     abstractclassmethod, register_machinery, parse_unit, Slice)
 
@@ -61,6 +62,22 @@ class AbstractSegment(object):
     - ``cut``
     - ``cut_at``
     - ``intersects``
+    - ``rindex`` (a generic fallback searching backwards in chunks, which
+      subclasses may override)
+    - ``iter_index`` (a generic fallback calling ``index`` once per match,
+      which subclasses may override)
+    - ``replace`` (a generic fallback built on ``iter_index`` and
+      ``subsegment``, which subclasses may override)
+    - ``iter_chunks`` (a generic fallback yielding substrings, which
+      subclasses may override)
+    - ``is_null`` (a generic fallback returning False, which subclasses may
+      override)
+    - ``crc32`` (a generic fallback reading substrings, which subclasses
+      may override)
+    - ``source`` (a generic fallback returning a key unique to the
+      segment, which subclasses may override)
+    - ``chunked_index`` (a helper searching forwards in chunks, for
+      subclasses to implement ``index`` with)
 
     To build your own segment type, simply inherit from this class and
     override the abstract methods.
@@ -79,6 +96,8 @@ class AbstractSegment(object):
 
     repr_sample_max_length = 32
 
+    search_chunk_size = 64 * 1024
+
     def __init__(self, start, stop):
         """
         Initialize attributes common to all segment types.
@@ -259,6 +278,205 @@ class AbstractSegment(object):
         """
         raise NotImplementedError()
 
+    def iter_index(self, string, start=None, stop=None, end_pos=False):
+        """
+        Iterate over the indices of non-overlapping occurences of string.
+
+        This generic implementation calls :py:meth:`index` once per match.
+        Subclasses are encouraged to override it with something faster.
+
+        :param str string: The string to search for
+        :param int start: The index to start at, self.start by default. If
+            less than self.start, use self.start.
+        :param int stop: The index at which to stop searching, self.stop by
+            default. If greater than self.stop, use self.stop.
+        :param bool end_pos: Yield the index after the end of each found
+            string instead of the index of the beginning.
+
+        """
+        sl = Slice(start, stop, self.start, self.stop)
+        pos = sl.start
+        while True:
+            try:
+                pos = self.index(string, pos, sl.stop, end_pos=True)
+            except ValueError:
+                return
+            if end_pos:
+                yield pos
+            else:
+                yield pos - len(string)
+
+    def replace(self, old, new, start=None, stop=None):
+        """
+        Return segments where occurences of old are replaced by new.
+
+        This generic implementation finds the occurences with
+        :py:meth:`iter_index`, and keeps the bytes in between as
+        subsegments of this segment. Subclasses are encouraged to override
+        it with something faster.
+
+        :param str old: The string to replace. Must be non-empty.
+        :param str new: The string to replace it with.
+        :param int start: The index to start at, self.start by default. If
+            less than self.start, use self.start.
+        :param int stop: The index at which to stop, self.stop by default.
+            If greater than self.stop, use self.stop.
+        :returns: A tuple (segments, end). The segments are contiguous,
+            begin at start and hold the bytes from start to stop with the
+            replacements made. End is the index after the last occurence
+            replaced, or start if there were none.
+        """
+        from fakelargefile.segment.literal import LiteralSegment
+        sl = Slice(start, stop, self.start, self.stop)
+        segments = []
+        pos = end = sl.start
+        for index in self.iter_index(old, sl.start, sl.stop):
+            if end < index:
+                segments.append(self.subsegment(end, index).copy(start=pos))
+                pos += index - end
+            if new:
+                segments.append(LiteralSegment(pos, new))
+                pos += len(new)
+            end = index + len(old)
+        if end < sl.stop:
+            segments.append(self.subsegment(end, sl.stop).copy(start=pos))
+        return segments, end
+
+    def rindex(self, string, start=None, stop=None, end_pos=False):
+        """
+        Return the index of the last occurence of string.
+
+        This generic implementation searches backwards from stop through
+        substrings of about ``self.search_chunk_size`` bytes, so the cost is
+        proportional to the distance scanned. Subclasses are encouraged to
+        override it with something faster.
+
+        :param str string: The string to search for
+        :param int start: The index at which to stop searching, self.start
+            by default. If less than self.start, use self.start.
+        :param int stop: The index to start searching backwards from,
+            self.stop by default. If greater than self.stop, use self.stop.
+        :param bool end_pos: Return the index after the end of the found
+            string instead of the index of the beginning.
+
+        If the string is not found, a ValueError will be raised.
+        """
+        sl = Slice(start, stop, self.start, self.stop)
+        chunk_size = max(self.search_chunk_size, 2 * len(string))
+        chunk_stop = sl.stop
+        while True:
+            chunk_start = max(sl.start, chunk_stop - chunk_size)
+            chunk = self.substring(chunk_start, chunk_stop)
+            try:
+                index = chunk_start + chunk.rindex(string)
+            except ValueError:
+                if chunk_start == sl.start:
+                    raise
+                # Keep enough of this chunk to find matches crossing into it
+                chunk_stop = chunk_start + len(string) - 1
+            else:
+                if end_pos:
+                    index += len(string)
+                return index
+
+    def chunked_index(self, string, start=None, stop=None, end_pos=False):
+        """
+        Return the index of the next occurence of string.
+
+        Searches forwards from start through substrings of about
+        ``self.search_chunk_size`` bytes, so the cost is proportional to
+        the distance scanned. Subclasses may implement :py:meth:`index`
+        with it if they have no faster way to search.
+
+        The arguments and the return value are as for :py:meth:`index`.
+        """
+        sl = Slice(start, stop, self.start, self.stop)
+        # Search chunks overlapping by len(string) - 1 bytes, so matches
+        # crossing the chunk boundaries are found.
+        chunk_size = max(self.search_chunk_size, len(string))
+        last_start = max(sl.start, sl.stop - len(string))
+        for chunk_start in xrange(sl.start, last_start + 1, chunk_size):
+            chunk_stop = min(
+                sl.stop, chunk_start + chunk_size + len(string) - 1)
+            index = self.substring(chunk_start, chunk_stop).find(string)
+            if index >= 0:
+                if end_pos:
+                    index += len(string)
+                return chunk_start + index
+        raise ValueError("substring not found")
+
+    def iter_chunks(self, chunk_size):
+        """
+        Iterate over the content of this segment in pieces.
+
+        The pieces are strings or other objects supporting the buffer
+        protocol, such as memoryviews, so they can be handed directly to
+        :py:func:`os.write`. They are at most chunk_size bytes each, unless
+        the segment's own representation is larger, and the same object may
+        be yielded several times.
+
+        This generic implementation yields substrings of chunk_size bytes.
+        Subclasses are encouraged to override it with something that
+        builds fewer strings.
+
+        :param int chunk_size: The preferred size of the pieces.
+
+        """
+        for pos in xrange(self.start, self.stop, chunk_size):
+            yield self.substring(pos, min(self.stop, pos + chunk_size))
+
+    def is_null(self):
+        """
+        Return True if this segment is known to contain only null bytes.
+
+        Null segments are holes: they need no storage when exported to a
+        sparse file. This generic implementation returns False, which is
+        always safe.
+        """
+        return False
+
+    def crc32(self, start=None, stop=None):
+        """
+        Return the CRC-32 of the bytes from start to stop.
+
+        This generic implementation reads substrings of about
+        ``self.search_chunk_size`` bytes. Subclasses are encouraged to
+        override it with something faster.
+
+        :param int start: The index to start at, self.start by default. If
+            less than self.start, use self.start.
+        :param int stop: The index to stop at, self.stop by default. If
+            greater than self.stop, use self.stop.
+        :returns: The unsigned CRC-32, as from
+            :py:func:`fakelargefile.crc.crc32`.
+
+        """
+        sl = Slice(start, stop, self.start, self.stop)
+        value = 0
+        for pos in xrange(sl.start, sl.stop, self.search_chunk_size):
+            value = crc.crc32(self.substring(
+                pos, min(sl.stop, pos + self.search_chunk_size)), value)
+        return value
+
+    def source(self):
+        """
+        Return (key, offset, period) describing where the bytes come from.
+
+        Two stretches of bytes are known to be equal if they have the same
+        key and offset, where offsets are compared modulo the period if it
+        is not None. The key is a hashable value identifying a source of
+        bytes, which may be shared by many segments, like the payload of a
+        LiteralSegment, and the offset is where this segment starts in that
+        source. This lets :py:mod:`fakelargefile.chaindiff` compare chains
+        without reading them.
+
+        This generic implementation returns a key unique to this segment,
+        made from its id, which is always safe as long as the segment is
+        kept alive while the key is in use. Subclasses are encouraged to
+        override it.
+        """
+        return ("segment", id(self)), 0, None
+
     @abstractmethod
     def substring(self, start, stop):
         """
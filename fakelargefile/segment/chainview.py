@@ -0,0 +1,169 @@
+'''
+A segment referring to a byte range of another segment chain
+'''
+
+COPYING = """\
+    Copyright 2014 Lauritz Vesteraas Thaulow
+
+    This file is part of the FakeLargeFile python package.
+
+    FakeLargeFile is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License version 3,
+    as published by the Free Software Foundation.
+
+    FakeLargeFile is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU General Affero Public License
+    along with FakeLargeFile.  If not, see <http://www.gnu.org/licenses/>.
+    """
+
+
+
+from fakelargefile.segment.abc import AbstractSegment, register_segment
+from fakelargefile.segment.literal import LiteralSegment
+from fakelargefile.tools import parse_unit, Slice
+
+
+@register_segment
+class ChainViewSegment(AbstractSegment):
+    """
+    A segment containing a byte range of another segment chain.
+
+    The bytes are not copied: reads and searches are passed on to the
+    segments of the source chain. Subsegments and copies share the source
+    chain, so reusing a large block of segments many times costs one
+    segment each time, and the source chain may itself contain views.
+
+    The source chain must not change while it is in use. Use
+    :py:meth:`fakelargefile.segmentchain.SegmentChain.view` to get a view
+    of a snapshot of a chain which may change later.
+    """
+    def __init__(self, start, chain, offset=0, length=None):
+        """
+        Initialize a ChainViewSegment instance.
+
+        :param int start: The start pos of the segment.
+        :param SegmentChain chain: The source chain.
+        :param int offset: The position in the source chain of the first
+            byte of the segment.
+        :param length: The size of the segment. By default, the segment
+            reaches to the end of the source chain.
+        :type length: int or NoneType
+
+        """
+        if length is None:
+            length = chain.size - offset
+        if not (0 <= offset and 0 <= length and
+                offset + length <= chain.size):
+            raise ValueError(
+                "Can't view bytes {} to {} of a chain of {} bytes".format(
+                    offset, offset + length, chain.size))
+        start = parse_unit(start)
+        super(ChainViewSegment, self).__init__(start, start + length)
+        self.chain = chain
+        self.offset = offset
+
+    def subsegment(self, start, stop):
+        sl = Slice(start, stop, self.start, self.stop)
+        if sl.size:
+            return type(self)(
+                sl.start, self.chain, self.offset + sl.local_start, sl.size)
+        else:
+            return None
+
+    @classmethod
+    def example(cls, start, stop):
+        from fakelargefile.segmentchain import SegmentChain
+        start = parse_unit(start)
+        stop = parse_unit(stop)
+        string = str(LiteralSegment.example(start, stop))
+        # Several source segments, so that the searches cross between them
+        chain = SegmentChain(
+            [LiteralSegment(0, "padding")] +
+            [LiteralSegment(7 + pos, string[pos:pos + 100])
+             for pos in xrange(0, len(string), 100)])
+        return cls(start, chain, 7)
+
+    def copy(self, start=None):
+        if start is None:
+            start = self.start
+        return type(self)(start, self.chain, self.offset, self.size)
+
+    def index(self, string, start=None, stop=None, end_pos=False):
+        sl = Slice(start, stop, self.start, self.stop)
+        offset = self.offset
+        try:
+            index = self.chain.index(
+                string, offset + sl.local_start, offset + sl.local_stop,
+                end_pos)
+        except ValueError:
+            raise ValueError("substring not found")
+        return self.start - offset + index
+
+    def iter_index(self, string, start=None, stop=None, end_pos=False):
+        sl = Slice(start, stop, self.start, self.stop)
+        offset = self.offset
+        for index in self.chain.finditer(
+                string, offset + sl.local_start, offset + sl.local_stop,
+                end_pos):
+            yield self.start - offset + index
+
+    def rindex(self, string, start=None, stop=None, end_pos=False):
+        sl = Slice(start, stop, self.start, self.stop)
+        offset = self.offset
+        try:
+            index = self.chain.rindex(
+                string, offset + sl.local_start, offset + sl.local_stop,
+                end_pos)
+        except ValueError:
+            raise ValueError("substring not found")
+        return self.start - offset + index
+
+    def iter_parts(self):
+        """
+        Iterate over the segments of the source chain in this segment.
+
+        They are cut to fit, and moved to where they are in this segment.
+        """
+        offset = self.offset
+        stop = offset + self.size
+        for segment in self.chain.segment_iter(offset):
+            if stop <= segment.start:
+                break
+            part = segment.subsegment(offset, stop)
+            yield part.copy(start=self.start - offset + part.start)
+
+    def iter_chunks(self, chunk_size):
+        for part in self.iter_parts():
+            for chunk in part.iter_chunks(chunk_size):
+                yield chunk
+
+    def is_null(self):
+        next_data = self.chain.next_data(self.offset)
+        return next_data is None or self.offset + self.size <= next_data
+
+    def crc32(self, start=None, stop=None):
+        sl = Slice(start, stop, self.start, self.stop)
+        return self.chain.crc32(
+            self.offset + sl.local_start, self.offset + sl.local_stop)
+
+    def source(self):
+        return ("chain", id(self.chain)), self.offset, None
+
+    def substring(self, start, stop):
+        sl = Slice(start, stop, self.start, self.stop, clamp=False)
+        start = self.offset + sl.local_start
+        stop = self.offset + sl.local_stop
+        pieces = []
+        for segment in self.chain.segment_iter(start):
+            if stop <= segment.start:
+                break
+            pieces.append(segment.substring(
+                max(segment.start, start), min(segment.stop, stop)))
+        return "".join(pieces)
+
+    def __str__(self):
+        return self.substring(self.start, self.stop)
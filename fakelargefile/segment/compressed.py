@@ -0,0 +1,217 @@
+'''
+A literal segment stored as independently compressed blocks
+'''
+
+COPYING = """\
+    Copyright 2014 Lauritz Vesteraas Thaulow
+
+    This file is part of the FakeLargeFile python package.
+
+    FakeLargeFile is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License version 3,
+    as published by the Free Software Foundation.
+
+    FakeLargeFile is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU General Affero Public License
+    along with FakeLargeFile.  If not, see <http://www.gnu.org/licenses/>.
+    """
+
+
+
+from collections import OrderedDict
+import threading
+import zlib
+
+from fakelargefile import crc
+from fakelargefile.segment.abc import AbstractSegment, register_segment
+from fakelargefile.segment.literal import LiteralSegment
+from fakelargefile.tools import parse_unit, Slice
+
+
+class CompressedPayload(object):
+    """
+    A string stored as zlib compressed blocks of block_size bytes each.
+
+    Recently used blocks are kept decompressed in a small LRU cache, which
+    is guarded by a lock so the payload can be read from several threads.
+    """
+
+    cache_size = 8
+
+    def __init__(self, string, block_size, level):
+        """
+        Compress a string.
+
+        :param str string: The string to store.
+        :param int block_size: The number of bytes per block.
+        :param int level: The zlib compression level.
+
+        """
+        self.size = len(string)
+        self.block_size = block_size
+        self.blocks = [
+            zlib.compress(string[pos:pos + block_size], level)
+            for pos in xrange(0, len(string), block_size)]
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_blocks(cls, blocks, block_size, size):
+        """
+        Create a CompressedPayload from blocks which are already compressed.
+
+        :param list blocks: The zlib compressed blocks.
+        :param int block_size: The number of bytes per block.
+        :param int size: The number of bytes in all the blocks together.
+
+        """
+        payload = cls.__new__(cls)
+        payload.size = size
+        payload.block_size = block_size
+        payload.blocks = blocks
+        payload.cache = OrderedDict()
+        payload.lock = threading.Lock()
+        return payload
+
+    def block(self, number):
+        """
+        Return block number, decompressed.
+        """
+        with self.lock:
+            block = self.cache.pop(number, None)
+            if block is not None:
+                self.cache[number] = block
+                return block
+        # Decompress without holding the lock, so other threads can use the
+        # cache meanwhile
+        block = zlib.decompress(self.blocks[number])
+        with self.lock:
+            self.cache.pop(number, None)
+            while len(self.cache) >= self.cache_size:
+                self.cache.popitem(last=False)
+            self.cache[number] = block
+        return block
+
+    def source(self):
+        return ("compressed", id(self.payload)), self.offset, None
+
+    def substring(self, start, stop):
+        """
+        Return the bytes from start to stop, decompressing only the blocks
+        which they touch.
+        """
+        if stop <= start:
+            return ""
+        block_size = self.block_size
+        first = start // block_size
+        last = (stop - 1) // block_size
+        if first == last:
+            local_start = start - first * block_size
+            return self.block(first)[local_start:local_start + stop - start]
+        pieces = [self.block(first)[start - first * block_size:]]
+        for number in xrange(first + 1, last):
+            pieces.append(self.block(number))
+        pieces.append(self.block(last)[:stop - last * block_size])
+        return "".join(pieces)
+
+
+@register_segment
+class CompressedLiteralSegment(AbstractSegment):
+    """
+    A segment containing a given string, stored compressed.
+
+    The string is split into blocks which are compressed independently,
+    so :py:meth:`substring` only decompresses the blocks it touches. The
+    memory used is about the compressed size of the string, plus a few
+    decompressed blocks kept in an LRU cache.
+
+    Like for a :py:class:`~fakelargefile.segment.literal.LiteralSegment`,
+    the payload is shared by subsegments and copies, which only adjust
+    their offset into it.
+    """
+
+    block_size = 64 * 1024
+
+    def __init__(self, start, string, block_size=None, level=6):
+        """
+        Initialize a CompressedLiteralSegment instance.
+
+        :param int start: The start pos of the segment.
+        :param str string: The string this segment should contain.
+        :param int block_size: The number of bytes per compressed block.
+            Defaults to ``CompressedLiteralSegment.block_size``.
+        :param int level: The zlib compression level.
+
+        """
+        start = parse_unit(start)
+        super(CompressedLiteralSegment, self).__init__(
+            start, start + len(string))
+        if block_size is None:
+            block_size = self.block_size
+        self.payload = CompressedPayload(string, block_size, level)
+        self.offset = 0
+
+    @classmethod
+    def _view(cls, start, payload, offset, size):
+        """
+        Create a CompressedLiteralSegment sharing part of a payload.
+
+        :param int start: The start pos of the new segment.
+        :param CompressedPayload payload: The payload to share.
+        :param int offset: The index into the payload of the first byte of
+            the new segment.
+        :param int size: The size of the new segment.
+
+        """
+        segment = cls.__new__(cls)
+        AbstractSegment.__init__(segment, start, start + size)
+        segment.payload = payload
+        segment.offset = offset
+        return segment
+
+    def subsegment(self, start, stop):
+        sl = Slice(start, stop, self.start, self.stop)
+        if sl.size:
+            return self._view(
+                sl.start, self.payload, self.offset + sl.local_start,
+                sl.size)
+        else:
+            return None
+
+    @classmethod
+    def example(cls, start, stop):
+        # Small blocks, so that the examples span several of them
+        return cls(start, str(LiteralSegment.example(start, stop)),
+                   block_size=64)
+
+    def copy(self, start=None):
+        if start is None:
+            start = self.start
+        return self._view(start, self.payload, self.offset, self.size)
+
+    def index(self, string, start=None, stop=None, end_pos=False):
+        return self.chunked_index(string, start, stop, end_pos)
+
+    def crc32(self, start=None, stop=None):
+        sl = Slice(start, stop, self.start, self.stop)
+        block_size = self.payload.block_size
+        pos = self.offset + sl.local_start
+        stop = self.offset + sl.local_stop
+        value = 0
+        while pos < stop:
+            block_stop = min(stop, (pos // block_size + 1) * block_size)
+            value = crc.crc32(self.payload.substring(pos, block_stop), value)
+            pos = block_stop
+        return value
+
+    def substring(self, start, stop):
+        sl = Slice(start, stop, self.start, self.stop, clamp=False)
+        return self.payload.substring(
+            self.offset + sl.local_start, self.offset + sl.local_stop)
+
+    def __str__(self):
+        return self.substring(self.start, self.stop)
@@ -0,0 +1,171 @@
+'''
+A segment containing a byte range of a real file
+'''
+
+COPYING = """\
+    Copyright 2014 Lauritz Vesteraas Thaulow
+
+    This file is part of the FakeLargeFile python package.
+
+    FakeLargeFile is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License version 3,
+    as published by the Free Software Foundation.
+
+    FakeLargeFile is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU General Affero Public License
+    along with FakeLargeFile.  If not, see <http://www.gnu.org/licenses/>.
+    """
+
+
+import mmap
+import os
+import tempfile
+
+from fakelargefile import crc
+from fakelargefile.segment.abc import AbstractSegment, register_segment
+from fakelargefile.segment.literal import LiteralSegment
+from fakelargefile.tools import parse_unit, Slice
+
+
+@register_segment
+class FileBackedSegment(AbstractSegment):
+    """
+    A segment containing the bytes of a real file from a given offset.
+
+    The file is memory mapped read-only, so the bytes are only read from
+    disk when they are used, and the operating system may evict them again
+    when memory is needed elsewhere. Subsegments and copies share the same
+    mapping.
+
+    The file should not change while it is in use. If it is truncated,
+    reading the missing part may crash the process.
+    """
+    def __init__(self, start, path, offset=0, length=None):
+        """
+        Initialize a FileBackedSegment instance.
+
+        :param int start: The start pos of the segment.
+        :param str path: The path of the file.
+        :param int offset: The position in the file of the first byte of
+            the segment.
+        :param length: The size of the segment. By default, the segment
+            reaches to the end of the file.
+        :type length: int or NoneType
+
+        """
+        with open(path, "rb") as f:
+            file_size = os.fstat(f.fileno()).st_size
+            if length is None:
+                length = file_size - offset
+            if not (0 <= offset and offset + length <= file_size):
+                raise ValueError(
+                    "Can't map bytes {} to {} of {} bytes in {}".format(
+                        offset, offset + length, file_size, path))
+            start = parse_unit(start)
+            super(FileBackedSegment, self).__init__(start, start + length)
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.path = path
+        self.offset = offset
+
+    @classmethod
+    def _view(cls, start, other, offset, size):
+        """
+        Create a FileBackedSegment sharing the mapping of another one.
+
+        :param int start: The start pos of the new segment.
+        :param FileBackedSegment other: The segment to share a mapping with.
+        :param int offset: The position in the file of the first byte of
+            the new segment.
+        :param int size: The size of the new segment.
+
+        """
+        segment = cls.__new__(cls)
+        AbstractSegment.__init__(segment, start, start + size)
+        segment.map = other.map
+        segment.path = other.path
+        segment.offset = offset
+        return segment
+
+    def subsegment(self, start, stop):
+        sl = Slice(start, stop, self.start, self.stop)
+        if sl.size:
+            return self._view(
+                sl.start, self, self.offset + sl.local_start, sl.size)
+        else:
+            return None
+
+    @classmethod
+    def example(cls, start, stop):
+        start = parse_unit(start)
+        stop = parse_unit(stop)
+        fd, path = tempfile.mkstemp()
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(str(LiteralSegment.example(start, stop)))
+            return cls(start, path)
+        finally:
+            # The mapping stays valid after the file is removed
+            os.remove(path)
+
+    def copy(self, start=None):
+        if start is None:
+            start = self.start
+        return self._view(start, self, self.offset, self.size)
+
+    def index(self, string, start=None, stop=None, end_pos=False):
+        sl = Slice(start, stop, self.start, self.stop)
+        offset = self.offset
+        index = self.map.find(
+            string, offset + sl.local_start, offset + sl.local_stop)
+        if index < 0:
+            raise ValueError("substring not found")
+        if end_pos:
+            index += len(string)
+        return self.start - offset + index
+
+    def iter_index(self, string, start=None, stop=None, end_pos=False):
+        sl = Slice(start, stop, self.start, self.stop)
+        find = self.map.find
+        length = len(string)
+        offset = self.start - self.offset
+        if end_pos:
+            offset += length
+        pos = self.offset + sl.local_start
+        local_stop = self.offset + sl.local_stop
+        while True:
+            pos = find(string, pos, local_stop)
+            if pos < 0:
+                return
+            yield offset + pos
+            pos += length
+
+    def rindex(self, string, start=None, stop=None, end_pos=False):
+        sl = Slice(start, stop, self.start, self.stop)
+        offset = self.offset
+        index = self.map.rfind(
+            string, offset + sl.local_start, offset + sl.local_stop)
+        if index < 0:
+            raise ValueError("substring not found")
+        if end_pos:
+            index += len(string)
+        return self.start - offset + index
+
+    def crc32(self, start=None, stop=None):
+        sl = Slice(start, stop, self.start, self.stop)
+        return crc.crc32(
+            buffer(self.map, self.offset + sl.local_start, sl.size))
+
+    def source(self):
+        return ("map", id(self.map)), self.offset, None
+
+    def substring(self, start, stop):
+        sl = Slice(start, stop, self.start, self.stop, clamp=False)
+        offset = self.offset
+        return self.map[offset + sl.local_start:offset + sl.local_stop]
+
+    def __str__(self):
+        return self.substring(self.start, self.stop)
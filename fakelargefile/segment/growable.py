@@ -0,0 +1,129 @@
+'''
+A literal segment which can grow at the end
+
+A SegmentChain keeps appended strings in a GrowableSegment at its end, so
+that many small appends don't each become a segment of their own.
+'''
+
+COPYING = """\
+    Copyright 2014 Lauritz Vesteraas Thaulow
+
+    This file is part of the FakeLargeFile python package.
+
+    FakeLargeFile is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License version 3,
+    as published by the Free Software Foundation.
+
+    FakeLargeFile is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU General Affero Public License
+    along with FakeLargeFile.  If not, see <http://www.gnu.org/licenses/>.
+    """
+
+
+from fakelargefile import crc
+from fakelargefile.segment.abc import AbstractSegment, register_segment
+from fakelargefile.segment.literal import LiteralSegment
+from fakelargefile.tools import parse_unit, Slice
+
+
+@register_segment
+class GrowableSegment(AbstractSegment):
+    """
+    A segment containing a string which may grow at the end.
+
+    The string is kept in a bytearray, so that :py:meth:`extend` takes
+    amortized constant time. This breaks the rule that segments are
+    immutable, so only a SegmentChain should extend a GrowableSegment, and
+    only while it is the last segment of the chain. Before making any other
+    changes, the chain replaces it with the result of :py:meth:`seal`.
+
+    Subsegments and copies are immutable LiteralSegments.
+    """
+    def __init__(self, start, string):
+        """
+        Initialize a GrowableSegment instance.
+
+        :param int start: The start pos of the segment.
+        :param str string: The initial string of the segment.
+
+        """
+        start = parse_unit(start)
+        super(GrowableSegment, self).__init__(start, start + len(string))
+        self.buffer = bytearray(string)
+
+    def extend(self, string):
+        """
+        Add string to the end of this segment.
+        """
+        self.buffer += string
+        self._stop += len(string)
+        self._size += len(string)
+
+    def seal(self):
+        """
+        Return a LiteralSegment with the same content as this segment.
+        """
+        return LiteralSegment(self.start, str(self.buffer))
+
+    def subsegment(self, start, stop):
+        sl = Slice(start, stop, self.start, self.stop)
+        if sl.size:
+            return LiteralSegment(sl.start, str(self.buffer[sl.local_slice]))
+        else:
+            return None
+
+    @classmethod
+    def example(cls, start, stop):
+        return cls(start, LiteralSegment.example(start, stop).string)
+
+    def copy(self, start=None):
+        if start is None:
+            start = self.start
+        return LiteralSegment(start, str(self.buffer))
+
+    def index(self, string, start=None, stop=None, end_pos=False):
+        sl = Slice(start, stop, self.start, self.stop)
+        index = self.buffer.index(string, sl.local_start, sl.local_stop)
+        if end_pos:
+            index += len(string)
+        return self.start + index
+
+    def iter_index(self, string, start=None, stop=None, end_pos=False):
+        sl = Slice(start, stop, self.start, self.stop)
+        find = self.buffer.find
+        length = len(string)
+        offset = self.start
+        if end_pos:
+            offset += length
+        pos = sl.local_start
+        while True:
+            pos = find(string, pos, sl.local_stop)
+            if pos < 0:
+                return
+            yield offset + pos
+            pos += length
+
+    def rindex(self, string, start=None, stop=None, end_pos=False):
+        sl = Slice(start, stop, self.start, self.stop)
+        index = self.buffer.rindex(string, sl.local_start, sl.local_stop)
+        if end_pos:
+            index += len(string)
+        return self.start + index
+
+    def crc32(self, start=None, stop=None):
+        sl = Slice(start, stop, self.start, self.stop)
+        return crc.crc32(buffer(self.buffer, sl.local_start, sl.size))
+
+    def source(self):
+        return ("buffer", id(self.buffer)), 0, None
+
+    def substring(self, start, stop):
+        sl = Slice(start, stop, self.start, self.stop, clamp=False)
+        return str(self.buffer[sl.local_slice])
+
+    def __str__(self):
+        return str(self.buffer)
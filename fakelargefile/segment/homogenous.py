@@ -21,7 +21,9 @@ COPYING = """\
     """
 
 
+from fakelargefile import crc
 from fakelargefile.segment.abc import AbstractSegment, register_segment
+from fakelargefile.segment.repeating import RepeatingSegment
 from fakelargefile.tools import Slice
 
 
@@ -76,6 +78,70 @@ class HomogenousSegment(AbstractSegment):
         else:
             return sl.start
 
+    def iter_index(self, string, start=None, stop=None, end_pos=False):
+        if not string:
+            return super(HomogenousSegment, self).iter_index(
+                string, start, stop, end_pos)
+        if len(set(string)) > 1 or string[0] != self.char:
+            return iter([])
+        sl = Slice(start, stop, self.start, self.stop)
+        if end_pos:
+            return xrange(sl.start + len(string), sl.stop + 1, len(string))
+        else:
+            return xrange(sl.start, sl.stop - len(string) + 1, len(string))
+
+    def replace(self, old, new, start=None, stop=None):
+        sl = Slice(start, stop, self.start, self.stop)
+        if len(set(old)) == 1 and old[0] == self.char:
+            count = sl.size // len(old)
+        else:
+            count = 0
+        segments = []
+        pos = sl.start
+        if count and new:
+            if len(set(new)) == 1:
+                segments.append(type(self)(
+                    pos, pos + count * len(new), new[0]))
+            else:
+                segments.append(RepeatingSegment(
+                    pos, pos + count * len(new), new))
+            pos += count * len(new)
+        remainder = sl.size - count * len(old)
+        if remainder:
+            segments.append(type(self)(pos, pos + remainder, self.char))
+        return segments, sl.start + count * len(old)
+
+    def rindex(self, string, start=None, stop=None, end_pos=False):
+        if len(set(string)) > 1:
+            raise ValueError()
+        if string and string[0] != self.char:
+            raise ValueError()
+        sl = Slice(start, stop, self.start, self.stop)
+        if sl.size < len(string):
+            raise ValueError()
+        if end_pos:
+            return sl.stop
+        else:
+            return sl.stop - len(string)
+
+    def is_null(self):
+        return self.char == "\x00"
+
+    def iter_chunks(self, chunk_size):
+        fill = self.char * min(self.size, chunk_size)
+        whole, rest = divmod(self.size, len(fill))
+        for _ in xrange(whole):
+            yield fill
+        if rest:
+            yield memoryview(fill)[:rest]
+
+    def crc32(self, start=None, stop=None):
+        sl = Slice(start, stop, self.start, self.stop)
+        return crc.crc32_repeat(crc.crc32(self.char), 1, sl.size)
+
+    def source(self):
+        return ("periodic", self.char), 0, 1
+
     def substring(self, start=None, stop=None):
         sl = Slice(start, stop, self.start, self.stop, clamp=False)
         return self.char * sl.size
@@ -26,6 +26,7 @@ COPYING = """\
 
 import pkg_resources
 
+from fakelargefile import crc
 from fakelargefile.segment.abc import AbstractSegment, register_segment
 from fakelargefile.tools import parse_unit, Slice
 
@@ -34,7 +35,22 @@ from fakelargefile.tools import parse_unit, Slice
 class LiteralSegment(AbstractSegment):
     """
     A segment containing exactly a given string.
+
+    The string is held as a read-only payload which may be shared between
+    several segments, each of which sees the part of it starting at
+    ``self.offset``. Since the payload is never modified, sharing it is
+    safe, and it makes :py:meth:`subsegment` and :py:meth:`copy` take
+    constant time. This matters when small writes are made inside large
+    literal segments: the parts before and after the write keep referring
+    to the original payload instead of copying it.
+
+    Subsegments smaller than ``self.min_shared_size`` get a copy of their
+    part of the payload instead, so that a few small leftovers don't keep
+    a large payload alive.
     """
+
+    min_shared_size = 64 * 1024
+
     def __init__(self, start, string):
         """
         Initialize a LiteralSegment instance.
@@ -45,12 +61,44 @@ class LiteralSegment(AbstractSegment):
         """
         start = parse_unit(start)
         super(LiteralSegment, self).__init__(start, start + len(string))
-        self.string = string
+        self.payload = string
+        self.offset = 0
+
+    @classmethod
+    def _view(cls, start, payload, offset, size):
+        """
+        Create a LiteralSegment sharing part of an existing payload.
+
+        :param int start: The start pos of the new segment.
+        :param str payload: The payload to share.
+        :param int offset: The index into the payload of the first byte of
+            the new segment.
+        :param int size: The size of the new segment.
+
+        """
+        if size < cls.min_shared_size or size == len(payload):
+            return cls(start, payload[offset:offset + size])
+        segment = cls.__new__(cls)
+        AbstractSegment.__init__(segment, start, start + size)
+        segment.payload = payload
+        segment.offset = offset
+        return segment
+
+    @property
+    def string(self):
+        """
+        Return the string this segment contains.
+        """
+        if self.size == len(self.payload):
+            return self.payload
+        return self.payload[self.offset:self.offset + self.size]
 
     def subsegment(self, start, stop):
         sl = Slice(start, stop, self.start, self.stop)
         if sl.size:
-            return type(self)(sl.start, self.string[sl.local_slice])
+            return self._view(
+                sl.start, self.payload, self.offset + sl.local_start,
+                sl.size)
         else:
             return None
 
@@ -67,18 +115,74 @@ class LiteralSegment(AbstractSegment):
     def copy(self, start=None):
         if start is None:
             start = self.start
-        return type(self)(start, self.string)
+        return self._view(start, self.payload, self.offset, self.size)
 
     def index(self, string, start=None, stop=None, end_pos=False):
         sl = Slice(start, stop, self.start, self.stop)
-        index = self.string.index(string, sl.local_start, sl.local_stop)
+        offset = self.offset
+        index = self.payload.index(
+            string, offset + sl.local_start, offset + sl.local_stop)
         if end_pos:
             index += len(string)
-        return self.start + index
+        return self.start - offset + index
+
+    def iter_index(self, string, start=None, stop=None, end_pos=False):
+        sl = Slice(start, stop, self.start, self.stop)
+        find = self.payload.find
+        length = len(string)
+        offset = self.start - self.offset
+        if end_pos:
+            offset += length
+        pos = self.offset + sl.local_start
+        local_stop = self.offset + sl.local_stop
+        while True:
+            pos = find(string, pos, local_stop)
+            if pos < 0:
+                return
+            yield offset + pos
+            pos += length
+
+    def replace(self, old, new, start=None, stop=None):
+        sl = Slice(start, stop, self.start, self.stop)
+        pieces = self.substring(sl.start, sl.stop).split(old)
+        if len(pieces) == 1:
+            end = sl.start
+            string = pieces[0]
+        else:
+            end = sl.stop - len(pieces[-1])
+            string = new.join(pieces)
+        if string:
+            return [type(self)(sl.start, string)], end
+        else:
+            return [], end
+
+    def rindex(self, string, start=None, stop=None, end_pos=False):
+        sl = Slice(start, stop, self.start, self.stop)
+        offset = self.offset
+        index = self.payload.rindex(
+            string, offset + sl.local_start, offset + sl.local_stop)
+        if end_pos:
+            index += len(string)
+        return self.start - offset + index
+
+    def iter_chunks(self, chunk_size):
+        view = memoryview(self.payload)
+        stop = self.offset + self.size
+        for pos in xrange(self.offset, stop, chunk_size):
+            yield view[pos:min(stop, pos + chunk_size)]
+
+    def crc32(self, start=None, stop=None):
+        sl = Slice(start, stop, self.start, self.stop)
+        return crc.crc32(
+            buffer(self.payload, self.offset + sl.local_start, sl.size))
+
+    def source(self):
+        return ("payload", id(self.payload)), self.offset, None
 
     def substring(self, start, stop):
         sl = Slice(start, stop, self.start, self.stop, clamp=False)
-        return self.string[sl.local_slice]
+        offset = self.offset
+        return self.payload[offset + sl.local_start:offset + sl.local_stop]
 
     def __str__(self):
         return self.string
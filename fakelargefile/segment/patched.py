@@ -0,0 +1,447 @@
+'''
+A segment overlaying sparse patches on another segment
+'''
+
+COPYING = """\
+    Copyright 2014 Lauritz Vesteraas Thaulow
+
+    This file is part of the FakeLargeFile python package.
+
+    FakeLargeFile is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License version 3,
+    as published by the Free Software Foundation.
+
+    FakeLargeFile is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU General Affero Public License
+    along with FakeLargeFile.  If not, see <http://www.gnu.org/licenses/>.
+    """
+
+
+
+import random
+
+from fakelargefile import crc
+from fakelargefile.segment.abc import AbstractSegment, register_segment
+from fakelargefile.segment.literal import LiteralSegment
+from fakelargefile.segment.repeating import RepeatingSegment
+from fakelargefile.tools import Slice
+
+
+# The patch table is a persistent treap: nodes are never changed once they
+# are in a table, so a new table made by adding a patch shares all but
+# O(log n) nodes with the old one, and both stay valid.
+
+_priority = random.Random(0).random
+
+
+class _Node(object):
+    """
+    A patch in a patch table, with start relative to the patched segment.
+    """
+    __slots__ = ("start", "string", "priority", "left", "right")
+
+    def __init__(self, start, string, priority, left=None, right=None):
+        self.start = start
+        self.string = string
+        self.priority = priority
+        self.left = left
+        self.right = right
+
+
+def _split(node, key):
+    """
+    Return the tables of the patches starting before key and the others.
+    """
+    if node is None:
+        return None, None
+    if node.start < key:
+        left, right = _split(node.right, key)
+        return _Node(node.start, node.string, node.priority,
+                     node.left, left), right
+    left, right = _split(node.left, key)
+    return left, _Node(node.start, node.string, node.priority,
+                       right, node.right)
+
+
+def _join(left, right):
+    """
+    Return the table of the patches in left followed by those in right.
+    """
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        return _Node(left.start, left.string, left.priority,
+                     left.left, _join(left.right, right))
+    return _Node(right.start, right.string, right.priority,
+                 _join(left, right.left), right.right)
+
+
+def _floor(node, key):
+    """
+    Return the last patch starting at or before key, or None.
+    """
+    found = None
+    while node is not None:
+        if node.start <= key:
+            found = node
+            node = node.right
+        else:
+            node = node.left
+    return found
+
+
+def _last(node):
+    """
+    Return the last patch of a non-empty table.
+    """
+    while node.right is not None:
+        node = node.right
+    return node
+
+
+def _ascending(node, key):
+    """
+    Iterate over the patches starting at or after key, in order.
+    """
+    stack = []
+    while stack or node is not None:
+        if node is not None:
+            if node.start >= key:
+                stack.append(node)
+                node = node.left
+            else:
+                node = node.right
+        else:
+            node = stack.pop()
+            yield node
+            node = node.right
+
+
+def _descending(node, key):
+    """
+    Iterate over the patches starting before key, in reverse order.
+    """
+    stack = []
+    while stack or node is not None:
+        if node is not None:
+            if node.start < key:
+                stack.append(node)
+                node = node.right
+            else:
+                node = node.left
+        else:
+            node = stack.pop()
+            yield node
+            node = node.left
+
+
+def _build(patches):
+    """
+    Return a table of (start, string) pairs in order, in linear time.
+    """
+    stack = []
+    for start, string in patches:
+        node = _Node(start, string, _priority())
+        last = None
+        while stack and stack[-1].priority < node.priority:
+            last = stack.pop()
+        # The nodes are new, so changing them here is safe
+        node.left = last
+        if stack:
+            stack[-1].right = node
+        stack.append(node)
+    return stack[0] if stack else None
+
+
+@register_segment
+class PatchedSegment(AbstractSegment):
+    """
+    A segment with the content of a base segment, except where patched.
+
+    The patches are kept in a table of non-overlapping, non-adjacent
+    strings, each replacing the bytes of the base segment where it is. This
+    lets a SegmentChain make many small writes inside a large segment
+    without splitting it up, so the number of segments stays the same.
+
+    Patches are merged when they overlap or touch, and later patches win
+    where they overlap earlier ones.
+
+    The table is a persistent balanced tree, with positions relative to
+    the start of the segment. Adding a patch with :py:meth:`patched` takes
+    time logarithmic in the number of patches, plus the size of the
+    patch, and the new segment shares the rest of the table with this
+    one. Copies share the whole table.
+    """
+    def __init__(self, base, patches=()):
+        """
+        Initialize a PatchedSegment instance.
+
+        :param AbstractSegment base: The segment to patch. If it is a
+            PatchedSegment, its patches are kept and the new patches are
+            applied on top of them.
+        :param patches: Pairs of (start, string) to apply in order. Each
+            string must be non-empty and lie inside the base segment.
+
+        """
+        super(PatchedSegment, self).__init__(base.start, base.stop)
+        if isinstance(base, PatchedSegment):
+            self.base = base.base
+            self.patches = base.patches
+        else:
+            self.base = base
+            self.patches = None
+        for start, string in patches:
+            self.patches, _ = self._merge(start, string)
+
+    @classmethod
+    def _from_table(cls, base, patches):
+        """
+        Create a PatchedSegment from an existing patch table.
+        """
+        segment = cls(base)
+        segment.patches = patches
+        return segment
+
+    @property
+    def patch_starts(self):
+        """
+        The list of the start positions of the patches.
+        """
+        return [self.start + node.start
+                for node in _ascending(self.patches, 0)]
+
+    @property
+    def patch_strings(self):
+        """
+        The list of the patch strings, in order.
+        """
+        return [node.string for node in _ascending(self.patches, 0)]
+
+    def _merge(self, start, string):
+        """
+        Return the patch table with a patch added.
+
+        :returns: A tuple of the new table and the string of the patch the
+            new one was merged into.
+        """
+        stop = start + len(string)
+        if not (self.start <= start < stop <= self.stop):
+            raise ValueError(
+                "Can't patch from {} to {} on segment from {} to {}".format(
+                    start, stop, self.start, self.stop))
+        start -= self.start
+        stop -= self.start
+        head = tail = ""
+        before = _floor(self.patches, start)
+        if before is not None and start <= before.start + len(before.string):
+            head = before.string[:start - before.start]
+            start = before.start
+        left, rest = _split(self.patches, start)
+        # Patches starting at stop touch the new one, so they are merged too
+        merged, right = _split(rest, stop + 1)
+        if merged is not None:
+            last = _last(merged)
+            tail = last.string[stop - last.start:]
+        string = "".join([head, string, tail])
+        node = _Node(start, string, _priority())
+        return _join(_join(left, node), right), string
+
+    def patched(self, start, string, max_size=None):
+        """
+        Return a copy of this segment with another patch applied.
+
+        :param int start: The position of the patch.
+        :param str string: The bytes to write there.
+        :param max_size: If given, return None instead if the patch would
+            have to be merged into a patch larger than this.
+        :type max_size: int or NoneType
+
+        """
+        patches, merged = self._merge(start, string)
+        if max_size is not None and len(merged) > max_size:
+            return None
+        return self._from_table(self.base, patches)
+
+    def _patch_range(self, start, stop, reverse=False):
+        """
+        Iterate over (start, string) of the patches intersecting start-stop.
+
+        :param bool reverse: Iterate from the last patch to the first.
+
+        """
+        offset = self.start
+        if reverse:
+            for node in _descending(self.patches, stop - offset):
+                if node.start + len(node.string) <= start - offset:
+                    return
+                yield offset + node.start, node.string
+            return
+        first = _floor(self.patches, start - offset)
+        if (first is not None and
+                start - offset < first.start + len(first.string)):
+            yield offset + first.start, first.string
+        for node in _ascending(self.patches, start - offset + 1):
+            if stop - offset <= node.start:
+                return
+            yield offset + node.start, node.string
+
+    def subsegment(self, start, stop):
+        sl = Slice(start, stop, self.start, self.stop)
+        if sl.size == 0:
+            return None
+        base = self.base.subsegment(sl.start, sl.stop)
+        patches = []
+        for patch_start, string in self._patch_range(sl.start, sl.stop):
+            if patch_start < sl.start:
+                string = string[sl.start - patch_start:]
+                patch_start = sl.start
+            patches.append((patch_start - sl.start,
+                            string[:sl.stop - patch_start]))
+        if not patches:
+            return base
+        return self._from_table(base, _build(patches))
+
+    @classmethod
+    def example(cls, start, stop):
+        base = RepeatingSegment.example(start, stop)
+        step = max(1, base.size // 8)
+        patches = []
+        for pos in xrange(base.start + step // 2, base.stop, step):
+            patches.append((pos, "#" * min(3, base.stop - pos)))
+        return cls(base, patches)
+
+    def copy(self, start=None):
+        if start is None:
+            start = self.start
+        return self._from_table(self.base.copy(start), self.patches)
+
+    def index(self, string, start=None, stop=None, end_pos=False):
+        sl = Slice(start, stop, self.start, self.stop)
+        if not string:
+            return self.base.index(string, sl.start, sl.stop, end_pos)
+        length = len(string)
+        found = None
+        # First the leftmost match in the base segment touching no patch.
+        # When a match touches a patch, no match starting before the end of
+        # that patch can be clean.
+        pos = sl.start
+        while found is None:
+            try:
+                index = self.base.index(string, pos, sl.stop)
+            except ValueError:
+                break
+            node = _floor(self.patches, index + length - 1 - self.start)
+            if (node is not None and
+                    index < self.start + node.start + len(node.string)):
+                pos = self.start + node.start + len(node.string)
+            else:
+                found = index
+        # Then matches touching a patch, which all lie within len(string) - 1
+        # bytes of it. Only the first patch with such a match matters.
+        for patch_start, patch_string in self._patch_range(
+                sl.start, sl.stop):
+            if found is not None and found <= patch_start - length + 1:
+                break
+            window_start = max(sl.start, patch_start - length + 1)
+            window_stop = min(
+                sl.stop, patch_start + len(patch_string) + length - 1)
+            index = self.substring(window_start, window_stop).find(string)
+            if index >= 0:
+                if found is None or window_start + index < found:
+                    found = window_start + index
+                break
+        if found is None:
+            raise ValueError("substring not found")
+        if end_pos:
+            found += length
+        return found
+
+    def rindex(self, string, start=None, stop=None, end_pos=False):
+        sl = Slice(start, stop, self.start, self.stop)
+        if not string:
+            return self.base.rindex(string, sl.start, sl.stop, end_pos)
+        length = len(string)
+        found = None
+        # The same as in index, but mirrored.
+        pos = sl.stop
+        while found is None:
+            try:
+                index = self.base.rindex(string, sl.start, pos)
+            except ValueError:
+                break
+            node = _floor(self.patches, index + length - 1 - self.start)
+            if (node is not None and
+                    index < self.start + node.start + len(node.string)):
+                pos = self.start + node.start
+            else:
+                found = index
+        for patch_start, patch_string in self._patch_range(
+                sl.start, sl.stop, reverse=True):
+            patch_stop = patch_start + len(patch_string)
+            if found is not None and patch_stop <= found + 1:
+                break
+            window_start = max(sl.start, patch_start - length + 1)
+            window_stop = min(sl.stop, patch_stop + length - 1)
+            index = self.substring(window_start, window_stop).rfind(string)
+            if index >= 0:
+                if found is None or window_start + index > found:
+                    found = window_start + index
+                break
+        if found is None:
+            raise ValueError("substring not found")
+        if end_pos:
+            found += length
+        return found
+
+    def iter_parts(self):
+        """
+        Iterate over contiguous segments with the same content as this one.
+
+        These are the subsegments of the base segment between the patches,
+        and a LiteralSegment for each patch.
+        """
+        pos = self.start
+        for node in _ascending(self.patches, 0):
+            patch_start = self.start + node.start
+            if pos < patch_start:
+                yield self.base.subsegment(pos, patch_start)
+            yield LiteralSegment(patch_start, node.string)
+            pos = patch_start + len(node.string)
+        if pos < self.stop:
+            yield self.base.subsegment(pos, self.stop)
+
+    def iter_chunks(self, chunk_size):
+        for part in self.iter_parts():
+            for chunk in part.iter_chunks(chunk_size):
+                yield chunk
+
+    def crc32(self, start=None, stop=None):
+        sl = Slice(start, stop, self.start, self.stop)
+        if sl.size == 0:
+            return 0
+        segment = self.subsegment(sl.start, sl.stop)
+        if not isinstance(segment, PatchedSegment):
+            return segment.crc32()
+        value = 0
+        for part in segment.iter_parts():
+            value = crc.crc32_combine(value, part.crc32(), part.size)
+        return value
+
+    def substring(self, start, stop):
+        sl = Slice(start, stop, self.start, self.stop, clamp=False)
+        result = bytearray(self.base.substring(sl.start, sl.stop))
+        for patch_start, string in self._patch_range(sl.start, sl.stop):
+            local_start = max(sl.start, patch_start)
+            local_stop = min(sl.stop, patch_start + len(string))
+            result[local_start - sl.start:local_stop - sl.start] = \
+                string[local_start - patch_start:local_stop - patch_start]
+        return str(result)
+
+    def __str__(self):
+        return self.substring(self.start, self.stop)
@@ -0,0 +1,149 @@
+'''
+A segment of reproducible pseudo-random bytes
+'''
+
+COPYING = """\
+    Copyright 2014 Lauritz Vesteraas Thaulow
+
+    This file is part of the FakeLargeFile python package.
+
+    FakeLargeFile is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License version 3,
+    as published by the Free Software Foundation.
+
+    FakeLargeFile is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU General Affero Public License
+    along with FakeLargeFile.  If not, see <http://www.gnu.org/licenses/>.
+    """
+
+
+
+import struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from fakelargefile.segment.abc import AbstractSegment, register_segment
+from fakelargefile.tools import Slice
+
+
+MASK = 0xffffffffffffffff
+
+# The constants of SplitMix64
+GAMMA = 0x9e3779b97f4a7c15
+MIX1 = 0xbf58476d1ce4e5b9
+MIX2 = 0x94d049bb133111eb
+
+
+def _splitmix_python(seed, first, count):
+    """
+    Return blocks first to first + count of the stream as a string.
+    """
+    values = []
+    append = values.append
+    state = (seed + (first + 1) * GAMMA) & MASK
+    for _ in xrange(count):
+        z = ((state ^ (state >> 30)) * MIX1) & MASK
+        z = ((z ^ (z >> 27)) * MIX2) & MASK
+        append(z ^ (z >> 31))
+        state = (state + GAMMA) & MASK
+    return struct.pack("<{}Q".format(count), *values)
+
+
+def _splitmix_numpy(seed, first, count):
+    """
+    Return blocks first to first + count of the stream as a string.
+
+    The same as _splitmix_python, vectorized. Integer arrays wrap around
+    on overflow, which gives the arithmetic modulo 2**64.
+    """
+    uint64 = numpy.uint64
+    z = numpy.arange(first + 1, first + 1 + count, dtype=uint64)
+    z *= uint64(GAMMA)
+    z += uint64(seed)
+    z ^= z >> uint64(30)
+    z *= uint64(MIX1)
+    z ^= z >> uint64(27)
+    z *= uint64(MIX2)
+    z ^= z >> uint64(31)
+    return z.astype("<u8").tobytes()
+
+
+if numpy is None:
+    _splitmix = _splitmix_python
+else:
+    _splitmix = _splitmix_numpy
+
+
+@register_segment
+class PseudoRandomSegment(AbstractSegment):
+    """
+    A segment of pseudo-random bytes, computed from a seed and a position.
+
+    The bytes are the output of the SplitMix64 generator seeded with seed,
+    as little endian 64-bit blocks. Since block n of the stream depends on
+    nothing but the seed and n, any part of it can be computed directly,
+    in time proportional to its size. The segment only stores the seed and
+    where in the stream it starts, so terabytes of reproducible,
+    incompressible data take no memory.
+
+    The bytes are computed with NumPy if it is installed, and in pure
+    Python, which gives the same bytes much slower, if not.
+    """
+    def __init__(self, start, stop, seed=0, offset=0):
+        """
+        Initialize a PseudoRandomSegment instance.
+
+        :param int start: The start pos of the segment.
+        :param int stop: The stop pos of the segment.
+        :param int seed: The seed, from 0 to 2**64 - 1.
+        :param int offset: The position in the stream of the first byte of
+            the segment.
+
+        """
+        super(PseudoRandomSegment, self).__init__(start, stop)
+        if not 0 <= seed <= MASK:
+            raise ValueError(
+                "The seed must be from 0 to 2**64 - 1, not {}".format(seed))
+        self.seed = seed
+        self.offset = offset
+
+    def subsegment(self, start, stop):
+        sl = Slice(start, stop, self.start, self.stop)
+        if sl.size:
+            return type(self)(
+                sl.start, sl.stop, self.seed, self.offset + sl.local_start)
+        else:
+            return None
+
+    @classmethod
+    def example(cls, start, stop):
+        return cls(start=start, stop=stop, seed=42)
+
+    def copy(self, start=None):
+        if start is None:
+            start = self.start
+        return type(self)(start, start + self.size, self.seed, self.offset)
+
+    def index(self, string, start=None, stop=None, end_pos=False):
+        return self.chunked_index(string, start, stop, end_pos)
+
+    def source(self):
+        return ("random", self.seed), self.offset, None
+
+    def substring(self, start, stop):
+        sl = Slice(start, stop, self.start, self.stop, clamp=False)
+        first = self.offset + sl.local_start
+        block = first // 8
+        blocks = (self.offset + sl.local_stop + 7) // 8 - block
+        data = _splitmix(self.seed, block, blocks)
+        return data[first - block * 8:first - block * 8 + sl.size]
+
+    def __str__(self):
+        return self.substring(self.start, self.stop)
@@ -23,6 +23,7 @@ COPYING = """\
 
 import logging
 
+from fakelargefile import crc
 from fakelargefile.segment.abc import AbstractSegment, register_segment
 from fakelargefile.tools import Slice
 import pkg_resources
@@ -31,6 +32,31 @@ import pkg_resources
 log = logging.getLogger(__name__)
 
 
+def _least_rotation(string):
+    """
+    Return the index of the lexicographically least rotation of string.
+
+    This is Booth's algorithm, which takes linear time.
+    """
+    doubled = string + string
+    failure = [-1] * len(doubled)
+    least = 0
+    for j in xrange(1, len(doubled)):
+        char = doubled[j]
+        i = failure[j - least - 1]
+        while i != -1 and char != doubled[least + i + 1]:
+            if char < doubled[least + i + 1]:
+                least = j - i - 1
+            i = failure[i]
+        if char != doubled[least + i + 1]:
+            if char < doubled[least]:
+                least = j
+            failure[j - least] = -1
+        else:
+            failure[j - least] = i + 1
+    return least
+
+
 @register_segment
 class RepeatingSegment(AbstractSegment):
     """
@@ -76,15 +102,147 @@ class RepeatingSegment(AbstractSegment):
 
     def index(self, string, start=None, stop=None, end_pos=False):
         sl = Slice(start, stop, self.start, self.stop)
-        in_string_start = sl.local_start % len(self.string)
-        to_add = sl.local_start - in_string_start
-        assert to_add + in_string_start == sl.local_start
-        length = min(sl.size, len(self.string) + len(string))
-        index = self.string_thrice.index(
-            string, in_string_start, in_string_start + length)
+        # If there is a match at some position, there is one at every
+        # len(self.string) bytes before it too, as long as it fits. So the
+        # first match is found within the first few bytes of the slice.
+        length = min(sl.size, len(self.string) + len(string) - 1)
+        index = self.substring(sl.start, sl.start + length).index(string)
+        if end_pos:
+            index += len(string)
+        return sl.start + index
+
+    def iter_index(self, string, start=None, stop=None, end_pos=False):
+        if not string:
+            for index in super(RepeatingSegment, self).iter_index(
+                    string, start, stop, end_pos):
+                yield index
+            return
+        sl = Slice(start, stop, self.start, self.stop)
+        length = len(string)
+        offset = length if end_pos else 0
+        # Where the next match is depends only on where the previous one
+        # ended, modulo len(self.string). So once a match is found at the
+        # same offset in the pattern as an earlier one, the matches in
+        # between repeat periodically.
+        seen = {}
+        found = []
+        pos = sl.start
+        while True:
+            try:
+                index = self.index(string, pos, sl.stop)
+            except ValueError:
+                return
+            key = (index - self.start) % len(self.string)
+            if key in seen:
+                break
+            seen[key] = len(found)
+            found.append(index)
+            yield index + offset
+            pos = index + length
+        cycle = found[seen[key]:]
+        period = index - cycle[0]
+        last_start = sl.stop - length
+        for shift in xrange(period, last_start - cycle[0] + 1, period):
+            for index in cycle:
+                index += shift
+                if last_start < index:
+                    return
+                yield index + offset
+
+    def replace(self, old, new, start=None, stop=None):
+        sl = Slice(start, stop, self.start, self.stop)
+        # Find the matches until they start repeating, like iter_index does
+        seen = {}
+        found = []
+        pos = sl.start
+        while True:
+            try:
+                index = self.index(old, pos, sl.stop)
+            except ValueError:
+                return super(RepeatingSegment, self).replace(
+                    old, new, sl.start, sl.stop)
+            key = (index - self.start) % len(self.string)
+            if key in seen:
+                break
+            seen[key] = len(found)
+            found.append(index)
+            pos = index + len(old)
+        # Replace the matches in one period once, and repeat the result
+        cycle_start = found[seen[key]]
+        period = index - cycle_start
+        count = (sl.stop - cycle_start) // period
+        cycle_stop = cycle_start + count * period
+        block_segments, block_end = super(RepeatingSegment, self).replace(
+            old, new, cycle_start, index)
+        block = "".join(map(str, block_segments))
+        segments, end = super(RepeatingSegment, self).replace(
+            old, new, sl.start, cycle_start)
+        pos = sl.start + sum(map(len, segments))
+        if block:
+            segments.append(type(self)(pos, pos + count * len(block), block))
+            pos += count * len(block)
+        end = cycle_stop - period + block_end - cycle_start
+        tail, tail_end = super(RepeatingSegment, self).replace(
+            old, new, cycle_stop, sl.stop)
+        for segment in tail:
+            segments.append(segment.copy(start=pos))
+            pos += segment.size
+        if cycle_stop < tail_end:
+            end = tail_end
+        return segments, end
+
+    def rindex(self, string, start=None, stop=None, end_pos=False):
+        sl = Slice(start, stop, self.start, self.stop)
+        # If there is a match at some position, there is one at every
+        # len(self.string) bytes after it too, as long as it fits. So the
+        # last match is found within the last few bytes of the slice.
+        length = min(sl.size, len(self.string) + len(string) - 1)
+        window_start = sl.stop - length
+        index = self.substring(window_start, sl.stop).rindex(string)
         if end_pos:
             index += len(string)
-        return self.start + to_add + index
+        return window_start + index
+
+    def is_null(self):
+        return not self.string.strip("\x00")
+
+    def iter_chunks(self, chunk_size):
+        # A whole number of repetitions, so that every tile starts where
+        # self.string starts.
+        repetitions = max(1, min(self.size, chunk_size) // len(self.string))
+        tile = self.string * repetitions
+        whole, rest = divmod(self.size, len(tile))
+        for _ in xrange(whole):
+            yield tile
+        if rest:
+            yield memoryview(tile)[:rest]
+
+    def crc32(self, start=None, stop=None):
+        sl = Slice(start, stop, self.start, self.stop)
+        rep_size = len(self.string)
+        modulus_start = sl.local_start % rep_size
+        string = self.string_thrice[modulus_start:modulus_start + rep_size]
+        whole, rest = divmod(sl.size, rep_size)
+        return crc.crc32_combine(
+            crc.crc32_repeat(crc.crc32(string), rep_size, whole),
+            crc.crc32(string[:rest]), rest)
+
+    def source(self):
+        """
+        Return (key, offset, period) describing where the bytes come from.
+
+        All rotations of a string, and all strings which repeat to the same
+        content, get the same key, and the offset tells which rotation this
+        segment starts with. The period is the length of the shortest
+        string which repeats to the same content.
+        """
+        string = self.string
+        # The first rotation equal to the string itself
+        period = (string + string).find(string, 1)
+        root = string[:period]
+        least = _least_rotation(root)
+        return (("periodic", root[least:] + root[:least]),
+                (period - least) % period, period)
 
     def substring(self, start, stop):
         sl = Slice(start, stop, self.start, self.stop, clamp=False)
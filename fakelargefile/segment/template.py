@@ -0,0 +1,198 @@
+'''
+A segment of fixed-width records made from a template
+'''
+
+COPYING = """\
+    Copyright 2014 Lauritz Vesteraas Thaulow
+
+    This file is part of the FakeLargeFile python package.
+
+    FakeLargeFile is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License version 3,
+    as published by the Free Software Foundation.
+
+    FakeLargeFile is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU General Affero Public License
+    along with FakeLargeFile.  If not, see <http://www.gnu.org/licenses/>.
+    """
+
+
+
+import re
+
+from fakelargefile.segment.abc import AbstractSegment, register_segment
+from fakelargefile.tools import Slice
+
+
+# A conversion specifier of the % operator
+SPECIFIER = re.compile(
+    r"%(?:\([^)]*\))?[-#0 +]*(\d*)(?:\.\d+)?[hlL]?([diouxXeEfFgGcrs%])")
+
+# The bytes which integer conversions can give
+FIELD_CHARS = {
+    "d": "0123456789 +-",
+    "i": "0123456789 +-",
+    "u": "0123456789 +-",
+    "o": "01234567 +-",
+    "x": "0123456789abcdef +-",
+    "X": "0123456789ABCDEF +-"}
+
+
+class RecordNumbers(object):
+    """
+    The default fields of a TemplateSegment: the record number in each.
+    """
+    def __init__(self, count):
+        """
+        :param int count: The number of fields.
+        """
+        self.count = count
+
+    def __call__(self, number):
+        return (number,) * self.count
+
+
+@register_segment
+class TemplateSegment(AbstractSegment):
+    """
+    A segment of records made by formatting a template with record numbers.
+
+    Record n is ``template % fields(n)``, and every record must have the
+    same size. That makes the record holding any byte a matter of
+    arithmetic, so any part of the segment can be made directly, and a
+    segment of billions of distinct records, like the lines of a log,
+    takes no memory::
+
+        TemplateSegment(0, "100G", "%012d INFO request %010d\\n")
+
+    Every conversion specifier must have a width, like ``%06d``, and the
+    values must fit in it, or a ValueError is raised when the record is
+    made. The text between the specifiers is then at the same place in
+    every record, and integer fields only hold digits, which lets
+    :py:meth:`index` rule out many strings without searching.
+
+    :py:mod:`fakelargefile.serialize` saves a TemplateSegment with the
+    default fields as its template. A fields function can't be stored, so
+    a TemplateSegment with one is saved as its bytes.
+    """
+    def __init__(self, start, stop, template, fields=None, offset=0):
+        """
+        Initialize a TemplateSegment instance.
+
+        :param int start: The start pos of the segment.
+        :param int stop: The stop pos of the segment.
+        :param str template: The template of each record.
+        :param fields: A function taking a record number and returning the
+            tuple of values for the template, or a mapping if the template
+            has mapping keys, like ``%(id)06d``. By default, every field is
+            the record number, which needs a template without mapping
+            keys.
+        :param int offset: The position in the sequence of records of the
+            first byte of the segment.
+
+        """
+        super(TemplateSegment, self).__init__(start, stop)
+        self.template = template
+        self.offset = offset
+        # The bytes each position of a record can have, or None for any
+        allowed = []
+        pos = field_count = 0
+        named = False
+        for match in SPECIFIER.finditer(template):
+            named = named or match.group().startswith("%(")
+            allowed.extend(template[pos:match.start()])
+            pos = match.end()
+            if match.group(2) == "%":
+                allowed.append("%")
+            elif not match.group(1):
+                raise ValueError(
+                    "The specifier {} has no width".format(match.group()))
+            else:
+                allowed.extend([FIELD_CHARS.get(match.group(2))] *
+                               int(match.group(1)))
+                field_count += 1
+        allowed.extend(template[pos:])
+        self.allowed = allowed
+        if fields is None:
+            if named:
+                raise ValueError(
+                    "The template {!r} has mapping keys, so it needs a "
+                    "fields function returning a mapping".format(template))
+            fields = RecordNumbers(field_count)
+        self.fields = fields
+        self.record_size = len(allowed)
+
+    def record(self, number):
+        """
+        Return record number as a string.
+        """
+        record = self.template % self.fields(number)
+        if len(record) != self.record_size:
+            raise ValueError(
+                "Record {} is {!r}, which is not {} bytes".format(
+                    number, record, self.record_size))
+        return record
+
+    def subsegment(self, start, stop):
+        sl = Slice(start, stop, self.start, self.stop)
+        if sl.size:
+            return type(self)(
+                sl.start, sl.stop, self.template, self.fields,
+                self.offset + sl.local_start)
+        else:
+            return None
+
+    @classmethod
+    def example(cls, start, stop):
+        return cls(start, stop, "2014-10-16T00:00:%06d INFO request %010d\n")
+
+    def copy(self, start=None):
+        if start is None:
+            start = self.start
+        return type(self)(
+            start, start + self.size, self.template, self.fields, self.offset)
+
+    def _may_contain(self, string):
+        """
+        Return True unless string is known to be missing from the records.
+
+        A match must agree with the bytes the records it overlaps can have,
+        at some position in the first one.
+        """
+        allowed = self.allowed
+        size = self.record_size
+        for first in xrange(size):
+            for i, char in enumerate(string):
+                chars = allowed[(first + i) % size]
+                if chars is not None and char not in chars:
+                    break
+            else:
+                return True
+        return False
+
+    def index(self, string, start=None, stop=None, end_pos=False):
+        if string and not self._may_contain(string):
+            raise ValueError("substring not found")
+        return self.chunked_index(string, start, stop, end_pos)
+
+    def source(self):
+        key = ("template", self.template, id(self.fields))
+        return key, self.offset, None
+
+    def substring(self, start, stop):
+        sl = Slice(start, stop, self.start, self.stop, clamp=False)
+        if sl.size == 0:
+            return ""
+        first = self.offset + sl.local_start
+        number = first // self.record_size
+        last = (self.offset + sl.local_stop - 1) // self.record_size
+        data = "".join(self.record(n) for n in xrange(number, last + 1))
+        skip = first - number * self.record_size
+        return data[skip:skip + sl.size]
+
+    def __str__(self):
+        return self.substring(self.start, self.stop)
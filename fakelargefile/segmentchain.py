@@ -23,13 +23,129 @@ COPYING = """\
     """
 
 from bisect import bisect
-from itertools import islice
+from collections import namedtuple
+import errno
+from itertools import imap, islice, izip
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import os
+import select
+import stat
+import struct
+import threading
+import time
+import zlib
 
 from fakelargefile.config import get_memory_limit
 from fakelargefile.errors import NoContainingSegment, MemoryLimitError
+from fakelargefile import chaindiff, crc, serialize
+from fakelargefile.searchcache import SearchCache
 from fakelargefile.tools import Slice
-from fakelargefile.segment import LiteralSegment, RepeatingSegment
-from fakelargefile.segmenttail import OverlapSearcher
+from fakelargefile.segment import (
+    HomogenousSegment, LiteralSegment, RepeatingSegment, GrowableSegment,
+    PatchedSegment, ChainViewSegment)
+from fakelargefile.segmenttail import OverlapSearcher, ReverseOverlapSearcher
+
+
+# The chain searched by parallel_finditer, set in each worker process by
+# _init_parallel_worker
+_parallel_chain = None
+
+# Held while parallel_finditer forks the workers of a pool
+_parallel_pool_lock = threading.Lock()
+
+
+def _init_parallel_worker(chain):
+    """
+    Set the chain searched by _parallel_finditer_worker in this process.
+
+    The initializer of the pools forked by SegmentChain.parallel_finditer.
+    """
+    global _parallel_chain
+    _parallel_chain = chain
+
+
+def _parallel_finditer_worker(args):
+    """
+    Return the start indices of matches starting between start and stop.
+
+    Runs in a worker process forked by SegmentChain.parallel_finditer.
+    """
+    string, start, stop, search_stop = args
+    ret = []
+    for index in _parallel_chain.finditer(string, start, search_stop):
+        if stop <= index:
+            break
+        ret.append(index)
+    return ret
+
+
+def _write_all(fd, data):
+    """
+    Write all of data to the file descriptor fd.
+    """
+    view = memoryview(data)
+    while len(view):
+        try:
+            view = view[os.write(fd, view):]
+        except OSError as e:
+            if e.errno != errno.EAGAIN:
+                raise
+            # A non-blocking fd is full, so wait for the reader to catch up
+            select.select([], [fd], [])
+
+
+def _write_pieces(fd, pieces):
+    """
+    Write the pieces to the file descriptor fd, in one call if possible.
+
+    Uses :py:func:`os.writev` where it is available. Elsewhere, several
+    pieces are joined into one buffer first, so small pieces don't cost a
+    system call each.
+    """
+    writev = getattr(os, "writev", None)
+    if writev is None:
+        if len(pieces) == 1:
+            _write_all(fd, pieces[0])
+        else:
+            data = bytearray()
+            for piece in pieces:
+                data += piece
+            _write_all(fd, data)
+        return
+    try:
+        written = writev(fd, pieces)
+    except OSError as e:
+        if e.errno != errno.EAGAIN:
+            raise
+        written = 0
+    for piece in pieces:
+        if written < len(piece):
+            _write_all(fd, memoryview(piece)[written:])
+            written = 0
+        else:
+            written -= len(piece)
+
+
+class PipeResult(namedtuple("PipeResult", ["size", "seconds"])):
+    """
+    The number of bytes written by :py:meth:`SegmentChain.pipe_to`, and
+    the seconds it took.
+    """
+    __slots__ = ()
+
+    @property
+    def throughput(self):
+        """
+        Return the number of bytes written per second.
+        """
+        if not self.seconds:
+            return float("inf")
+        return self.size / self.seconds
+
+
+# fcntl command to resize a pipe on Linux
+F_SETPIPE_SZ = 1031
 
 
 class SegmentChain(object):
@@ -39,7 +155,24 @@ class SegmentChain(object):
     The segments are always contiguous from the first to the last, and the
     first one always starts at 0.
     """
-    def __init__(self, segments=None, fill_gaps="\x00"):
+
+    min_partition_size = 16 * 1024 ** 2
+
+    max_growable_size = 16 * 1024 ** 2
+
+    max_patch_size = 4 * 1024
+
+    max_export_pieces = 1024
+
+    min_export_hole_size = 64 * 1024
+
+    gzip_block_size = 1024 ** 2
+
+    max_gzip_cache_size = 256
+
+    max_diff_compare_size = 1024 ** 2
+
+    def __init__(self, segments=None, fill_gaps="\x00", search_cache=False):
         """
         Initialize a SegmentChain.
 
@@ -51,12 +184,21 @@ class SegmentChain(object):
             using the given string. If the fill_gaps value evaluates to False,
             a ValueError will be raised instead if the segments are not
             contiguous.
+        :param bool search_cache: If True, remember the results of
+            :py:meth:`index` in a
+            :py:class:`fakelargefile.searchcache.SearchCache`, available as
+            self.search_cache. Edits invalidate only the results in or
+            after the edited region.
 
         """
         if segments is None:
             segments = []
         self.size = 0
         self.fill_gaps = fill_gaps
+        if search_cache:
+            self.search_cache = SearchCache()
+        else:
+            self.search_cache = None
         self.init_segments(segments)
 
     def update_size(self):
@@ -91,6 +233,67 @@ class SegmentChain(object):
         for seg in segments:
             self.overwrite(seg)
 
+    def seal(self):
+        """
+        Make the last segment immutable, if it is a GrowableSegment.
+
+        This is done before any change to the chain other than appending
+        with :py:meth:`append_literal`.
+        """
+        if self.segments and isinstance(self.segments[-1], GrowableSegment):
+            self.segments[-1] = self.segments[-1].seal()
+
+    def _own(self, segment):
+        """
+        Return the segment, or a sealed copy if it is a GrowableSegment.
+
+        A GrowableSegment is extended in place by the chain which made it,
+        so one coming from elsewhere, like from another chain, is sealed
+        before it is added, or the two chains would change each other.
+        """
+        if isinstance(segment, GrowableSegment):
+            return segment.seal()
+        return segment
+
+    def snapshot(self):
+        """
+        Return a SegmentChain with the current segments of this chain.
+
+        Segments are not changed once they are in a chain, so the snapshot
+        shares them, and it is not affected by later changes to this chain.
+        This takes time linear in the number of segments.
+        """
+        snapshot = SegmentChain(fill_gaps=self.fill_gaps)
+        snapshot.segments = list(self.segments)
+        snapshot.segment_start = list(self.segment_start)
+        if snapshot.segments and isinstance(
+                snapshot.segments[-1], GrowableSegment):
+            # The only segment which may change, by append_literal
+            snapshot.segments[-1] = snapshot.segments[-1].seal()
+        snapshot.update_size()
+        return snapshot
+
+    def view(self, start=None, stop=None):
+        """
+        Return a ChainViewSegment of a snapshot of this chain.
+
+        The view starts at position 0. Place copies of it in other chains
+        to reuse the bytes from start to stop there, at the cost of one
+        segment each::
+
+            header = header_chain.view()
+            for chain in chains:
+                chain.insert(header.copy(start=0))
+
+        :param int start: The position of the first byte of the view, 0 by
+            default.
+        :param int stop: The position after the last byte of the view,
+            self.size by default.
+
+        """
+        sl = Slice(start, stop, 0, self.size)
+        return ChainViewSegment(0, self.snapshot(), sl.start, sl.size)
+
     def segment_containing(self, pos):
         """
         Return an integer i such that self.segments[i] contains pos.
@@ -115,6 +318,21 @@ class SegmentChain(object):
         else:
             return islice(self.segments, start, None)
 
+    def segment_reverse_iter(self, pos):
+        """
+        Iterate backwards over self.segments from the segment ending at pos.
+
+        More precisely, start from the segment containing the byte just
+        before pos, or from the last segment if pos is beyond the end.
+        """
+        if pos <= 0:
+            return iter([])
+        try:
+            last = self.segment_containing(pos - 1)
+        except NoContainingSegment:
+            last = len(self.segments) - 1
+        return (self.segments[i] for i in xrange(last, -1, -1))
+
     def finditer(self, string, start=0, stop=None, end_pos=False):
         """
         Iterate over indices of occurences of string.
@@ -128,6 +346,8 @@ class SegmentChain(object):
             of the first byte after each match.
 
         """
+        if start is None:
+            start = 0
         pos = start
         if stop is None:
             stop = self.size
@@ -139,19 +359,13 @@ class SegmentChain(object):
             # the search string is split across segments
             for index in overlap.index_iter(seg, stop, end_pos):
                 yield index
-            if pos != start:
-                pos = overlap.pos
-            while True:
-                try:
-                    pos = seg.index(string, pos, stop, end_pos=end_pos)
-                except ValueError:
-                    overlap.append(seg)
-                    pos = seg.stop
-                    break
-                else:
+            pos = max(pos, overlap.pos)
+            for pos in seg.iter_index(string, pos, stop, end_pos=True):
+                if end_pos:
                     yield pos
-                    if not end_pos:
-                        pos += len(string)
+                else:
+                    yield pos - len(string)
+            overlap.append(seg, pos)
 
     def index(self, string, start=None, stop=None, end_pos=False):
         """
@@ -165,14 +379,212 @@ class SegmentChain(object):
         :param bool end_pos: If given, return the position following the end
             of the string, instead of the position of the start of the string.
         """
+        if self.search_cache is not None and string:
+            if start is None:
+                start = 0
+            if stop is None or self.size < stop:
+                stop = self.size
+            index = self.search_cache.index(self, string, start, stop)
+            if end_pos:
+                index += len(string)
+            return index
         for index in self.finditer(string, start, stop, end_pos):
             return index
         raise ValueError()
 
+    def partition(self, start, stop, count):
+        """
+        Split the range from start to stop in about count equal parts.
+
+        Cuts are moved to the nearest segment boundary if it is close, so
+        that most parts consist of whole segments.
+
+        :return: A list of (start, stop) tuples.
+        """
+        if stop <= start:
+            return []
+        tolerance = (stop - start) // (4 * count)
+        cuts = [start]
+        for i in xrange(1, count):
+            cut = start + i * (stop - start) // count
+            seg = self.segments[self.segment_containing(cut)]
+            boundary = min((seg.start, seg.stop), key=lambda x: abs(x - cut))
+            if abs(boundary - cut) <= tolerance:
+                cut = boundary
+            if cuts[-1] < cut < stop:
+                cuts.append(cut)
+        cuts.append(stop)
+        return zip(cuts[:-1], cuts[1:])
+
+    def parallel_finditer(
+            self, string, start=0, stop=None, end_pos=False, workers=None):
+        """
+        Iterate over indices of occurences of string, using many processes.
+
+        The range is partitioned, and the parts are searched in a pool of
+        worker processes, each part extended by ``len(string) - 1`` bytes so
+        that matches crossing the cuts are found. Each call forks a pool
+        whose workers are handed this chain by the pool initializer, so no
+        segments are pickled, and several searches may run at once from
+        different threads. The results are merged in order, and are the
+        same as those of :py:meth:`finditer`.
+
+        On platforms which can't fork, or if the range is smaller than
+        ``self.min_partition_size`` bytes, the search is done in this
+        process.
+
+        :param str string: The string to search for.
+        :param int start: Where to start searching. Default is 0.
+        :param int stop: Where to stop searching. If not given or None,
+            self.stop is used.
+        :param bool end_pos: If False, which is the default, yield the
+            indices of the start of the matches. If True, yield the indices
+            of the first byte after each match.
+        :param int workers: The number of worker processes. Defaults to the
+            number of CPUs.
+
+        """
+        if start is None:
+            start = 0
+        if stop is None or self.size < stop:
+            stop = self.size
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        count = min(
+            4 * workers, (stop - start) // self.min_partition_size)
+        if workers < 2 or count < 2 or not hasattr(os, "fork"):
+            for index in self.finditer(string, start, stop, end_pos):
+                yield index
+            return
+        parts = self.partition(start, stop, count)
+        tasks = [
+            (string, part_start, part_stop,
+             min(stop, part_stop + len(string) - 1))
+            for part_start, part_stop in parts]
+        # Forking from several threads at once could copy locks held by
+        # another thread into the workers
+        with _parallel_pool_lock:
+            pool = multiprocessing.Pool(
+                workers, _init_parallel_worker, (self,))
+        try:
+            last_stop = start
+            results = pool.imap(_parallel_finditer_worker, tasks)
+            for i, indices in enumerate(results):
+                part_stop = parts[i][1]
+                if indices and indices[0] < last_stop:
+                    # The part was searched from its start, but a match from
+                    # the previous part reaches into it, so search serially
+                    # until the matches agree again.
+                    indices = self._resync(
+                        string, last_stop, part_stop, stop, indices)
+                for index in indices:
+                    last_stop = index + len(string)
+                    if end_pos:
+                        yield last_stop
+                    else:
+                        yield index
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def _resync(self, string, start, part_stop, stop, indices):
+        """
+        Return the match indices from start to part_stop.
+
+        Search from start until a match is in indices, the matches of a
+        search from an earlier position, and use the rest of those from
+        there on.
+        """
+        remaining = dict((index, i) for i, index in enumerate(indices))
+        ret = []
+        for index in self.finditer(string, start, stop):
+            if part_stop <= index:
+                break
+            if index in remaining:
+                return ret + indices[remaining[index]:]
+            ret.append(index)
+        return ret
+
+    def rfinditer(self, string, start=0, stop=None, end_pos=False):
+        """
+        Iterate backwards over indices of occurences of string.
+
+        The search begins at stop and moves towards start, so the cost is
+        proportional to the distance scanned, not to the position of stop.
+
+        :param str string: The string to search for.
+        :param int start: Where to stop searching. Default is 0.
+        :param int stop: Where to start searching backwards from. If not
+            given or None, self.size is used.
+        :param bool end_pos: If False, which is the default, yield the
+            indices of the start of the matches. If True, yield the indices
+            of the first byte after each match.
+
+        """
+        if start is None:
+            start = 0
+        if stop is None or self.size < stop:
+            stop = self.size
+        pos = stop
+        overlap = ReverseOverlapSearcher(string)
+        for seg in self.segment_reverse_iter(stop):
+            if seg.stop <= start:
+                return
+            # Yield indices that would not be found in any segment because
+            # the search string is split across segments
+            for index in overlap.index_iter(seg, start, end_pos):
+                yield index
+            pos = min(pos, overlap.pos)
+            while True:
+                try:
+                    pos = seg.rindex(string, start, pos)
+                except ValueError:
+                    overlap.appendleft(seg, pos)
+                    break
+                else:
+                    if end_pos:
+                        yield pos + len(string)
+                    else:
+                        yield pos
+
+    def rindex(self, string, start=None, stop=None, end_pos=False):
+        """
+        Return the last index of the given string, raise ValueError if not
+        found.
+
+        :param str string: The string to find the last index of.
+        :param int start: The positon at which to stop searching, or None
+            to search all the way to the beginning.
+        :param int stop: The positon at which to start searching backwards,
+            or None to start at the end.
+        :param bool end_pos: If given, return the position following the end
+            of the string, instead of the position of the start of the string.
+        """
+        for index in self.rfinditer(string, start, stop, end_pos):
+            return index
+        raise ValueError()
+
+    def invalidate(self, start, stop, shift=0):
+        """
+        Report that the bytes from start to stop were replaced.
+
+        Forgets the affected cached search results, if there are any.
+
+        :param int start: The start of the replaced bytes.
+        :param int stop: The stop of the replaced bytes, equal to start for
+            an insertion.
+        :param int shift: How much the size of the chain changed.
+        """
+        if self.search_cache is not None:
+            self.search_cache.invalidate(start, stop, shift)
+
     def insert(self, segment):
         """
         Insert the segment, shift following bytes to the right.
         """
+        self.seal()
+        segment = self._own(segment)
+        self.invalidate(segment.start, segment.start, segment.size)
         try:
             first_affected = self.segment_containing(segment.start)
         except NoContainingSegment:
@@ -198,11 +610,88 @@ class SegmentChain(object):
                 seg.start for seg in altered]
             self.update_size()
 
+    def replace_all(self, old, new, start=0, stop=None):
+        """
+        Replace all non-overlapping occurences of old with new.
+
+        The occurences are the same as those found by :py:meth:`finditer`.
+        Each segment does its own replacements with its ``replace`` method,
+        so a RepeatingSegment whose occurences repeat periodically is
+        rewritten only once per period, into a new RepeatingSegment.
+        Occurences crossing segment boundaries are replaced one by one.
+
+        :param str old: The string to replace. Must be non-empty.
+        :param str new: The string to replace it with.
+        :param int start: Where to start replacing. Default is 0.
+        :param int stop: Where to stop replacing. If not given or None,
+            self.size is used.
+
+        """
+        if not old:
+            raise ValueError("The string to replace must be non-empty.")
+        if stop is None or self.size < stop:
+            stop = self.size
+        if stop <= start:
+            return
+        self.seal()
+        first_affected = self.segment_containing(start)
+        first = self.segments[first_affected]
+        replacement = []
+
+        def replacement_stop():
+            if replacement:
+                return replacement[-1].stop
+            else:
+                return first.start
+
+        def add(segment):
+            replacement.append(segment.copy(start=replacement_stop()))
+
+        def trim(size):
+            while size:
+                segment = replacement.pop()
+                if size < segment.size:
+                    replacement.append(
+                        segment.subsegment(None, segment.stop - size))
+                    size = 0
+                else:
+                    size -= segment.size
+
+        if first.start < start:
+            add(first.subsegment(None, start))
+        overlap = OverlapSearcher(old)
+        pos = start
+        for seg in islice(self.segments, first_affected, None):
+            if stop <= seg.start:
+                add(seg)
+                continue
+            for index in overlap.index_iter(seg, stop):
+                trim(seg.start - index)
+                if new:
+                    add(LiteralSegment(0, new))
+            pos = max(pos, overlap.pos)
+            end = pos
+            if pos < min(seg.stop, stop):
+                segments, end = seg.replace(old, new, pos, stop)
+                for segment in segments:
+                    add(segment)
+            if stop < seg.stop:
+                add(seg.subsegment(stop, None))
+            overlap.append(seg, end)
+        self.invalidate(start, stop, replacement_stop() - self.size)
+        self.segments[first_affected:] = replacement
+        self.segment_start[first_affected:] = [
+            seg.start for seg in replacement]
+        self.update_size()
+
     def insert_literal(self, start, string):
         """
         Convenience method for inserting a string at position ``start``
         """
-        self.insert(LiteralSegment(start, string))
+        if start == self.size:
+            self.append_literal(string)
+        else:
+            self.insert(LiteralSegment(start, string))
 
     def _delete(self, start, stop):
         """
@@ -254,6 +743,8 @@ class SegmentChain(object):
             ret = self[sl.slice]
         else:
             ret = None
+        self.seal()
+        self.invalidate(sl.start, sl.stop, -sl.size)
         start_idx, stop_idx, before, after = self._delete(sl.start, sl.stop)
         replacement = before[:]
         if after:
@@ -342,6 +833,11 @@ class SegmentChain(object):
             ret = self[segment.start:segment.stop]
         else:
             ret = None
+        self.seal()
+        segment = self._own(segment)
+        self.invalidate(segment.start, segment.stop)
+        if self._patch(segment):
+            return ret
         if segment.start < self.size:
             start_idx, stop_idx, before, after = self._delete(
                 segment.start, segment.stop)
@@ -356,10 +852,41 @@ class SegmentChain(object):
             self.append(segment)
         return ret
 
+    def _patch(self, segment):
+        """
+        Try to write a small segment as a patch on the segment containing it.
+
+        Writes of at most ``self.max_patch_size`` bytes which lie inside a
+        single larger segment are stored in a PatchedSegment wrapping it,
+        so that sparse writes don't split the chain into ever more segments.
+
+        :returns: True if the segment was written, False if the caller has
+            to do it.
+        """
+        if segment.size > self.max_patch_size:
+            return False
+        try:
+            index = self.segment_containing(segment.start)
+        except NoContainingSegment:
+            return False
+        target = self.segments[index]
+        if target.size <= self.max_patch_size or target.stop < segment.stop:
+            return False
+        if not isinstance(target, PatchedSegment):
+            target = PatchedSegment(target)
+        patched = target.patched(
+            segment.start, str(segment), self.max_patch_size)
+        if patched is None:
+            return False
+        self.segments[index] = patched
+        return True
+
     def append(self, segment):
         """
         Insert a segment which start where the last segment stops.
         """
+        self.seal()
+        segment = self._own(segment)
         if self.size == segment.start:
             self.segments.append(segment)
         else:
@@ -369,12 +896,392 @@ class SegmentChain(object):
 
     def append_literal(self, string):
         """
-        Append a LiteralSegment with the given string
+        Append the given string.
+
+        The string is added to a GrowableSegment at the end of the chain, in
+        amortized constant time, until that segment grows beyond
+        ``self.max_growable_size`` bytes.
         """
-        self.segments.append(LiteralSegment(self.size, string))
+        if self.segments and isinstance(self.segments[-1], GrowableSegment):
+            tail = self.segments[-1]
+            if tail.size + len(string) <= self.max_growable_size:
+                tail.extend(string)
+                self.update_size()
+                return
+            self.seal()
+        if len(string) < self.max_growable_size:
+            segment = GrowableSegment(self.size, string)
+        else:
+            segment = LiteralSegment(self.size, string)
+        self.segments.append(segment)
         self.segment_start.append(self.size)
         self.update_size()
 
+    def _part_iter(self, pos):
+        """
+        Iterate over the segments from the one containing pos, with
+        PatchedSegments split up into their parts.
+        """
+        for segment in self.segment_iter(pos):
+            if isinstance(segment, PatchedSegment):
+                for part in segment.iter_parts():
+                    if pos < part.stop:
+                        yield part
+            else:
+                yield segment
+
+    def next_data(self, pos):
+        """
+        Return the first position from pos which is not in a hole.
+
+        Holes are segments which contain only null bytes, according to
+        their
+        :py:meth:`~fakelargefile.segment.abc.AbstractSegment.is_null`
+        method, and the unpatched parts of PatchedSegments over such
+        segments. Return None if there is no data from pos to the end.
+        """
+        for segment in self._part_iter(pos):
+            if not segment.is_null():
+                return max(pos, segment.start)
+        return None
+
+    def next_hole(self, pos):
+        """
+        Return the first position from pos which is in a hole.
+
+        The end of the chain counts as a hole, like the end of a file does
+        for ``os.lseek`` with ``SEEK_HOLE``.
+        """
+        for segment in self._part_iter(pos):
+            if segment.is_null():
+                return max(pos, segment.start)
+        return max(pos, self.size)
+
+    def crc32(self, start=None, stop=None):
+        """
+        Return the CRC-32 of the bytes from start to stop.
+
+        The CRC-32 of each segment comes from its
+        :py:meth:`~fakelargefile.segment.abc.AbstractSegment.crc32` method,
+        and they are combined without reading the segments again. Repeating
+        and homogenous segments take time logarithmic in their size, so
+        this is fast even for huge chains of such segments.
+
+        :param int start: The index to start at, 0 by default.
+        :param int stop: The index to stop at, self.size by default.
+        :returns: The unsigned CRC-32, the same as
+            ``zlib.crc32(str(self)[start:stop]) & 0xffffffff``.
+
+        """
+        sl = Slice(start, stop, 0, self.size)
+        value = 0
+        for segment in self.segment_iter(sl.start):
+            if sl.stop <= segment.start:
+                break
+            size = min(sl.stop, segment.stop) - max(sl.start, segment.start)
+            value = crc.crc32_combine(
+                value, segment.crc32(sl.start, sl.stop), size)
+        return value
+
+    def export(self, path_or_fd, chunk_size=1024 ** 2):
+        """
+        Write the content of this chain to a real file.
+
+        The segments are written in pieces from their
+        :py:meth:`~fakelargefile.segment.abc.AbstractSegment.iter_chunks`
+        method, so memory use stays flat. Pieces smaller than chunk_size,
+        like small literal segments, are batched up to chunk_size bytes or
+        ``self.max_export_pieces`` pieces, and each batch is written with
+        one :py:func:`os.writev` call where the platform has it, or else
+        joined into one buffer and written with one :py:func:`os.write`
+        call.
+
+        If the target is a regular file, null segments of at least
+        ``self.min_export_hole_size`` bytes are skipped with a seek where
+        they lie beyond the current end of the file, which leaves holes in
+        file systems that support sparse files.
+
+        :param path_or_fd: The path of the file to create or truncate, or
+            an open file descriptor or file object to write to at its
+            current position.
+        :type path_or_fd: str, int or file
+        :param int chunk_size: The number of bytes to write per call.
+        :returns: The number of bytes written.
+
+        """
+        if isinstance(path_or_fd, basestring):
+            fd = os.open(path_or_fd, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                         0o666)
+        elif hasattr(path_or_fd, "fileno"):
+            path_or_fd.flush()
+            fd = path_or_fd.fileno()
+        else:
+            fd = path_or_fd
+        try:
+            file_stat = os.fstat(fd)
+            if stat.S_ISREG(file_stat.st_mode):
+                file_size = file_stat.st_size
+                offset = os.lseek(fd, 0, os.SEEK_CUR)
+            else:
+                file_size = offset = None
+            pieces = []
+            pending = 0
+            for segment in self._part_iter(0):
+                if (file_size is not None and segment.is_null() and
+                        self.min_export_hole_size <= segment.size):
+                    if pieces:
+                        _write_pieces(fd, pieces)
+                        pieces = []
+                        pending = 0
+                    # Bytes already in the file have to be overwritten
+                    hole_start = min(segment.stop, max(
+                        segment.start, file_size - offset))
+                    if segment.start < hole_start:
+                        for piece in segment.subsegment(
+                                None, hole_start).iter_chunks(chunk_size):
+                            _write_all(fd, piece)
+                    if hole_start < segment.stop:
+                        os.lseek(fd, segment.stop - hole_start, os.SEEK_CUR)
+                    continue
+                for piece in segment.iter_chunks(chunk_size):
+                    pieces.append(piece)
+                    pending += len(piece)
+                    if (chunk_size <= pending or
+                            self.max_export_pieces <= len(pieces)):
+                        _write_pieces(fd, pieces)
+                        pieces = []
+                        pending = 0
+            if pieces:
+                _write_pieces(fd, pieces)
+            if file_size is not None:
+                # A hole at the end needs the file to be extended
+                end = os.lseek(fd, 0, os.SEEK_CUR)
+                if os.fstat(fd).st_size < end:
+                    os.ftruncate(fd, end)
+        finally:
+            if isinstance(path_or_fd, basestring):
+                os.close(fd)
+        return self.size
+
+    def pipe_to(self, fd_or_popen, chunk_size=1024 ** 2):
+        """
+        Write the content of this chain to a pipe, like a process's stdin.
+
+        The chain is written with :py:meth:`export`, so repeating content
+        is written from the same prefilled buffer again and again. On
+        Linux, the pipe is first grown to hold chunk_size bytes if
+        possible, which means fewer context switches. The writes block
+        while the pipe is full, and if the pipe is non-blocking, it is
+        waited on with :py:func:`select.select`, so the reader sets the
+        pace without any busy looping.
+
+        If the reader exits early, the write fails with an OSError with
+        errno EPIPE.
+
+        :param fd_or_popen: A :py:class:`subprocess.Popen` whose stdin is
+            a pipe, which is closed when done so the process sees the end
+            of the file, or a file descriptor or file object to write to.
+        :param int chunk_size: The number of bytes to write per call.
+        :returns: A :py:class:`PipeResult` with the number of bytes written,
+            the seconds it took and the throughput in bytes per second.
+
+        """
+        if hasattr(fd_or_popen, "stdin"):
+            target = fd_or_popen.stdin
+        else:
+            target = fd_or_popen
+        if hasattr(target, "fileno"):
+            fd = target.fileno()
+        else:
+            fd = target
+        if stat.S_ISFIFO(os.fstat(fd).st_mode):
+            try:
+                import fcntl
+                fcntl.fcntl(fd, F_SETPIPE_SZ, chunk_size)
+            except (ImportError, IOError):
+                # Not Linux, or larger than the limit for unprivileged users
+                pass
+        start_time = time.time()
+        try:
+            size = self.export(target, chunk_size)
+        finally:
+            if target is not fd_or_popen:
+                target.close()
+        return PipeResult(size, time.time() - start_time)
+
+    def _gzip_block(self, start, stop, level, cache):
+        """
+        Return the raw deflate data and the CRC-32 of the bytes from start
+        to stop.
+
+        The data ends with a sync flush, or finishes the deflate stream if
+        stop is the end of the chain. Blocks lying within a single
+        repeating or homogenous segment are remembered in the cache, since
+        such segments often make up most of a fake file.
+        """
+        segment = self.segments[self.segment_containing(start)]
+        key = None
+        if stop <= segment.stop:
+            # This also finds the unpatched parts of PatchedSegments
+            segment = segment.subsegment(start, stop)
+            if isinstance(segment, HomogenousSegment):
+                key = (segment.char, stop - start, stop == self.size)
+            elif isinstance(segment, RepeatingSegment):
+                key = (segment.string, stop - start, stop == self.size)
+            if key in cache:
+                return cache[key]
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        data = []
+        value = 0
+        for segment in self.segment_iter(start):
+            if stop <= segment.start:
+                break
+            part_start = max(start, segment.start)
+            part_stop = min(stop, segment.stop)
+            value = crc.crc32_combine(
+                value, segment.crc32(part_start, part_stop),
+                part_stop - part_start)
+            # zlib releases the GIL while compressing
+            data.append(compressor.compress(
+                segment.substring(part_start, part_stop)))
+        if stop == self.size:
+            data.append(compressor.flush(zlib.Z_FINISH))
+        else:
+            data.append(compressor.flush(zlib.Z_SYNC_FLUSH))
+        result = "".join(data), value
+        if key is not None and len(cache) < self.max_gzip_cache_size:
+            cache[key] = result
+        return result
+
+    def export_gzip(self, path_or_fd, level=6, workers=None):
+        """
+        Write the content of this chain to a gzip file, using many threads.
+
+        Like pigz, the chain is cut into blocks of ``self.gzip_block_size``
+        bytes, which are compressed independently in a pool of threads.
+        Each block ends with a sync flush, so the blocks are written in
+        order as a single deflate stream, in a single gzip member. The
+        CRC-32s of the blocks are combined with
+        :py:func:`fakelargefile.crc.crc32_combine`.
+
+        Since zlib releases the GIL while compressing, the throughput
+        scales with the number of workers. Blocks inside repeating and
+        homogenous segments with the same content are only compressed once.
+
+        :param path_or_fd: The path of the file to create or truncate, or
+            an open file descriptor or file object to write to at its
+            current position.
+        :type path_or_fd: str, int or file
+        :param int level: The compression level, from 0 to 9.
+        :param int workers: The number of worker threads. Defaults to the
+            number of CPUs.
+        :returns: The number of compressed bytes written.
+
+        """
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        if isinstance(path_or_fd, basestring):
+            fd = os.open(path_or_fd, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                         0o666)
+        elif hasattr(path_or_fd, "fileno"):
+            path_or_fd.flush()
+            fd = path_or_fd.fileno()
+        else:
+            fd = path_or_fd
+        cache = {}
+
+        def compress(start):
+            return self._gzip_block(
+                start, min(self.size, start + self.gzip_block_size), level,
+                cache)
+
+        pool = None
+        try:
+            # Magic, deflate, no flags, no mtime, no extra flags, unknown OS
+            header = "\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+            _write_all(fd, header)
+            written = len(header)
+            starts = xrange(0, self.size, self.gzip_block_size)
+            if workers < 2 or len(starts) < 2:
+                blocks = imap(compress, starts)
+            else:
+                pool = ThreadPool(workers)
+                blocks = pool.imap(compress, starts)
+            value = 0
+            for start, (data, block_value) in izip(starts, blocks):
+                _write_all(fd, data)
+                written += len(data)
+                value = crc.crc32_combine(
+                    value, block_value,
+                    min(self.size, start + self.gzip_block_size) - start)
+            if not self.size:
+                data = zlib.compressobj(
+                    level, zlib.DEFLATED, -zlib.MAX_WBITS).flush()
+                _write_all(fd, data)
+                written += len(data)
+            trailer = struct.pack("<II", value, self.size & 0xffffffff)
+            _write_all(fd, trailer)
+            written += len(trailer)
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+            if isinstance(path_or_fd, basestring):
+                os.close(fd)
+        return written
+
+    def save(self, path):
+        """
+        Save the segments of this chain to a file.
+
+        The format is described in :py:mod:`fakelargefile.serialize`.
+        PatchedSegments and ChainViewSegments are saved as their parts.
+
+        :param str path: The path of the file.
+
+        """
+        serialize.dump(list(self._part_iter(0)), path)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """
+        Return a new chain with the segments saved by :py:meth:`save`.
+
+        Literal content is memory mapped from the file, and only read when
+        it is used.
+
+        :param str path: The path of the file.
+        :param kwargs: Passed on to the constructor.
+
+        """
+        chain = cls(**kwargs)
+        chain.segments = serialize.load(path)
+        chain.segment_start = [segment.start for segment in chain.segments]
+        chain.update_size()
+        return chain
+
+    def diff(self, other):
+        """
+        Return the changes that turn this chain into another one.
+
+        Segments which share their source of bytes, such as subsegments of
+        the same LiteralSegment or RepeatingSegments of the same pattern,
+        are compared without reading them, so diffing chains derived from
+        each other takes time linear in the number of segments. Elsewhere,
+        changes of at most max_diff_compare_size bytes on both sides are
+        compared byte by byte to trim their equal ends, but bytes in
+        segments of different sources are otherwise reported as changed
+        even if they happen to be equal.
+
+        :param SegmentChain other: The chain to compare with.
+        :returns: A list of (tag, start, stop, other_start, other_stop)
+            tuples, where tag is "insert", "delete" or "replace", like the
+            opcodes of :py:class:`difflib.SequenceMatcher` except that the
+            equal ranges are left out.
+
+        """
+        return chaindiff.diff(self, other, self.max_diff_compare_size)
+
     def __str__(self):
         """
         Return the entire file as a string.
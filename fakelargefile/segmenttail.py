@@ -1,5 +1,5 @@
 '''
-A FIFO queue of segments whose capacity is determined by the combined lenghts
+Searchers for matches which cross the boundaries between segments
 '''
 
 from __future__ import absolute_import, division
@@ -23,12 +23,33 @@ COPYING = """\
     """
 
 
-from collections import deque
+def failure_table(string):
+    """
+    Return the Knuth-Morris-Pratt failure table of string.
+
+    Item i of the table is the length of the longest proper prefix of
+    string[:i + 1] which is also a suffix of it.
+    """
+    table = [0] * len(string)
+    state = 0
+    for i in xrange(1, len(string)):
+        while state and string[i] != string[state]:
+            state = table[state - 1]
+        if string[i] == string[state]:
+            state += 1
+        table[i] = state
+    return table
 
 
 class OverlapSearcher(object):
     """
-    Remember consecutive segments and search across their boundaries.
+    Search across the boundaries of consecutive segments.
+
+    The searcher is a Knuth-Morris-Pratt automaton whose state is the length
+    of the longest prefix of the search string which the bytes seen so far
+    end with. The state is carried from one segment to the next, so every
+    byte near a boundary is examined only once, and no more than
+    ``len(string) - 1`` bytes of any segment are ever turned into a string.
     """
     def __init__(self, string):
         """
@@ -39,32 +60,63 @@ class OverlapSearcher(object):
         """
         self.string = string
         self.overlap_size = len(string) - 1
+        self.table = failure_table(string)
         self.clear()
         self.pos = None
 
     def clear(self):
         """
-        Clear all segment-related data.
+        Forget all bytes seen so far.
+        """
+        self.state = 0
+        self.fed_to = None
+
+    def feed(self, chars):
+        """
+        Advance the automaton over chars, return how many were consumed.
+
+        Stops early, right after a completed match, with self.state equal to
+        the length of the search string.
         """
-        self.segments = deque()
-        self.length = 0
+        string = self.string
+        table = self.table
+        state = self.state
+        for i, char in enumerate(chars):
+            while state and string[state] != char:
+                state = table[state - 1]
+            if string[state] == char:
+                state += 1
+                if state == len(string):
+                    self.state = state
+                    return i + 1
+        self.state = state
+        return len(chars)
 
-    def append(self, segment):
+    def append(self, segment, start=None):
         """
-        Add segment to one end and pop unneeded segments from the other end.
+        Advance the automaton to the end of segment.
+
+        :param AbstractSegment segment: The segment which begins where the
+            previously appended segment ends.
+        :param int start: Disregard the bytes before this position, for
+            example because they are part of an earlier match. The segments
+            appended before are then disregarded too.
+
         """
         if self.overlap_size == 0:
             return
-        overlap_start = segment.stop - self.overlap_size
-        if segment.start <= overlap_start:
-            self.clear()
-        else:
-            overlap_start = segment.start
-        tail_tip = segment.subsegment(overlap_start, segment.stop)
-        self.segments.append(tail_tip)
-        self.length += len(tail_tip)
-        while self.length - len([0]) > self.overlap_size:
-            self.length -= len(self.segments.popleft())
+        if start is None or start < segment.start:
+            start = segment.start
+        window_start = max(start, segment.stop - self.overlap_size)
+        # Only the last overlap_size bytes can be part of a partial match,
+        # so unless a shorter segment continues one, start from scratch.
+        if self.fed_to is None or self.fed_to < window_start:
+            self.state = 0
+            self.fed_to = window_start
+        self.feed(segment.substring(self.fed_to, segment.stop))
+        if self.state == len(self.string):
+            self.state = 0
+        self.fed_to = segment.stop
 
     def index_iter(self, next_segment, stop=None, end_pos=False):
         """
@@ -78,38 +130,135 @@ class OverlapSearcher(object):
             indices of the start of the matches. If True, yield the indices
             of the first byte after each match.
 
-        This method combines the last bytes of the segments appended up to
-        now with with the first bytes of next_segment given in the arguments,
-        and then yields the indices of all non-overlapping instances of the
-        search string it finds in this combined string.
+        This method continues the partial match left by the segments
+        appended up to now into the first bytes of next_segment, and yields
+        the index of the match if it is completed. Afterwards, self.pos is
+        the position from which searching within next_segment may continue.
 
         This method is guaranteed to *only* return matches which cross the
         boundary between the end of the previously appended segments and the
         start of next_segment. In other words, no matches wholly to the right
         *or* left of next_segment.start will be yielded.
         """
-        if self.overlap_size == 0:
-            return
+        if stop is None:
+            stop = next_segment.stop
         if stop <= next_segment.start:
             raise ValueError(
                 "The stop argument should be larger than next_segment.start.")
         self.pos = next_segment.start
-        left_overlap = "".join(map(str, self.segments))[-self.overlap_size:]
-        max_right_overlap = next_segment.start + self.overlap_size
-        right_overlap = next_segment.substring(
-            next_segment.start,
-            min(max_right_overlap, next_segment.stop, stop))
-        overlap_string = left_overlap + right_overlap
-        overlap_pos = 0
-        while True:
-            try:
-                overlap_pos = overlap_string.index(self.string, overlap_pos)
-            except ValueError:
+        if self.overlap_size == 0:
+            return
+        if self.fed_to != next_segment.start or self.state == 0:
+            self.clear()
+            return
+        head = next_segment.substring(next_segment.start, min(
+            next_segment.start + self.overlap_size, next_segment.stop, stop))
+        consumed = 0
+        for char in head:
+            consumed += self.feed(char)
+            if self.state <= consumed or self.state == len(self.string):
+                # Either a match, or a partial match not crossing the boundary
+                break
+        self.fed_to = next_segment.start + consumed
+        if self.state == len(self.string):
+            self.state = 0
+            self.pos = self.fed_to
+            if end_pos:
+                yield self.pos
+            else:
+                yield self.pos - len(self.string)
+
+
+class ReverseOverlapSearcher(OverlapSearcher):
+    """
+    Search across segment boundaries, moving from the end towards the start.
+
+    This is the mirror image of :py:class:`OverlapSearcher`. The automaton
+    searches for the reversed search string in the bytes seen so far, read
+    from right to left.
+    """
+    def __init__(self, string):
+        """
+        Initialize a ReverseOverlapSearcher instance.
+
+        :param str string: The string to search for.
+
+        """
+        super(ReverseOverlapSearcher, self).__init__(string[::-1])
+
+    def clear(self):
+        """
+        Forget all bytes seen so far.
+        """
+        self.state = 0
+        self.fed_from = None
+
+    def appendleft(self, segment, stop=None):
+        """
+        Advance the automaton backwards to the start of segment.
+
+        :param AbstractSegment segment: The segment which ends where the
+            previously added segment begins.
+        :param int stop: Disregard the bytes from this position on, for
+            example because they are part of an earlier match. The segments
+            added before are then disregarded too.
+
+        """
+        if self.overlap_size == 0:
+            return
+        if stop is None or segment.stop < stop:
+            stop = segment.stop
+        window_stop = min(stop, segment.start + self.overlap_size)
+        if self.fed_from is None or window_stop < self.fed_from:
+            self.state = 0
+            self.fed_from = window_stop
+        self.feed(segment.substring(segment.start, self.fed_from)[::-1])
+        if self.state == len(self.string):
+            self.state = 0
+        self.fed_from = segment.start
+
+    def index_iter(self, prev_segment, start=None, end_pos=False):
+        """
+        Yield indices of all non-overlapping locations of search string.
+
+        :param AbstractSegment prev_segment: The segment which ends where the
+            most recently added segment begins.
+        :param int start: Stop searching at this index. Matches beginning
+            before this position will not be yielded.
+        :param bool end_pos: If False, which is the default, yield the
+            indices of the start of the matches. If True, yield the indices
+            of the first byte after each match.
+
+        This is the mirror image of :py:meth:`OverlapSearcher.index_iter`.
+        Only matches which cross the boundary between the end of
+        prev_segment and the start of the segments added up to now are
+        yielded. Afterwards, self.pos is the position from which searching
+        backwards within prev_segment may continue.
+        """
+        if start is None:
+            start = prev_segment.start
+        if prev_segment.stop <= start:
+            raise ValueError(
+                "The start argument should be smaller than prev_segment.stop.")
+        self.pos = prev_segment.stop
+        if self.overlap_size == 0:
+            return
+        if self.fed_from != prev_segment.stop or self.state == 0:
+            self.clear()
+            return
+        tail = prev_segment.substring(max(
+            prev_segment.stop - self.overlap_size, prev_segment.start, start),
+            prev_segment.stop)
+        consumed = 0
+        for char in reversed(tail):
+            consumed += self.feed(char)
+            if self.state <= consumed or self.state == len(self.string):
                 break
+        self.fed_from = prev_segment.stop - consumed
+        if self.state == len(self.string):
+            self.state = 0
+            self.pos = self.fed_from
+            if end_pos:
+                yield self.pos + len(self.string)
             else:
-                pos = overlap_pos - len(left_overlap) + next_segment.start
-                self.pos = pos + len(self.string)
-                if end_pos:
-                    pos += len(self.string)
-                yield pos
-                overlap_pos += len(self.string)
+                yield self.pos
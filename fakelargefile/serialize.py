@@ -0,0 +1,402 @@
+'''
+Save and load lists of segments in a compact binary format
+
+The format starts with a fixed size header::
+
+    magic      4 bytes, "FLFC"
+    version    1 byte
+    offset     8 bytes, little endian: where the table starts
+
+It is followed by the payload section, the payloads one after the other.
+Payloads are written as the segments are encoded, so they are streamed
+from the segments rather than held in memory. Strings which occur several
+times, and payloads shared by several segments, such as the payload of
+subsegments of the same LiteralSegment, are stored only once.
+
+Last comes a table of unsigned LEB128 varints:
+
+- the number of segment types used, and the name of each as a length
+  followed by the bytes
+- the number of segments, and for each one its type as an index into the
+  list of names, its size, the number of fields and the fields
+- the number of payloads and the length of each
+
+On load, the file is memory mapped, and literal payloads are returned as
+:py:class:`fakelargefile.segment.FileBackedSegment` instances referring to
+it, so they are read from disk only when they are used.
+
+Custom segment types can take part with :py:func:`register_serializer`.
+Segments without a serializer are saved as their parts if they have an
+``iter_parts`` method, like
+:py:class:`~fakelargefile.segment.ChainViewSegment`, and otherwise as
+literal payloads. So are TemplateSegments with a custom fields function,
+which can't be stored.
+'''
+
+from __future__ import absolute_import, division
+
+COPYING = """\
+    Copyright 2014 Lauritz Vesteraas Thaulow
+
+    This file is part of the FakeLargeFile python package.
+
+    FakeLargeFile is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License version 3,
+    as published by the Free Software Foundation.
+
+    FakeLargeFile is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU General Affero Public License
+    along with FakeLargeFile.  If not, see <http://www.gnu.org/licenses/>.
+    """
+
+import os
+import struct
+
+from fakelargefile.segment.compressed import (
+    CompressedLiteralSegment, CompressedPayload)
+from fakelargefile.segment.filebacked import FileBackedSegment
+from fakelargefile.segment.growable import GrowableSegment
+from fakelargefile.segment.homogenous import HomogenousSegment
+from fakelargefile.segment.literal import LiteralSegment
+from fakelargefile.segment.pseudorandom import PseudoRandomSegment
+from fakelargefile.segment.repeating import RepeatingSegment
+from fakelargefile.segment.template import RecordNumbers, TemplateSegment
+
+
+MAGIC = "FLFC"
+
+VERSION = 1
+
+HEADER = struct.Struct("<4sBQ")
+
+# Segment type name -> (segment type, encode, decode)
+serializers = {}
+
+
+def register_serializer(segment_type, encode, decode):
+    """
+    Register how to save and load segments of the given type.
+
+    The name of the type is stored in the file to identify it, so it
+    should not change, and it must be unique among the registered types.
+
+    :param type segment_type: The segment type.
+    :param encode: A function ``encode(segment, add_payload)`` returning a
+        list of non-negative ints which describe the segment, apart from
+        its position, or None if the segment can't be described and
+        should be saved as a literal. Call ``add_payload(data, key=None)``
+        to store a string, or the bytes of a segment, in the payload
+        section; it returns the number of the payload. Data with the same
+        key is stored once. The key defaults to the string itself, or to
+        the identity of the segment.
+    :param decode: A function ``decode(start, stop, fields, payloads)``
+        returning a segment from the fields returned by encode. Call
+        ``payloads.string(number)`` to get a payload as a string, or
+        ``payloads.segment(start, number)`` to get it as a segment at the
+        given start position which reads it lazily.
+
+    """
+    serializers[segment_type.__name__] = (segment_type, encode, decode)
+
+
+def _encode_varints(numbers):
+    """
+    Return the numbers encoded as unsigned LEB128 varints.
+    """
+    ret = bytearray()
+    append = ret.append
+    for number in numbers:
+        while number > 0x7f:
+            append(0x80 | (number & 0x7f))
+            number >>= 7
+        append(number)
+    return ret
+
+
+def _decode_varints(data):
+    """
+    Return a list of the unsigned LEB128 varints in data.
+    """
+    ret = []
+    append = ret.append
+    number = shift = 0
+    for byte in bytearray(data):
+        if byte < 0x80:
+            append(number | (byte << shift))
+            number = shift = 0
+        else:
+            number |= (byte & 0x7f) << shift
+            shift += 7
+    return ret
+
+
+def _read_varint(data, pos):
+    """
+    Return the varint at pos in data, and the position after it.
+    """
+    number = shift = 0
+    while True:
+        byte = ord(data[pos])
+        pos += 1
+        number |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return number, pos
+        shift += 7
+
+
+class _Payloads(object):
+    """
+    The payloads of a loaded file, as passed to the decode functions.
+
+    Each payload is read or mapped only once, however many segments use it.
+    """
+    def __init__(self, mapped, offsets):
+        """
+        :param FileBackedSegment mapped: A segment mapping the whole file.
+        :param list offsets: The offset in the file of each payload, and of
+            the end of the last one.
+        """
+        self.mapped = mapped
+        self.offsets = offsets
+        self.strings = {}
+        self.segments = {}
+
+    def string(self, number):
+        """
+        Return payload number as a string.
+        """
+        if number not in self.strings:
+            self.strings[number] = self.mapped.substring(
+                self.offsets[number], self.offsets[number + 1])
+        return self.strings[number]
+
+    def segment(self, start, number):
+        """
+        Return payload number as a FileBackedSegment starting at start.
+        """
+        if number not in self.segments:
+            self.segments[number] = self.mapped.subsegment(
+                self.offsets[number], self.offsets[number + 1])
+        return self.segments[number].copy(start=start)
+
+
+def _expand(segments):
+    """
+    Iterate over the segments, with those which have no serializer but an
+    iter_parts method replaced by their parts, recursively.
+    """
+    for segment in segments:
+        if (type(segment).__name__ not in serializers and
+                hasattr(segment, "iter_parts")):
+            for part in _expand(segment.iter_parts()):
+                yield part
+        else:
+            yield segment
+
+
+def dump(segments, path):
+    """
+    Save the segments to a file.
+
+    The file is written under a temporary name and then renamed, so it is
+    safe to save segments which were loaded from the same path.
+
+    :param segments: Contiguous segments, starting at 0.
+    :param str path: The path of the file.
+
+    """
+    # The keys of the payloads may hold the ids of parts, so they are kept
+    # alive until the end
+    segments = list(_expand(segments))
+    type_names = []
+    type_numbers = {}
+    payload_sizes = []
+    payload_numbers = {}
+    records = []
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0))
+
+        def add_payload(data, key=None):
+            if key is None:
+                key = data if isinstance(data, str) else id(data)
+            if key not in payload_numbers:
+                payload_numbers[key] = len(payload_sizes)
+                payload_sizes.append(len(data))
+                if isinstance(data, str):
+                    f.write(data)
+                else:
+                    for chunk in data.iter_chunks(1024 ** 2):
+                        f.write(chunk)
+            return payload_numbers[key]
+
+        for segment in segments:
+            name = type(segment).__name__
+            fields = None
+            if name in serializers:
+                fields = serializers[name][1](segment, add_payload)
+            if fields is None:
+                # Saved as a literal and streamed from the segment itself
+                name = LiteralSegment.__name__
+                fields = [add_payload(segment)]
+            if name not in type_numbers:
+                type_numbers[name] = len(type_names)
+                type_names.append(name)
+            records.extend([type_numbers[name], segment.size, len(fields)])
+            records.extend(fields)
+
+        table = _encode_varints([len(type_names)])
+        for name in type_names:
+            table += _encode_varints([len(name)])
+            table += name
+        table += _encode_varints([len(segments)])
+        table += _encode_varints(records)
+        table += _encode_varints([len(payload_sizes)])
+        table += _encode_varints(payload_sizes)
+        table_offset = f.tell()
+        f.write(table)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, table_offset))
+    os.rename(tmp_path, path)
+
+
+def load(path):
+    """
+    Load segments saved with :py:func:`dump`.
+
+    :param str path: The path of the file.
+    :returns: A list of contiguous segments starting at 0.
+
+    """
+    mapped = FileBackedSegment(0, path)
+    if mapped.size < HEADER.size:
+        raise ValueError("{} is not a saved segment file".format(path))
+    magic, version, offset = HEADER.unpack(
+        mapped.substring(0, HEADER.size))
+    if magic != MAGIC:
+        raise ValueError("{} is not a saved segment file".format(path))
+    if version != VERSION:
+        raise ValueError(
+            "{} has format version {}, only {} is supported".format(
+                path, version, VERSION))
+    table = mapped.substring(offset, mapped.size)
+
+    # The type names are not varints, so they are parsed one at a time
+    type_count, pos = _read_varint(table, 0)
+    types = []
+    for _ in xrange(type_count):
+        length, pos = _read_varint(table, pos)
+        name = table[pos:pos + length]
+        pos += length
+        if name not in serializers:
+            raise ValueError("Unknown segment type {}".format(name))
+        types.append(serializers[name][2])
+
+    numbers = _decode_varints(table[pos:])
+    segment_count = numbers[0]
+    pos = 1
+    records = []
+    for _ in xrange(segment_count):
+        field_count = numbers[pos + 2]
+        records.append((numbers[pos], numbers[pos + 1],
+                        numbers[pos + 3:pos + 3 + field_count]))
+        pos += 3 + field_count
+    payload_count = numbers[pos]
+    offsets = [HEADER.size]
+    for length in numbers[pos + 1:pos + 1 + payload_count]:
+        offsets.append(offsets[-1] + length)
+    payloads = _Payloads(mapped, offsets)
+
+    segments = []
+    start = 0
+    for type_number, size, fields in records:
+        segments.append(
+            types[type_number](start, start + size, fields, payloads))
+        start += size
+    return segments
+
+
+def _encode_literal(segment, add_payload):
+    key = ("literal", id(segment.payload), segment.offset, segment.size)
+    return [add_payload(segment, key)]
+
+
+def _encode_growable(segment, add_payload):
+    return [add_payload(segment)]
+
+
+def _decode_literal(start, stop, fields, payloads):
+    return payloads.segment(start, fields[0])
+
+
+def _encode_repeating(segment, add_payload):
+    return [add_payload(segment.string)]
+
+
+def _decode_repeating(start, stop, fields, payloads):
+    return RepeatingSegment(start, stop, payloads.string(fields[0]))
+
+
+def _encode_homogenous(segment, add_payload):
+    return [ord(segment.char)]
+
+
+def _decode_homogenous(start, stop, fields, payloads):
+    return HomogenousSegment(start, stop, chr(fields[0]))
+
+
+def _encode_pseudorandom(segment, add_payload):
+    return [segment.seed, segment.offset]
+
+
+def _decode_pseudorandom(start, stop, fields, payloads):
+    return PseudoRandomSegment(start, stop, fields[0], fields[1])
+
+
+def _encode_compressed(segment, add_payload):
+    payload = segment.payload
+    block_size = payload.block_size
+    first = segment.offset // block_size
+    last = (segment.offset + segment.size - 1) // block_size
+    size = min(payload.size, (last + 1) * block_size) - first * block_size
+    fields = [block_size, segment.offset - first * block_size, size]
+    for number in xrange(first, last + 1):
+        fields.append(add_payload(
+            payload.blocks[number], ("compressed", id(payload), number)))
+    return fields
+
+
+def _decode_compressed(start, stop, fields, payloads):
+    payload = CompressedPayload.from_blocks(
+        [payloads.string(number) for number in fields[3:]],
+        fields[0], fields[2])
+    return CompressedLiteralSegment._view(
+        start, payload, fields[1], stop - start)
+
+
+def _encode_template(segment, add_payload):
+    if not isinstance(segment.fields, RecordNumbers):
+        return None
+    return [add_payload(segment.template), segment.offset]
+
+
+def _decode_template(start, stop, fields, payloads):
+    return TemplateSegment(
+        start, stop, payloads.string(fields[0]), offset=fields[1])
+
+
+register_serializer(LiteralSegment, _encode_literal, _decode_literal)
+register_serializer(GrowableSegment, _encode_growable, _decode_literal)
+register_serializer(RepeatingSegment, _encode_repeating, _decode_repeating)
+register_serializer(
+    HomogenousSegment, _encode_homogenous, _decode_homogenous)
+register_serializer(
+    PseudoRandomSegment, _encode_pseudorandom, _decode_pseudorandom)
+register_serializer(
+    CompressedLiteralSegment, _encode_compressed, _decode_compressed)
+register_serializer(TemplateSegment, _encode_template, _decode_template)
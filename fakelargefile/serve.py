@@ -0,0 +1,253 @@
+'''
+Serve segment chains over HTTP
+
+A :py:class:`ChainServer` serves one or more chains to HTTP/1.1 clients,
+with support for ``Range`` requests, including multiple ranges, and for
+conditional requests with ETags. Each client is handled in its own
+thread. Example::
+
+    from fakelargefile import FakeLargeFile, RepeatingSegment
+    from fakelargefile.serve import make_server
+
+    flf = FakeLargeFile([RepeatingSegment(0, "2T", "spam")])
+    server = make_server({"/spam": flf}, port=8000)
+    server.serve_forever()
+
+The chains must not change while they are served.
+'''
+
+from __future__ import absolute_import, division
+
+COPYING = """\
+    Copyright 2014 Lauritz Vesteraas Thaulow
+
+    This file is part of the FakeLargeFile python package.
+
+    FakeLargeFile is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License version 3,
+    as published by the Free Software Foundation.
+
+    FakeLargeFile is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU General Affero Public License
+    along with FakeLargeFile.  If not, see <http://www.gnu.org/licenses/>.
+    """
+
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+import logging
+from SocketServer import ThreadingMixIn
+import uuid
+
+
+log = logging.getLogger(__name__)
+
+
+def _parse_range(header, size):
+    """
+    Parse the value of a Range header.
+
+    :param str header: The header value, like "bytes=0-99,-100".
+    :param int size: The size of the chain.
+    :returns: A list of (start, stop) tuples of the satisfiable ranges,
+        which is empty if there are none, or None if the header is not a
+        valid byte range header and should be ignored.
+
+    """
+    unit, _, ranges = header.partition("=")
+    if unit.strip().lower() != "bytes":
+        return None
+    result = []
+    for spec in ranges.split(","):
+        first, dash, last = spec.strip().partition("-")
+        if not dash:
+            return None
+        try:
+            if not first:
+                # The last bytes of the chain
+                length = int(last)
+                if length < 0:
+                    return None
+                if length:
+                    result.append((max(0, size - length), size))
+                continue
+            start = int(first)
+            stop = int(last) + 1 if last else size
+        except ValueError:
+            return None
+        if start < 0 or (last and stop <= start):
+            return None
+        if start < size:
+            result.append((start, min(stop, size)))
+    return result
+
+
+class ChainRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handle GET and HEAD requests for the chains of a ChainServer.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    content_type = "application/octet-stream"
+
+    def do_HEAD(self):
+        self.send_chain(head=True)
+
+    def do_GET(self):
+        self.send_chain(head=False)
+
+    def send_chain(self, head):
+        """
+        Send the response for the chain at self.path.
+
+        :param bool head: Only send the headers, not the body.
+
+        """
+        path = self.path.split("?", 1)[0]
+        if path not in self.server.chains:
+            self.send_error(404)
+            return
+        chain = self.server.chains[path]
+        etag = self.server.etags[path]
+        size = chain.size
+
+        if_none_match = self.headers.get("If-None-Match", "")
+        if set([etag, "*"]) & set(
+                tag.strip() for tag in if_none_match.split(",")):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        ranges = None
+        if "Range" in self.headers and self.headers.get(
+                "If-Range", etag) == etag:
+            ranges = _parse_range(self.headers["Range"], size)
+            if (ranges is not None and
+                    len(ranges) > self.server.max_ranges):
+                ranges = None
+        if ranges == []:
+            self.send_response(416)
+            self.send_header("Content-Range", "bytes */{}".format(size))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if ranges is None:
+            self.send_response(200)
+            self.send_headers(etag, size)
+            self.send_header("Content-Type", self.content_type)
+            self.end_headers()
+            if not head:
+                self.send_bytes(chain, 0, size)
+        elif len(ranges) == 1:
+            start, stop = ranges[0]
+            self.send_response(206)
+            self.send_headers(etag, stop - start)
+            self.send_header("Content-Type", self.content_type)
+            self.send_header("Content-Range", "bytes {}-{}/{}".format(
+                start, stop - 1, size))
+            self.end_headers()
+            if not head:
+                self.send_bytes(chain, start, stop)
+        else:
+            boundary = uuid.uuid4().hex
+            part_headers = [
+                "--{}\r\nContent-Type: {}\r\n"
+                "Content-Range: bytes {}-{}/{}\r\n\r\n".format(
+                    boundary, self.content_type, start, stop - 1, size)
+                for start, stop in ranges]
+            end = "--{}--\r\n".format(boundary)
+            length = len(end) + sum(
+                len(part_header) + stop - start + 2
+                for part_header, (start, stop) in zip(part_headers, ranges))
+            self.send_response(206)
+            self.send_headers(etag, length)
+            self.send_header(
+                "Content-Type",
+                "multipart/byteranges; boundary={}".format(boundary))
+            self.end_headers()
+            if not head:
+                for part_header, (start, stop) in zip(part_headers, ranges):
+                    self.connection.sendall(part_header)
+                    self.send_bytes(chain, start, stop)
+                    self.connection.sendall("\r\n")
+                self.connection.sendall(end)
+
+    def send_headers(self, etag, length):
+        """
+        Send the headers common to all successful responses.
+        """
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(length))
+
+    def send_bytes(self, chain, start, stop):
+        """
+        Send the bytes of the chain from start to stop.
+
+        The bytes are sent in pieces from the
+        :py:meth:`~fakelargefile.segment.abc.AbstractSegment.iter_chunks`
+        method of each segment, so memory use stays flat, and repeating
+        segments are sent without building new strings.
+        """
+        chunk_size = self.server.chunk_size
+        for segment in chain._part_iter(start):
+            if stop <= segment.start:
+                break
+            part = segment.subsegment(start, stop)
+            for chunk in part.iter_chunks(chunk_size):
+                self.connection.sendall(chunk)
+
+    def log_message(self, format, *args):
+        log.info("%s - %s", self.address_string(), format % args)
+
+
+class ChainServer(ThreadingMixIn, HTTPServer):
+    """
+    An HTTP server for segment chains, with a thread per connection.
+    """
+
+    daemon_threads = True
+
+    max_ranges = 100
+
+    chunk_size = 256 * 1024
+
+    def __init__(self, address, chains,
+                 handler_class=ChainRequestHandler):
+        """
+        Initialize a ChainServer.
+
+        The ETag of each chain is made from its size and its CRC-32, which
+        is computed here. That is fast for repeating content, but reads
+        all literal content once.
+
+        :param tuple address: The (host, port) to listen on.
+        :param dict chains: Maps URL paths, like "/data.bin", to the
+            chains to serve there.
+        :param type handler_class: The request handler class.
+
+        """
+        HTTPServer.__init__(self, address, handler_class)
+        self.chains = dict(chains)
+        self.etags = dict(
+            (path, '"{:08x}-{:x}"'.format(chain.crc32(), chain.size))
+            for path, chain in self.chains.items())
+
+
+def make_server(chains, host="localhost", port=0):
+    """
+    Return a :py:class:`ChainServer` serving the chains.
+
+    Call its ``serve_forever`` method to start serving.
+
+    :param dict chains: Maps URL paths to the chains to serve there.
+    :param str host: The host to listen on.
+    :param int port: The port to listen on. By default, a free port is
+        picked, which is available as ``server.server_address[1]``.
+
+    """
+    return ChainServer((host, port), chains)
@@ -24,7 +24,10 @@ COPYING = """\
 import logging
 
 from fakelargefile.segment import (
-    segment_types, LiteralSegment, HomogenousSegment, RepeatingSegment)
+    segment_types, AbstractSegment, LiteralSegment, HomogenousSegment,
+    RepeatingSegment, GrowableSegment, PatchedSegment, FileBackedSegment,
+    PseudoRandomSegment, TemplateSegment, CompressedLiteralSegment,
+    ChainViewSegment)
 
 
 log = logging.getLogger(__name__)
@@ -32,7 +35,10 @@ log = logging.getLogger(__name__)
 
 def test_segment_types():
     assert set(segment_types) == set([
-        LiteralSegment, HomogenousSegment, RepeatingSegment])
+        LiteralSegment, HomogenousSegment, RepeatingSegment,
+        GrowableSegment, PatchedSegment, FileBackedSegment,
+        PseudoRandomSegment, TemplateSegment, CompressedLiteralSegment,
+        ChainViewSegment])
 
 
 def test_index_implementation():
@@ -57,6 +63,64 @@ def test_index_implementation():
             assert False
 
 
+def test_iter_index_implementation():
+    for segment_type in segment_types:
+        log.debug(segment_type)
+        segment = segment_type.example(start=3, stop=403)
+        content = str(segment)
+        for string in (content[0], content[5:7], content[10:30], "\x01"):
+            for args in ((), (10, 300), (3, 403, True)):
+                fasit = list(AbstractSegment.iter_index(
+                    segment, string, *args))
+                assert list(segment.iter_index(string, *args)) == fasit
+
+
+def test_replace_implementation():
+    for segment_type in segment_types:
+        log.debug(segment_type)
+        segment = segment_type.example(start=3, stop=403)
+        content = str(segment)
+        for old in (content[0], content[5:7], content[10:30], "\x01"):
+            for new in ("", "x", "xyz" * 20):
+                for start, stop in ((None, None), (10, 300)):
+                    segments, end = segment.replace(old, new, start, stop)
+                    sl = slice(
+                        (start or 3) - 3, (stop or 403) - 3)
+                    assert "".join(map(str, segments)) == \
+                        content[sl].replace(old, new)
+                    if segments:
+                        assert segments[0].start == (start or 3)
+                    for first, last in zip(segments, segments[1:]):
+                        assert first.stop == last.start
+                    pieces = content[sl].split(old)
+                    if len(pieces) == 1:
+                        assert end == (start or 3)
+                    else:
+                        assert end == (stop or 403) - len(pieces[-1])
+
+
+def test_rindex_implementation():
+    for segment_type in segment_types:
+        log.debug(segment_type)
+        segment = segment_type.example(start=3, stop=13)
+        content = str(segment)
+        assert segment.rindex(content[-1]) == segment.stop - 1
+        assert segment.rindex(content) == segment.start
+        assert segment.rindex(content[:-3], stop=10) == segment.start
+        assert segment.rindex(content[2:-3], 5, end_pos=True) == (
+            segment.start + content.rindex(content[2:-3], 2) + 5)
+        assert segment.rindex("", 4, 6) == 6
+        assert segment.rindex("", 4, 4) == 4
+        first_byte = content[0]
+        not_first_byte = chr((ord(first_byte) + 1) % 256)
+        try:
+            segment.rindex(not_first_byte, 0, 4)
+        except ValueError:
+            assert True
+        else:
+            assert False
+
+
 def test_copy_implementation():
     for segment_type in segment_types:
         log.debug(segment_type)
@@ -22,10 +22,12 @@ COPYING = """\
 
 
 import logging
+import zlib
 
 from mock import Mock, call
 
-from fakelargefile.segment import segment_types
+from fakelargefile.segment import (
+    segment_types, AbstractSegment, LiteralSegment)
 
 
 log = logging.getLogger(__name__)
@@ -188,3 +190,115 @@ def test_repr():
         fasit = "{}(start={}, stop={}, str={})".format(
             segment_type.__name__, 3, 5, seg_sample)
         assert repr(seg) == fasit
+
+
+def test_rindex_fallback():
+    for segment_type in segment_types:
+        log.debug(segment_type)
+        segment = segment_type.example(start=3, stop=1003)
+        segment.search_chunk_size = 10
+        content = str(segment)
+        for string in (content[-1], content[500:507], content[:20], ""):
+            fasit = 3 + content.rindex(string)
+            assert AbstractSegment.rindex(segment, string) == fasit
+            assert AbstractSegment.rindex(
+                segment, string, end_pos=True) == fasit + len(string)
+        for string in (content[599], content[500:507], content[100:120], ""):
+            fasit = 3 + content.rindex(string, 100, 600)
+            assert AbstractSegment.rindex(
+                segment, string, 103, 603) == fasit
+        absent = next(string for string in ("\x01", "\x01\x02\x03")
+                      if string not in content)
+        try:
+            AbstractSegment.rindex(segment, absent)
+        except ValueError:
+            assert True
+        else:
+            assert False
+
+
+def test_chunked_index():
+    for segment_type in segment_types:
+        log.debug(segment_type)
+        segment = segment_type.example(start=3, stop=1003)
+        segment.search_chunk_size = 10
+        content = str(segment)
+        for string in (content[-1], content[500:507], content[995:], ""):
+            fasit = 3 + content.index(string)
+            assert segment.chunked_index(string) == fasit
+            assert segment.chunked_index(
+                string, end_pos=True) == fasit + len(string)
+        for string in (content[100], content[500:507], content[580:600]):
+            fasit = 3 + content.index(string, 100, 600)
+            assert segment.chunked_index(string, 103, 603) == fasit
+        try:
+            segment.chunked_index(content[500:520], 504, 523)
+        except ValueError:
+            assert True
+        else:
+            assert False
+
+
+def test_iter_index_fallback():
+    for segment_type in segment_types:
+        log.debug(segment_type)
+        segment = segment_type.example(start=3, stop=203)
+        content = str(segment)
+        string = content[:2]
+        fasit = []
+        pos = 0
+        while True:
+            pos = content.find(string, pos)
+            if pos < 0:
+                break
+            fasit.append(pos + 3)
+            pos += 2
+        assert list(AbstractSegment.iter_index(segment, string)) == fasit
+        assert list(AbstractSegment.iter_index(
+            segment, string, end_pos=True)) == [x + 2 for x in fasit]
+
+
+def test_replace_fallback():
+    for segment_type in segment_types:
+        log.debug(segment_type)
+        segment = segment_type.example(start=3, stop=203)
+        content = str(segment)
+        old = content[10:12]
+        segments, end = AbstractSegment.replace(segment, old, "xyz", 5)
+        assert "".join(map(str, segments)) == content[2:].replace(old, "xyz")
+        assert end == 203 - len(content[2:].split(old)[-1])
+
+
+def test_iter_chunks():
+    for segment_type in segment_types:
+        log.debug(segment_type)
+        segment = segment_type.example(start=3, stop=1003)
+        content = str(segment)
+        for chunk_size in (1, 7, 100, 2000):
+            chunks = [str(bytearray(chunk))
+                      for chunk in segment.iter_chunks(chunk_size)]
+            assert "".join(chunks) == content
+
+
+def test_crc32():
+    for segment_type in segment_types:
+        log.debug(segment_type)
+        segment = segment_type.example(start=3, stop=1003)
+        content = str(segment)
+        assert segment.crc32() == zlib.crc32(content) & 0xffffffff
+        for start, stop in [(3, 4), (10, 900), (500, 1003), (7, 7)]:
+            expected = zlib.crc32(content[start - 3:stop - 3]) & 0xffffffff
+            assert segment.crc32(start, stop) == expected
+
+
+def test_source():
+    for segment_type in segment_types:
+        log.debug(segment_type)
+        segment = segment_type.example(start=3, stop=1003)
+        key, offset, period = segment.source()
+        assert hash(key) == hash(segment.source()[0])
+        assert offset >= 0
+        assert period is None or period > 0
+    segment = LiteralSegment(0, "abc")
+    assert AbstractSegment.source(segment) == (
+        ("segment", id(segment)), 0, None)
@@ -0,0 +1,83 @@
+'''
+Tests for the fakelargefile.segment.chainview submodule
+'''
+
+COPYING = """\
+    Copyright 2014 Lauritz Vesteraas Thaulow
+
+    This file is part of the FakeLargeFile python package.
+
+    FakeLargeFile is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License version 3,
+    as published by the Free Software Foundation.
+
+    FakeLargeFile is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU General Affero Public License
+    along with FakeLargeFile.  If not, see <http://www.gnu.org/licenses/>.
+    """
+
+
+
+from fakelargefile.segment import (
+    ChainViewSegment, HomogenousSegment, LiteralSegment, RepeatingSegment)
+from fakelargefile.segmentchain import SegmentChain
+
+
+def test_chain_view():
+    chain = SegmentChain([
+        LiteralSegment(0, "abcdefghij"),
+        RepeatingSegment(10, 30, "xyz"),
+        LiteralSegment(30, "0123456789")])
+    content = str(chain)
+    view = ChainViewSegment(100, chain, 5, 30)
+    assert view.size == 30
+    assert str(view) == content[5:35]
+    assert view.substring(103, 117) == content[8:22]
+    assert view.index("jx") == 104
+    assert view.index("jx", end_pos=True) == 106
+    assert view.rindex("xyz") == 120
+    assert list(view.iter_index("zx")) == [
+        index + 95 for index in xrange(12, 30, 3)]
+    assert "".join(str(bytearray(chunk))
+                   for chunk in view.iter_chunks(4)) == content[5:35]
+    assert view.crc32(102, 120) == ChainViewSegment(
+        0, chain, 7, 18).crc32()
+    try:
+        view.index("89")
+    except ValueError:
+        assert True
+    else:
+        assert False
+
+    sub = view.subsegment(110, 120).copy(start=0)
+    assert sub.chain is chain
+    assert sub.offset == 15
+    assert str(sub) == content[15:25]
+    assert [type(part) for part in view.iter_parts()] == [
+        LiteralSegment, RepeatingSegment, LiteralSegment]
+    assert [part.start for part in view.iter_parts()] == [100, 105, 125]
+    assert not view.is_null()
+
+    try:
+        ChainViewSegment(0, chain, 20, 30)
+    except ValueError:
+        assert True
+    else:
+        assert False
+
+
+def test_nested_chain_view():
+    inner = SegmentChain([
+        HomogenousSegment(0, 10, "\x00"), LiteralSegment(10, "spam")])
+    outer = SegmentChain([
+        ChainViewSegment(0, inner), ChainViewSegment(14, inner, 8)])
+    assert str(outer) == "\x00" * 10 + "spam" + "\x00\x00spam"
+    view = ChainViewSegment(0, outer, 12, 8)
+    assert str(view) == "am\x00\x00spam"
+    assert view.index("\x00s") == 3
+    assert ChainViewSegment(0, inner, 2, 6).is_null()
+    assert not ChainViewSegment(0, inner, 2, 9).is_null()
@@ -0,0 +1,93 @@
+'''
+Tests for the fakelargefile.segment.compressed submodule
+'''
+
+COPYING = """\
+    Copyright 2014 Lauritz Vesteraas Thaulow
+
+    This file is part of the FakeLargeFile python package.
+
+    FakeLargeFile is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License version 3,
+    as published by the Free Software Foundation.
+
+    FakeLargeFile is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU General Affero Public License
+    along with FakeLargeFile.  If not, see <http://www.gnu.org/licenses/>.
+    """
+
+
+
+import threading
+import zlib
+
+from fakelargefile.segment import CompressedLiteralSegment
+
+
+def test_compressed_literal():
+    content = "".join(str(i % 97) for i in xrange(2000))
+    cls = CompressedLiteralSegment(10, content, block_size=100)
+    assert cls.size == len(content)
+    assert len(cls.payload.blocks) == (len(content) + 99) // 100
+    assert str(cls) == content
+    assert cls.substring(15, 15) == ""
+    assert cls.substring(15, 30) == content[5:20]
+    assert cls.substring(105, 355) == content[95:345]
+    sub = cls.subsegment(205, 1000).copy(start=0)
+    assert sub.payload is cls.payload
+    assert sub.offset == 195
+    assert str(sub) == content[195:990]
+    assert sub.index(content[295:305]) == 100
+    assert cls.index(content[95:105]) == 105
+    assert cls.index(content[95:105], end_pos=True) == 115
+    assert cls.crc32() == zlib.crc32(content) & 0xffffffff
+    assert sub.crc32(5, 333) == zlib.crc32(content[200:528]) & 0xffffffff
+    try:
+        cls.index("x")
+    except ValueError:
+        assert True
+    else:
+        assert False
+
+
+def test_block_cache():
+    content = "".join(chr(i % 256) for i in xrange(1000))
+    cls = CompressedLiteralSegment(0, content, block_size=10)
+    payload = cls.payload
+    for pos in xrange(0, 1000, 10):
+        assert cls.substring(pos, pos + 1) == content[pos]
+    assert len(payload.cache) == payload.cache_size
+    assert sorted(payload.cache) == range(100 - payload.cache_size, 100)
+    # A cached block is moved to the end, and survives the next misses
+    cls.substring(925, 926)
+    cls.substring(0, 1)
+    assert 92 in payload.cache
+    assert 93 not in payload.cache
+
+
+def test_threaded_reads():
+    content = "".join(chr(i % 251) for i in xrange(200000))
+    cls = CompressedLiteralSegment(0, content, block_size=100)
+    errors = []
+
+    def read(seed):
+        try:
+            for i in xrange(2000):
+                pos = (seed * 7919 + i * 104729) % 199000
+                assert cls.substring(pos, pos + 1000) == content[
+                    pos:pos + 1000]
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=read, args=(seed,))
+               for seed in xrange(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(cls.payload.cache) <= cls.payload.cache_size
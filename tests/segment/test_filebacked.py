@@ -0,0 +1,69 @@
+'''
+Tests for the fakelargefile.segment.filebacked submodule
+'''
+
+COPYING = """\
+    Copyright 2014 Lauritz Vesteraas Thaulow
+
+    This file is part of the FakeLargeFile python package.
+
+    FakeLargeFile is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License version 3,
+    as published by the Free Software Foundation.
+
+    FakeLargeFile is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU General Affero Public License
+    along with FakeLargeFile.  If not, see <http://www.gnu.org/licenses/>.
+    """
+
+
+import logging
+import os
+import tempfile
+
+from fakelargefile.segment import FileBackedSegment
+from fakelargefile.segmentchain import SegmentChain
+
+
+log = logging.getLogger(__name__)
+
+
+def test_file_backed():
+    fd, path = tempfile.mkstemp()
+    try:
+        os.write(fd, "0123456789abcdefghij")
+        os.close(fd)
+        fbs = FileBackedSegment(100, path, offset=5, length=10)
+        assert fbs.start == 100
+        assert fbs.stop == 110
+        assert str(fbs) == "56789abcde"
+        assert fbs.substring(102, 105) == "789"
+        assert fbs.index("9a") == 104
+        assert fbs.rindex("e", end_pos=True) == 110
+        assert list(fbs.iter_index("8")) == [103]
+        try:
+            fbs.index("f")
+        except ValueError:
+            assert True
+        else:
+            assert False
+        sub = fbs.subsegment(103, 108).copy(start=0)
+        assert sub.map is fbs.map
+        assert sub.offset == 8
+        assert str(sub) == "89abc"
+        assert str(FileBackedSegment(0, path, offset=15)) == "fghij"
+        try:
+            FileBackedSegment(0, path, offset=15, length=6)
+        except ValueError:
+            assert True
+        else:
+            assert False
+        sc = SegmentChain([fbs.copy(start=0)])
+        sc.insert(FileBackedSegment(5, path, length=3))
+        assert str(sc) == "56789012abcde"
+    finally:
+        os.remove(path)
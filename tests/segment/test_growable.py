@@ -0,0 +1,54 @@
+'''
+Tests for the fakelargefile.segment.growable submodule
+'''
+
+COPYING = """\
+    Copyright 2014 Lauritz Vesteraas Thaulow
+
+    This file is part of the FakeLargeFile python package.
+
+    FakeLargeFile is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License version 3,
+    as published by the Free Software Foundation.
+
+    FakeLargeFile is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU General Affero Public License
+    along with FakeLargeFile.  If not, see <http://www.gnu.org/licenses/>.
+    """
+
+
+import logging
+
+from fakelargefile.segment import GrowableSegment, LiteralSegment
+
+
+log = logging.getLogger(__name__)
+
+
+def test_extend():
+    gs = GrowableSegment(start=17, string="abc")
+    gs.extend("def")
+    gs.extend("")
+    assert gs.start == 17
+    assert gs.stop == 23
+    assert gs.size == 6
+    assert str(gs) == "abcdef"
+    assert gs.index("cd") == 19
+    assert gs.rindex("c", end_pos=True) == 20
+
+
+def test_snapshots_are_immutable():
+    gs = GrowableSegment(start=17, string="abc")
+    cp = gs.copy(start=0)
+    sub = gs.subsegment(18, None)
+    sealed = gs.seal()
+    gs.extend("def")
+    for segment in (cp, sub, sealed):
+        assert type(segment) is LiteralSegment
+    assert str(cp) == str(sealed) == "abc"
+    assert str(sub) == "bc"
+    assert sealed.start == 17
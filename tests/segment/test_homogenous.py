@@ -37,19 +37,33 @@ def test_HomogenousSegment():
     assert str(hs) == "\x00" * 8
     assert hs.index("\x00", 9, 11, end_pos=True) == 10
     assert hs.index("\x00" * 2, 9, 11, end_pos=True) == 11
+    assert hs.rindex("\x00", 3, 9) == 8
+    assert hs.rindex("\x00" * 2, 4, 9, end_pos=True) == 9
     index_test_args = (
         ("ab", None, None), ("a", None, None), ("\x00", 9, 4),
         ("\x00" * 9, None, None))
     for tpl in index_test_args:
-        try:
-            hs.index(*tpl)
-        except ValueError:
-            assert True
-        else:
-            assert False
+        for method in (hs.index, hs.rindex):
+            try:
+                method(*tpl)
+            except ValueError:
+                assert True
+            else:
+                assert False
     try:
         HomogenousSegment(start=0, stop=8, char="aa")
     except ValueError:
         assert True
     else:
         assert False
+
+
+def test_replace():
+    hs = HomogenousSegment(start=3, stop=14, char="a")
+    segments, end = hs.replace("aa", "ba", 4)
+    assert "".join(map(str, segments)) == "ba" * 5
+    assert end == 14
+    segments, end = hs.replace("aaa", "a")
+    assert [str(x) for x in segments] == ["aaa", "aa"]
+    assert [type(x) for x in segments] == [HomogenousSegment] * 2
+    assert end == 12
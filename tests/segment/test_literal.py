@@ -41,3 +41,30 @@ def test_LiteralSegment():
         assert True
     else:
         assert False
+
+
+def test_shared_payload():
+    class SmallSharedSegment(LiteralSegment):
+        min_shared_size = 4
+
+    payload = "abcdefghij" * 10
+    ls = SmallSharedSegment(start=5, string=payload)
+    sub = ls.subsegment(15, 30)
+    assert sub.payload is payload
+    assert sub.offset == 10
+    assert str(sub) == payload[10:25]
+    assert sub.copy(start=0).payload is payload
+    assert sub.index("a") == 15
+    assert sub.index("j", end_pos=True) == 25
+    assert sub.rindex("a") == 25
+    assert sub.substring(28, 30) == "de"
+    assert list(sub.iter_index("cd")) == [17, 27]
+    try:
+        sub.index("fg", 22)
+    except ValueError:
+        assert True
+    else:
+        assert False
+    small = ls.subsegment(15, 18)
+    assert small.payload == "abc"
+    assert small.offset == 0
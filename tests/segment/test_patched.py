@@ -0,0 +1,111 @@
+'''
+Tests for the fakelargefile.segment.patched submodule
+'''
+
+COPYING = """\
+    Copyright 2014 Lauritz Vesteraas Thaulow
+
+    This file is part of the FakeLargeFile python package.
+
+    FakeLargeFile is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License version 3,
+    as published by the Free Software Foundation.
+
+    FakeLargeFile is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU General Affero Public License
+    along with FakeLargeFile.  If not, see <http://www.gnu.org/licenses/>.
+    """
+
+
+import logging
+import random
+
+from fakelargefile.segment import (
+    PatchedSegment, RepeatingSegment, LiteralSegment)
+
+
+log = logging.getLogger(__name__)
+
+
+def test_patched():
+    base = RepeatingSegment(10, 40, "abc")
+    seg = PatchedSegment(base, [(12, "XY"), (20, "Z")])
+    assert str(seg) == "abXYbcabcaZcabcabcabcabcabcabc"
+    assert seg.patch_starts == [12, 20]
+    seg = seg.patched(14, "W")
+    assert seg.patch_starts == [12, 20]
+    assert seg.patch_strings == ["XYW", "Z"]
+    seg = seg.patched(11, "VVVVVVVVV")
+    assert seg.patch_starts == [11]
+    assert seg.patch_strings == ["VVVVVVVVVZ"]
+    assert seg.patched(30, "1234", max_size=3) is None
+    try:
+        seg.patched(38, "123")
+    except ValueError:
+        assert True
+    else:
+        assert False
+
+
+def test_many_patches():
+    rand = random.Random(3)
+    base = RepeatingSegment(100, 2100, "abcdefg")
+    expected = bytearray(str(base))
+    seg = PatchedSegment(base)
+    versions = []
+    for i in xrange(2000):
+        start = rand.randrange(100, 2100)
+        string = "".join(rand.choice("XYZ") for _ in xrange(
+            rand.randrange(1, min(6, 2101 - start))))
+        seg = seg.patched(start, string)
+        expected[start - 100:start - 100 + len(string)] = string
+        if i % 500 == 0:
+            versions.append((seg, str(expected)))
+    assert str(seg) == str(expected)
+    starts = seg.patch_starts
+    strings = seg.patch_strings
+    assert starts == sorted(starts)
+    for i in xrange(1, len(starts)):
+        # Patches don't overlap or touch
+        assert starts[i - 1] + len(strings[i - 1]) < starts[i]
+    # Earlier versions are unchanged
+    for version, content in versions:
+        assert str(version) == content
+    assert str(seg.copy(start=0).subsegment(500, 1500)) == str(
+        expected[500:1500])
+    content = str(expected)
+    needle = content[1203:1207]
+    assert seg.index(needle, 1100) == 100 + content.index(needle, 1000)
+    assert seg.rindex(needle, 0, 1800) == 100 + content.rindex(
+        needle, 0, 1700)
+
+
+def test_search():
+    seg = PatchedSegment(
+        RepeatingSegment(0, 3000, "abc"), [(1000, "X"), (2000, "Y")])
+    assert seg.index("aX") == 999
+    assert seg.index("bca", 999) == 1003
+    assert seg.rindex("abc", 0, 2001) == 1995
+    assert seg.rindex("Xca") == 1000
+    assert seg.index("Xc") == 1000
+    assert list(seg.iter_index("Y", end_pos=True)) == [2001]
+    try:
+        seg.index("cXc")
+    except ValueError:
+        assert True
+    else:
+        assert False
+
+
+def test_subsegment():
+    seg = PatchedSegment(
+        LiteralSegment(0, "0123456789"), [(2, "ab"), (7, "c")])
+    sub = seg.subsegment(3, 9)
+    assert str(sub) == "b456c8"
+    assert sub.patch_starts == [3, 7]
+    assert type(seg.subsegment(4, 7)) is LiteralSegment
+    assert str(seg.copy(start=5).subsegment(7, 9)) == "ab"
@@ -0,0 +1,76 @@
+'''
+Tests for the fakelargefile.segment.pseudorandom submodule
+'''
+
+COPYING = """\
+    Copyright 2014 Lauritz Vesteraas Thaulow
+
+    This file is part of the FakeLargeFile python package.
+
+    FakeLargeFile is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License version 3,
+    as published by the Free Software Foundation.
+
+    FakeLargeFile is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU General Affero Public License
+    along with FakeLargeFile.  If not, see <http://www.gnu.org/licenses/>.
+    """
+
+
+
+import struct
+import zlib
+
+from fakelargefile.segment import PseudoRandomSegment
+from fakelargefile.segment.pseudorandom import (
+    _splitmix_numpy, _splitmix_python, numpy)
+
+
+def test_splitmix():
+    # The first outputs of the reference SplitMix64 seeded with 0
+    assert struct.unpack("<2Q", _splitmix_python(0, 0, 2)) == (
+        0xe220a8397b1dcdaf, 0x6e789e6aa1b965f4)
+    assert _splitmix_python(7, 5, 3) == _splitmix_python(7, 0, 8)[40:]
+    if numpy is not None:
+        for seed in (0, 7, 2 ** 64 - 1):
+            assert _splitmix_numpy(seed, 12345, 100) == _splitmix_python(
+                seed, 12345, 100)
+
+
+def test_pseudo_random():
+    prs = PseudoRandomSegment(10, 1010, seed=5)
+    content = str(prs)
+    assert len(content) == 1000
+    assert content == str(PseudoRandomSegment(0, 1000, seed=5))
+    assert content != str(PseudoRandomSegment(10, 1010, seed=6))
+    assert prs.substring(13, 31) == content[3:21]
+    sub = prs.subsegment(13, 500).copy(start=0)
+    assert sub.offset == 3
+    assert str(sub) == content[3:490]
+    assert prs.index(content[500:520]) == 510
+    assert prs.index(content[500:520], end_pos=True) == 530
+    try:
+        prs.index(content[500:520], 511)
+    except ValueError:
+        assert True
+    else:
+        assert False
+    try:
+        PseudoRandomSegment(0, 10, seed=-1)
+    except ValueError:
+        assert True
+    else:
+        assert False
+
+
+def test_pseudo_random_huge():
+    prs = PseudoRandomSegment(0, "1T", seed=1)
+    window = prs.substring(10 ** 12 - 100, 10 ** 12 - 50)
+    assert window == PseudoRandomSegment(
+        0, 1000, seed=1, offset=10 ** 12 - 100).substring(0, 50)
+    data = prs.substring(0, 64 * 1024)
+    assert len(zlib.compress(data, 9)) > len(data)
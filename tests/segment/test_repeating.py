@@ -24,6 +24,7 @@ COPYING = """\
 import logging
 
 from fakelargefile.segment import RepeatingSegment
+from fakelargefile.segmentchain import SegmentChain
 
 
 log = logging.getLogger(__name__)
@@ -39,6 +40,40 @@ def test_index():
     assert rs.index("cdab", 3) == 5
     assert rs.index("dabcdabcd", 3) == 6
     assert rs.index("cdab", 6) == 9
+    assert rs.index("abcd" * 5, 4, end_pos=True) == 27
+
+
+def test_iter_index():
+    rs = RepeatingSegment(start=3, stop=10 ** 12, string="aab")
+    matches = rs.iter_index("aba", 4)
+    assert [next(matches) for i in range(4)] == [4, 7, 10, 13]
+    rs = RepeatingSegment(start=3, stop=36, string="abcd")
+    assert list(rs.iter_index("dabcdab", end_pos=True)) == [13, 21, 29]
+    assert list(rs.iter_index("cdab", 6, 18)) == [9, 13]
+    assert list(rs.iter_index("x")) == []
+
+
+def test_replace():
+    rs = RepeatingSegment(start=0, stop=13 * 10 ** 10, string="<a>{{x}}</a>\n")
+    segments, end = rs.replace("{{x}}", "value", 1)
+    assert len(segments) < 10
+    assert sum(map(len, segments)) == rs.size - 1
+    assert end == rs.stop - len("</a>\n")
+    sc = SegmentChain([seg.copy(start=seg.start - 1) for seg in segments])
+    assert sc[:28] == "a>value</a>\n<a>value</a>\n<a>"
+    assert sc[-7:] == "ue</a>\n"
+    rs = RepeatingSegment(start=3, stop=103, string="ab")
+    segments, end = rs.replace("ab", "")
+    assert (segments, end) == ([], 103)
+
+
+def test_rindex():
+    rs = RepeatingSegment(start=3, stop=336, string="abcd")
+    assert rs.rindex("cdab") == 329
+    assert rs.rindex("dabcdabcd") == 326
+    assert rs.rindex("cdab", 3, 332) == 325
+    assert rs.rindex("bcdabcdabcdabcdab", end_pos=True) == 333
+    assert rs.rindex("cd", 3, 7) == 5
 
 
 def test_substring():
@@ -71,4 +106,11 @@ def test_empty_string_fails():
     else:
         assert False
 
-    
\ No newline at end of file
+    
+
+
+def test_source():
+    key, offset, period = RepeatingSegment(0, 100, "abcabc").source()
+    assert (key, offset, period) == (("periodic", "abc"), 0, 3)
+    assert RepeatingSegment(5, 100, "cab").source() == (key, 2, 3)
+    assert RepeatingSegment(0, 100, "cba").source()[0] != key
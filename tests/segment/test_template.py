@@ -0,0 +1,89 @@
+'''
+Tests for the fakelargefile.segment.template submodule
+'''
+
+COPYING = """\
+    Copyright 2014 Lauritz Vesteraas Thaulow
+
+    This file is part of the FakeLargeFile python package.
+
+    FakeLargeFile is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License version 3,
+    as published by the Free Software Foundation.
+
+    FakeLargeFile is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU General Affero Public License
+    along with FakeLargeFile.  If not, see <http://www.gnu.org/licenses/>.
+    """
+
+
+
+from mock import patch
+
+from fakelargefile.segment import TemplateSegment
+
+
+def test_template():
+    ts = TemplateSegment(10, 110, "%03d:%02x;\n", lambda n: (n, n % 256))
+    assert ts.record_size == 8
+    assert ts.record(42) == "042:2a;\n"
+    content = "".join(ts.record(n) for n in range(13))[:100]
+    assert str(ts) == content
+    assert ts.substring(13, 30) == content[3:20]
+    sub = ts.subsegment(13, 60).copy(start=0)
+    assert sub.offset == 3
+    assert str(sub) == content[3:50]
+    assert ts.index("07:") == 67
+    assert ts.index(";\n0", 20, end_pos=True) == 27
+    assert list(ts.iter_index(":0")) == range(13, 102, 8)
+
+
+def test_template_index_skips():
+    ts = TemplateSegment(0, "1T", "%012d INFO request %012d\n")
+    with patch.object(TemplateSegment, "substring") as substring:
+        for string in ("ERROR", "INFO 1", "\n\n", "request -a"):
+            try:
+                ts.index(string)
+            except ValueError:
+                assert True
+            else:
+                assert False
+        assert not substring.called
+    assert ts.index("request 000000000003") == 3 * 39 + 18
+    number = 10 ** 12 // 39 - 5
+    record = ts.substring(number * 39, number * 39 + 39)
+    assert record == "{0:012d} INFO request {0:012d}\n".format(number)
+
+
+def test_template_errors():
+    for template in ("%d\n", "%06d %s"):
+        try:
+            TemplateSegment(0, 10, template)
+        except ValueError:
+            assert True
+        else:
+            assert False
+    ts = TemplateSegment(0, 1000, "%02d%%\n")
+    assert ts.substring(0, 8) == "00%\n01%\n"
+    try:
+        ts.substring(400, 404)
+    except ValueError:
+        assert True
+    else:
+        assert False
+
+
+def test_template_mapping_keys():
+    try:
+        TemplateSegment(0, 100, "%(a)05d\n")
+    except ValueError:
+        assert True
+    else:
+        assert False
+    ts = TemplateSegment(
+        0, 100, "%(a)05d\n", fields=lambda number: {"a": number * 2})
+    assert ts.substring(0, 12) == "00000\n00002\n"
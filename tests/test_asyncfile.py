@@ -0,0 +1,97 @@
+'''
+Tests for the asyncfile submodule of FakeLargeFile.
+'''
+
+COPYING = """\
+    Copyright 2014 Lauritz Vesteraas Thaulow
+
+    This file is part of the FakeLargeFile python package.
+
+    FakeLargeFile is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License version 3,
+    as published by the Free Software Foundation.
+
+    FakeLargeFile is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU General Affero Public License
+    along with FakeLargeFile.  If not, see <http://www.gnu.org/licenses/>.
+    """
+
+
+
+from fakelargefile.asyncfile import AsyncFakeLargeFile
+from fakelargefile.errors import IncompleteReadError
+from fakelargefile.fakelargefile import FakeLargeFile
+from fakelargefile.segment import LiteralSegment, RepeatingSegment
+
+
+def make_file():
+    flf = FakeLargeFile([
+        LiteralSegment(0, "first line\nsecond\n"),
+        RepeatingSegment(18, 1018, "abcd"),
+        LiteralSegment(1018, "\nlast")])
+    return flf, str(flf)
+
+
+def test_read():
+    flf, content = make_file()
+    async_file = AsyncFakeLargeFile(flf, chunk_size=100)
+    pieces = list(async_file.read(250))
+    assert [len(piece) for piece in pieces] == [100, 100, 50]
+    assert "".join(pieces) == content[:250]
+    assert flf.tell() == 250
+    reader = async_file.read()
+    assert next(reader) == content[250:350]
+    assert flf.tell() == 350
+    assert "".join(reader) == content[350:]
+    assert async_file.at_eof()
+    assert list(async_file.read()) == []
+
+
+def test_readexactly():
+    flf, content = make_file()
+    async_file = AsyncFakeLargeFile(flf, chunk_size=100)
+    assert "".join(async_file.readexactly(1000)) == content[:1000]
+    try:
+        async_file.readexactly(24)
+    except IncompleteReadError as e:
+        assert e.partial == ""
+        assert e.expected == 24
+    else:
+        assert False
+    assert flf.tell() == 1000
+    assert "".join(async_file.readexactly(23)) == content[1000:]
+
+
+def test_readline():
+    flf, content = make_file()
+    async_file = AsyncFakeLargeFile(flf, chunk_size=100)
+    assert list(async_file.readline()) == ["first line\n"]
+    assert list(async_file.readline()) == ["second\n"]
+    pieces = list(async_file.readline())
+    assert len(pieces) == 11
+    assert "".join(pieces) == content[18:1019]
+    assert list(async_file.readline()) == ["last"]
+    assert list(async_file.readline()) == []
+    flf.seek(0)
+    assert list(async_file) == content.splitlines(True)
+
+
+def test_finditer():
+    flf, content = make_file()
+    async_file = AsyncFakeLargeFile(flf, chunk_size=100)
+    results = list(async_file.finditer("dab", 10))
+    indices = [index for index in results if index is not None]
+    assert indices == list(flf.finditer("dab", 10))
+    assert results.count(None) == 11
+    results = list(async_file.finditer("\nl", 0, None, end_pos=True))
+    assert [index for index in results if index is not None] == [1020]
+    results = list(async_file.finditer("ecdab", 0, 300))
+    assert results.count(None) == 3
+    flf = FakeLargeFile([RepeatingSegment(0, 1000, "aa")])
+    async_file = AsyncFakeLargeFile(flf, chunk_size=7)
+    results = list(async_file.finditer("aaa"))
+    assert [i for i in results if i is not None] == range(0, 997, 3)
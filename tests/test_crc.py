@@ -0,0 +1,56 @@
+'''
+Tests for the crc submodule of FakeLargeFile.
+'''
+
+COPYING = """\
+    Copyright 2014 Lauritz Vesteraas Thaulow
+
+    This file is part of the FakeLargeFile python package.
+
+    FakeLargeFile is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License version 3,
+    as published by the Free Software Foundation.
+
+    FakeLargeFile is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU General Affero Public License
+    along with FakeLargeFile.  If not, see <http://www.gnu.org/licenses/>.
+    """
+
+
+
+import random
+import zlib
+
+from fakelargefile.crc import crc32, crc32_combine, crc32_repeat
+
+
+def test_crc32():
+    assert crc32("") == 0
+    assert crc32("abc") == zlib.crc32("abc") & 0xffffffff
+    assert crc32("c", crc32("ab")) == crc32("abc")
+    assert crc32("\xff" * 100) > 0
+
+
+def test_crc32_combine():
+    rnd = random.Random(0)
+    for _ in range(50):
+        first, second = [
+            "".join(chr(rnd.randrange(256)) for _ in range(rnd.randrange(20)))
+            for _ in range(2)]
+        assert crc32_combine(
+            crc32(first), crc32(second), len(second)) == crc32(first + second)
+
+
+def test_crc32_repeat():
+    for string in ["a", "abc", "\x00\x01"]:
+        for count in [0, 1, 2, 3, 10, 1000]:
+            assert crc32_repeat(
+                crc32(string), len(string), count) == crc32(string * count)
+    huge = crc32_repeat(crc32("\x00"), 1, 2 ** 40)
+    assert huge == crc32_combine(
+        crc32_repeat(crc32("\x00"), 1, 2 ** 39),
+        crc32_repeat(crc32("\x00"), 1, 2 ** 39), 2 ** 39)
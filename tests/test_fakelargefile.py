@@ -21,7 +21,13 @@ COPYING = """\
     """
 
 
-from fakelargefile import FakeLargeFile, LiteralSegment
+import errno
+import os
+import tempfile
+
+from fakelargefile import (
+    FakeLargeFile, LiteralSegment, RepeatingSegment, HomogenousSegment,
+    SEEK_DATA, SEEK_HOLE)
 
 LS = LiteralSegment
 
@@ -33,10 +39,10 @@ def test___init__():
 
 def test_read():
     flf = FakeLargeFile()
-    flf.append_literal("a")
-    flf.append_literal("bc")
-    flf.append_literal("def")
-    flf.append_literal("ghij")
+    flf.append(LS(0, "a"))
+    flf.append(LS(0, "bc"))
+    flf.append(LS(0, "def"))
+    flf.append(LS(0, "ghij"))
     assert flf.read(1) == "a"
     assert flf.read(3) == "bcd"
     assert flf.read(5) == "efghi"
@@ -82,7 +88,7 @@ def test_readlines():
     flf = FakeLargeFile()
     conc_lines = "".join(lines)
     for start in range(0, len(conc_lines), 13):
-        flf.append_literal(conc_lines[start:start + 13])
+        flf.append(LS(0, conc_lines[start:start + 13]))
     assert flf.readlines() == lines
 
     for i in range(20, 40):  # @UnusedVariable
@@ -108,13 +114,42 @@ def test_seek():
     flf.seek(-4, 1)
     assert flf.read(4) == "five"
     try:
-        flf.seek(0, 3)
+        flf.seek(0, 5)
     except ValueError:
         assert True
     else:
         assert False
 
 
+def test_seek_data_and_hole():
+    flf = FakeLargeFile()
+    flf.append_literal("data")
+    flf.truncate(100)
+    flf.append(RepeatingSegment(100, 120, "ab"))
+    flf.append(HomogenousSegment(120, 130, "\x00"))
+    flf.seek(2, SEEK_DATA)
+    assert flf.tell() == 2
+    flf.seek(2, SEEK_HOLE)
+    assert flf.tell() == 4
+    flf.seek(4, SEEK_DATA)
+    assert flf.tell() == 100
+    flf.seek(110, SEEK_HOLE)
+    assert flf.tell() == 120
+    for offset, whence in (
+            (121, SEEK_DATA), (130, SEEK_HOLE), (-1, SEEK_DATA)):
+        try:
+            flf.seek(offset, whence)
+        except IOError as e:
+            assert e.errno == errno.ENXIO
+        else:
+            assert False
+    flf.overwrite(LiteralSegment(125, "x"))
+    flf.seek(121, SEEK_DATA)
+    assert flf.tell() == 125
+    flf.seek(126, SEEK_HOLE)
+    assert flf.tell() == 126
+
+
 def test_tell():
     flf = FakeLargeFile()
     flf.append_literal(
@@ -172,3 +207,101 @@ def test_writelines():
     flf.writelines(test_lines)
     assert flf.tell() == sum(map(len, test_lines))
     assert str(flf) == "here's\nsome\nlinesto\nwrite\n"
+
+
+def test_write_advances_pos():
+    flf = FakeLargeFile()
+    flf.write("abc")
+    flf.write("def")
+    assert flf.tell() == 6
+    assert str(flf) == "abcdef"
+
+
+def test_write_buffer():
+    flf = FakeLargeFile(write_buffer_size=100)
+    flf.append_literal("0123456789")
+    flf.seek(2)
+    for char in "abcdefghijkl":
+        flf.write(char)
+    assert flf.tell() == 14
+    assert len(flf.write_buffer) == 12
+    assert len(flf.segments) == 1
+    flf.flush()
+    assert flf.write_buffer == []
+    assert [str(seg) for seg in flf.segments] == ["01", "abcdefghijkl"]
+    flf.write("mn")
+    flf.seek(0)
+    assert flf.read(3) == "01a"
+    assert [str(seg) for seg in flf.segments] == ["01", "abcdefghijkl", "mn"]
+
+
+def test_write_buffer_flushes_before_use():
+    flf = FakeLargeFile(write_buffer_size=100)
+    flf.write("spam and ")
+    flf.write("eggs")
+    assert flf.index("eggs") == 9
+    flf.write(" and spam")
+    assert len(flf) == 22
+    flf.write("!")
+    assert flf[-6:] == " spam!"
+    flf.write("?")
+    flf.seek(5)
+    flf.write("or")
+    flf.write(" ")
+    assert str(flf) == "spam or  eggs and spam!?"
+
+
+def test_write_buffer_internals_do_not_flush():
+    flf = FakeLargeFile(write_buffer_size=100)
+    flf.append_literal("0123456789")
+    flf.write("ab")
+    assert flf.segment_containing(9) == 0
+    assert len(flf.write_buffer) == 1
+    assert flf.segment_iter(0).next().start == 0
+    assert len(flf.write_buffer) == 1
+    assert flf.rindex("b") == 1
+    assert flf.write_buffer == []
+
+
+def test_write_buffer_size():
+    flf = FakeLargeFile(write_buffer_size=4)
+    for char in "abcdefghij":
+        flf.write(char)
+    assert [str(seg) for seg in flf.segments] == ["abcdefgh"]
+    assert flf.write_buffer == ["i", "j"]
+
+
+def test_writelines_with_write_buffer():
+    flf = FakeLargeFile(write_buffer_size=1000)
+    flf.writelines(iter(["here's\n", "some\n", "lines"]))
+    assert flf.tell() == 17
+    flf.flush()
+    assert [str(seg) for seg in flf.segments] == ["here's\nsome\nlines"]
+
+
+def test_open_overlay():
+    fd, path = tempfile.mkstemp()
+    try:
+        os.write(fd, "line 1\nline 2\nline 3\n")
+        os.close(fd)
+        flf = FakeLargeFile.open_overlay(path)
+        assert flf.readline() == "line 1\n"
+        flf.insert_literal(0, "line 0\n")
+        flf.delete(14, 21)
+        flf.seek(0, 2)
+        flf.write("line 4\n")
+        flf.overwrite(LiteralSegment(5, "zero"))
+        assert str(flf) == "line zerone 1\nline 3\nline 4\n"
+        flf.truncate(4)
+        assert str(flf) == "line"
+        with open(path, "rb") as f:
+            assert f.read() == "line 1\nline 2\nline 3\n"
+        flf.export(path + ".out")
+        with open(path + ".out", "rb") as f:
+            assert f.read() == "line"
+        os.remove(path + ".out")
+        with open(path, "wb"):
+            pass
+        assert FakeLargeFile.open_overlay(path, write_buffer_size=10).size == 0
+    finally:
+        os.remove(path)
@@ -0,0 +1,88 @@
+'''
+Tests for the searchcache submodule of FakeLargeFile.
+'''
+
+COPYING = """\
+    Copyright 2014 Lauritz Vesteraas Thaulow
+
+    This file is part of the FakeLargeFile python package.
+
+    FakeLargeFile is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License version 3,
+    as published by the Free Software Foundation.
+
+    FakeLargeFile is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU General Affero Public License
+    along with FakeLargeFile.  If not, see <http://www.gnu.org/licenses/>.
+    """
+
+
+from mock import Mock
+
+from fakelargefile.searchcache import SearchCache
+from fakelargefile.segmentchain import SegmentChain
+from fakelargefile.segment.literal import LiteralSegment
+
+
+def test_index():
+    sc = SegmentChain(search_cache=True)
+    sc.append_literal("spam, spam, eggs and spam")
+    cache = sc.search_cache
+    assert sc.index("spam") == 0
+    assert sc.index("spam", 1) == 6
+    assert sc.index("spam", 7, end_pos=True) == 25
+    assert (cache.hits, cache.misses) == (0, 3)
+    assert sc.index("spam", 3) == 6
+    assert sc.index("spam", 12) == 21
+    assert (cache.hits, cache.misses) == (2, 3)
+    try:
+        sc.index("spam", 7, 24)
+    except ValueError:
+        assert True
+    else:
+        assert False
+    assert cache.hits == 3
+    assert cache.hit_rate == 0.5
+
+
+def test_index_does_not_search_covered_range():
+    sc = SegmentChain(search_cache=True)
+    sc.append_literal("abc" * 100)
+    assert sc.index("ca", 150) == 152
+    sc.finditer = Mock()
+    assert sc.index("ca", 151) == 152
+    assert sc.index("ca", 152, end_pos=True) == 154
+    assert not sc.finditer.called
+
+
+def test_invalidate():
+    cache = SearchCache()
+    cache.cover("abc", 0, 10, 3)
+    cache.cover("abc", 10, 20, 15)
+    cache.cover("abc", 30, 40, 33)
+    assert cache.entries["abc"] == ([0, 30], [20, 40], [3, 15, 33])
+    # Insert 5 bytes at position 14
+    cache.invalidate(14, 14, 5)
+    assert cache.entries["abc"] == ([0, 19, 35], [12, 25, 45], [3, 20, 38])
+    # Delete the bytes from 37 to 41
+    cache.invalidate(37, 41, -4)
+    assert cache.entries["abc"] == ([0, 19, 37], [12, 25, 41], [3, 20])
+
+
+def test_edits_keep_results_correct():
+    sc = SegmentChain(search_cache=True)
+    sc.append_literal("one two three two one")
+    assert sc.index("two", 5) == 14
+    sc.insert_literal(0, "zero ")
+    assert sc.index("two", 10) == 19
+    sc.overwrite(LiteralSegment(15, "two"))
+    assert sc.index("two", 10) == 15
+    sc.delete(0, 5)
+    assert sc.index("two", 5) == 10
+    assert sc.index("one", 5) == 18
+    sc.append_literal("two")
+    assert sc.index("two", 20) == 21
@@ -21,11 +21,23 @@ COPYING = """\
     """
 
 
-from mock import Mock
+import gzip
+import fcntl
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import zlib
+
+from mock import Mock, patch
 
 from fakelargefile.errors import NoContainingSegment
-from fakelargefile.segmentchain import SegmentChain
+from fakelargefile.segmentchain import SegmentChain, _write_pieces
+from fakelargefile.segment.growable import GrowableSegment
+from fakelargefile.segment.homogenous import HomogenousSegment
 from fakelargefile.segment.literal import LiteralSegment
+from fakelargefile.segment.repeating import RepeatingSegment
 
 LS = LiteralSegment
 
@@ -89,7 +101,7 @@ def test_finditer():
     strings = [
         "This is one segment. ", "This is another. ", "This is the last one."]
     for string in strings:
-        sc.append_literal(string)
+        sc.append(LS(0, string))
     concat = "".join(strings)
     fasit = []
     idx = 0
@@ -120,10 +132,10 @@ def test_finditer_across_segments():
         if chunk == "" or char == chunk[-1]:
             chunk += char
         else:
-            sc.append_literal(chunk)
+            sc.append(LS(0, chunk))
             control += chunk
             chunk = char
-    sc.append_literal(chunk)
+    sc.append(LS(0, chunk))
     control += chunk
     assert control == string
     assert list(sc.finditer("afa")) == [1, 16]
@@ -136,11 +148,142 @@ def test_finditer_across_segments():
 
 def test_finditer_overlap_bug():
     sc = SegmentChain()
-    sc.append_literal("a")
-    sc.append_literal("aa")
+    sc.append(LS(0, "a"))
+    sc.append(LS(0, "aa"))
     assert list(sc.finditer("aa")) == [0]
 
 
+def test_rfinditer():
+    sc = SegmentChain()
+    strings = [
+        "This is one segment. ", "This is another. ", "This is the last one."]
+    for string in strings:
+        sc.append(LS(0, string))
+    concat = "".join(strings)
+    fasit = list(reversed(list(sc.finditer("is"))))
+    assert list(sc.rfinditer("is")) == fasit
+    assert list(sc.rfinditer("is", 6, 40)) == [
+        x for x in fasit if 6 <= x and x + 2 <= 40]
+    assert list(sc.rfinditer("is", end_pos=True)) == [x + 2 for x in fasit]
+    ret = list(sc.rfinditer("This", stop=len(concat) - 1))
+    assert ret == [38, 21, 0]
+
+
+def test_rfinditer_across_segments():
+    sc = SegmentChain()
+    for chunk in ["aa", "f", "a", "ff", "a", "fff", "a", "fffff", "a", "f",
+                  "a", "ttt", "eee"]:
+        sc.append(LS(0, chunk))
+    string = str(sc)
+    for needle in ("afa", "fff", "ff", "f", "ffa", "aafaffa", "tte"):
+        fasit = []
+        pos = len(string)
+        while True:
+            try:
+                pos = string.rindex(needle, 0, pos)
+            except ValueError:
+                break
+            else:
+                fasit.append(pos)
+        assert list(sc.rfinditer(needle)) == fasit
+    assert list(sc.rfinditer("ff", 4, 14)) == [12, 8, 4]
+
+
+def test_rfinditer_overlap():
+    sc = SegmentChain()
+    sc.append(LS(0, "aa"))
+    sc.append(LS(0, "a"))
+    assert list(sc.rfinditer("aa")) == [1]
+
+
+def test_rindex():
+    sc = SegmentChain()
+    sc.append(LS(0, "There, "))
+    sc.append(LS(0, "it moved!"))
+    assert sc.rindex(" ") == 9
+    assert sc.rindex(" ", 0, 9) == 6
+    assert sc.rindex(", i", end_pos=True) == 8
+    try:
+        sc.rindex(" ", 0, 6)
+    except ValueError:
+        assert True
+    else:
+        assert False
+    try:
+        sc.rindex(" ", 10)
+    except ValueError:
+        assert True
+    else:
+        assert False
+
+
+def test_finditer_overlapping_matches():
+    sc = SegmentChain()
+    sc.append(LS(0, "aa"))
+    sc.append(LS(0, "a"))
+    assert list(sc.finditer("aa")) == [0]
+    sc.append(LS(0, "aa"))
+    assert list(sc.finditer("aa")) == [0, 2]
+
+
+def test_finditer_long_string_tiny_segments():
+    sc = SegmentChain()
+    string = "ab" * 50 + "c"
+    for char in string * 3:
+        sc.append(LS(0, char))
+    assert list(sc.finditer(string[1:])) == [1, 102, 203]
+    assert list(sc.rfinditer(string[:-1])) == [202, 101, 0]
+
+
+def test_partition():
+    sc = SegmentChain()
+    for size in (10, 3, 40, 7, 40):
+        sc.append(LS(0, "a" * size))
+    assert sc.partition(0, 100, 4) == [(0, 25), (25, 53), (53, 75), (75, 100)]
+    assert sc.partition(5, 15, 2) == [(5, 10), (10, 15)]
+    assert sc.partition(5, 5, 2) == []
+
+
+def test_parallel_finditer():
+    sc = SegmentChain()
+    sc.append_literal("abaaba" * 100)
+    sc.append(RepeatingSegment(0, 1000, "ab"))
+    sc.append_literal("aab" * 100)
+    sc.min_partition_size = 30
+    for string in ("aba", "a", "baab", "ab" * 10, "x"):
+        fasit = list(sc.finditer(string, 3, 1500))
+        assert list(sc.parallel_finditer(
+            string, 3, 1500, workers=3)) == fasit
+        fasit = list(sc.finditer(string, end_pos=True))
+        assert list(sc.parallel_finditer(
+            string, end_pos=True, workers=2)) == fasit
+    assert list(sc.parallel_finditer("aba", workers=1)) == list(
+        sc.finditer("aba"))
+    assert list(sc.parallel_finditer("aba", None, None, workers=3)) == list(
+        sc.finditer("aba", None, None))
+
+
+def test_parallel_finditer_threads():
+    chains = []
+    for pattern in ("ab", "aab", "aaab", "aaaab"):
+        sc = SegmentChain([RepeatingSegment(0, 3000, pattern)])
+        sc.min_partition_size = 30
+        chains.append(sc)
+    results = {}
+
+    def search(sc):
+        results[sc.segments[0].string] = list(
+            sc.parallel_finditer("ab", workers=2))
+
+    threads = [threading.Thread(target=search, args=(sc,)) for sc in chains]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for sc in chains:
+        assert results[sc.segments[0].string] == list(sc.finditer("ab"))
+
+
 def test_index():
     sc = SegmentChain()
     sc.insert_literal(0, "There, it moved!")
@@ -170,6 +313,25 @@ def test_insert_and_append():
     assert str(sc) == "aiaiai, caramba!\nb\nc\n"
 
 
+def test_append_literal_grows_tail():
+    sc = SegmentChain()
+    sc.append(LS(0, "header\n"))
+    for i in range(1000):
+        sc.append_literal("record {}\n".format(i))
+    assert len(sc.segments) == 2
+    assert type(sc.segments[-1]) is GrowableSegment
+    assert sc.size == len(str(sc))
+    assert sc.index("record 999\n") == sc.size - 11
+    sc.insert_literal(0, "x")
+    assert [type(seg) for seg in sc.segments] == [LS, LS, LS]
+    assert sc[:8] == "xheader\n"
+    sc.max_growable_size = 10
+    sc.append_literal("0123456789")
+    sc.append_literal("abc")
+    sc.append_literal("defgh")
+    assert [str(seg) for seg in sc.segments[-2:]] == ["0123456789", "abcdefgh"]
+
+
 def test_append_and___str__():
     sc = SegmentChain()
     sc.append(LS(0, "We've "))
@@ -200,8 +362,8 @@ No.
 
 def test_delete():
     sc = SegmentChain()
-    sc.append_literal("abcd")
-    sc.append_literal(" hijk.")
+    sc.append(LS(0, "abcd"))
+    sc.append(LS(0, " hijk."))
     sc.delete(11, 16)
     sc.delete(8, 14)
     assert sc.delete(2, 4, return_deleted=True) == "cd"
@@ -247,9 +409,9 @@ def test_deletelines():
 
 def test___getitem__():
     sc = SegmentChain()
-    sc.append_literal("abc")
-    sc.append_literal("defgh")
-    sc.append_literal("ijklmn")
+    sc.append(LS(0, "abc"))
+    sc.append(LS(0, "defgh"))
+    sc.append(LS(0, "ijklmn"))
     assert sc[::-1] == "nmlkjihgfedcba"
     assert sc[3:1] == ""
     assert sc[1:3:-1] == ""
@@ -258,6 +420,39 @@ def test___getitem__():
     assert sc[1::2] == "bdfhjln"
 
 
+def test_replace_all():
+    sc = SegmentChain()
+    sc.append(LS(0, "spam, sp"))
+    sc.append(LS(0, "am, eggs and spam"))
+    sc.replace_all("spam", "ham")
+    assert str(sc) == "ham, ham, eggs and ham"
+    sc.replace_all("ham", "spam", 3, 12)
+    assert str(sc) == "ham, spam, eggs and ham"
+    sc.replace_all("a", "")
+    assert str(sc) == "hm, spm, eggs nd hm"
+    assert sc.segment_start == [seg.start for seg in sc.segments]
+    sc.replace_all("hm, spm, eggs nd hm", "")
+    assert sc.segments == []
+    try:
+        sc.replace_all("", "a")
+    except ValueError:
+        assert True
+    else:
+        assert False
+
+
+def test_replace_all_repeating():
+    sc = SegmentChain()
+    sc.append_literal("<header>\n")
+    sc.append(RepeatingSegment(0, 13 * 10 ** 10, "<a>{{x}}</a>\n"))
+    sc.append_literal("<footer>\n")
+    sc.replace_all("{{x}}", "value")
+    assert len(sc.segments) < 10
+    assert sc.size == 18 + 13 * 10 ** 10
+    assert sc[:25] == "<header>\n<a>value</a>\n<a>"
+    assert sc[-20:] == "<a>value</a>\n<footer>\n"[-20:]
+
+
 def test_insert_literal():
     sc = SegmentChain()
     sc.append_literal("I came here for a good argument.")
@@ -283,3 +478,289 @@ def test_overwrite_return_deleted():
     sc = SegmentChain()
     sc.append_literal("Stalagmite")
     assert sc.overwrite(LiteralSegment(6, "k"), return_deleted=True) == "m"
+
+
+def test_overwrite_patches_large_segments():
+    sc = SegmentChain([RepeatingSegment(0, 100000, "abcd")])
+    for pos in range(10, 100000, 1000):
+        sc.overwrite(LiteralSegment(pos, "XY"))
+    assert len(sc.segments) == 1
+    assert sc[1008:1014] == "abXYab"
+    assert sc.index("XY", 500) == 1010
+    sc.overwrite(LiteralSegment(0, "a" * (sc.max_patch_size + 1)))
+    assert len(sc.segments) == 2
+    sc.max_patch_size = 4
+    sc.overwrite(LiteralSegment(50007, "QQQ"))
+    assert len(sc.segments) == 4
+    assert sc[50008:50012] == "QQXY"
+
+
+def test_export():
+    sc = SegmentChain([
+        LiteralSegment(0, "header\n"),
+        RepeatingSegment(7, 5000, "abc"),
+        HomogenousSegment(5000, 9000, "\x00")])
+    sc.overwrite(LiteralSegment(2000, "XYZ"))
+    for i in range(50):
+        sc.append_literal("line {}\n".format(i))
+    fd, path = tempfile.mkstemp()
+    try:
+        assert sc.export(path, chunk_size=256) == sc.size
+        with open(path, "rb") as f:
+            assert f.read() == str(sc)
+        os.write(fd, "prefix")
+        sc.export(fd, chunk_size=1000)
+        os.close(fd)
+        with open(path, "rb") as f:
+            assert f.read() == "prefix" + str(sc)
+    finally:
+        os.remove(path)
+
+
+def test_export_sparse():
+    sc = SegmentChain([
+        HomogenousSegment(0, 200000, "\x00"),
+        LiteralSegment(200000, "middle"),
+        RepeatingSegment(200006, 400000, "\x00\x00")])
+    sc.min_export_hole_size = 1000
+    sc.overwrite(LiteralSegment(300000, "patch"))
+    assert len(sc.segments) == 3
+    assert sc.next_data(200006) == 300000
+    assert sc.next_hole(300000) == 300005
+    assert sc.next_data(300005) is None
+    fd, path = tempfile.mkstemp()
+    try:
+        os.write(fd, "x" * 100)
+        os.lseek(fd, 50, os.SEEK_SET)
+        sc.export(fd)
+        assert os.fstat(fd).st_size == 400050
+        os.close(fd)
+        with open(path, "rb") as f:
+            assert f.read() == "x" * 50 + str(sc)
+        sc.export(path)
+        with open(path, "rb") as f:
+            assert f.read() == str(sc)
+    finally:
+        os.remove(path)
+
+
+def test_pipe_to():
+    sc = SegmentChain([
+        LiteralSegment(0, "header\n"),
+        RepeatingSegment(7, 3000000, "abc"),
+        HomogenousSegment(3000000, 4000000, "\x00")])
+    sc.overwrite(LiteralSegment(2000, "XYZ"))
+    process = subprocess.Popen(
+        [sys.executable, "-c",
+         "import sys, zlib; print zlib.crc32(sys.stdin.read()) & 0xffffffff"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    result = sc.pipe_to(process, chunk_size=64 * 1024)
+    assert process.stdin.closed
+    assert process.stdout.read() == "{}\n".format(sc.crc32())
+    assert process.wait() == 0
+    assert result.size == sc.size
+    assert result.throughput == sc.size / result.seconds
+
+    # A non-blocking pipe with a slow reader
+    read_fd, write_fd = os.pipe()
+    fcntl.fcntl(write_fd, fcntl.F_SETFL, os.O_NONBLOCK)
+    received = []
+
+    def reader():
+        while True:
+            data = os.read(read_fd, 10000)
+            if not data:
+                break
+            received.append(data)
+    thread = threading.Thread(target=reader)
+    thread.start()
+    assert sc.pipe_to(write_fd).size == sc.size
+    os.close(write_fd)
+    thread.join()
+    os.close(read_fd)
+    assert "".join(received) == str(sc)
+
+
+def test_write_pieces_partial_writev():
+    def writev(fd, pieces):
+        # Write at most 5 bytes, like a writev interrupted by a signal
+        data = "".join(str(bytearray(piece)) for piece in pieces)
+        return os.write(fd, data[:5])
+
+    fd, path = tempfile.mkstemp()
+    try:
+        with patch.object(os, "writev", writev, create=True):
+            _write_pieces(fd, ["abc", memoryview("defgh")[1:], "ij"])
+        os.close(fd)
+        with open(path, "rb") as f:
+            assert f.read() == "abcefghij"
+    finally:
+        os.remove(path)
+
+
+def test_write_pieces_without_writev():
+    fd, path = tempfile.mkstemp()
+    try:
+        # Without os.writev, the pieces are joined and written at once
+        with patch.object(os, "writev", None, create=True):
+            with patch.object(os, "write", wraps=os.write) as write:
+                _write_pieces(fd, ["abc", memoryview("defgh")[1:], "ij"])
+        assert write.call_count == 1
+        os.close(fd)
+        with open(path, "rb") as f:
+            assert f.read() == "abcefghij"
+    finally:
+        os.remove(path)
+
+
+def apply_diff(a, b, ops):
+    pos = 0
+    result = []
+    for tag, start, stop, other_start, other_stop in ops:
+        result.append(a[pos:start])
+        result.append(b[other_start:other_stop])
+        pos = stop
+    result.append(a[pos:])
+    return "".join(result)
+
+
+def test_diff():
+    head = "".join("head {}\n".format(i) for i in range(20000))
+    tail = "".join("tail {}\n".format(i) for i in range(40000))
+    rep = len(head)
+    mid = rep + 100000
+    a = SegmentChain([
+        LiteralSegment(0, head),
+        RepeatingSegment(rep, mid, "abc"),
+        LiteralSegment(mid, tail)])
+    b = SegmentChain(a.segments)
+    assert a.diff(b) == []
+    b.insert_literal(100, "new")
+    b.overwrite(LiteralSegment(rep + 50003, "XYZ"))
+    b.delete(mid + 100003, mid + 100303)
+    b.insert(RepeatingSegment(mid + 200000, mid + 200100, "cab"))
+    ops = [
+        ("insert", 100, 100, 100, 103),
+        ("replace", rep + 50000, rep + 50003, rep + 50003, rep + 50006),
+        ("delete", mid + 100000, mid + 100300, mid + 100003, mid + 100003),
+        ("insert", mid + 200297, mid + 200297, mid + 200000, mid + 200100)]
+    assert a.diff(b) == ops
+    assert apply_diff(str(a), str(b), ops) == str(b)
+    # Without comparing bytes, the copied start of the head differs
+    a.max_diff_compare_size = 0
+    with patch.object(LiteralSegment, "substring") as substring:
+        substring.side_effect = AssertionError("bytes were read")
+        assert a.diff(b) == [("replace", 0, 100, 0, 103)] + ops[1:]
+
+    c = SegmentChain([LiteralSegment(0, str(a))])
+    c.overwrite(LiteralSegment(10, "HEAD!"))
+    c.overwrite(LiteralSegment(mid, "TAIL"))
+    assert a.diff(c) == [("replace", 0, a.size, 0, c.size)]
+    a.max_diff_compare_size = a.size
+    assert a.diff(c) == [("replace", 10, mid + 4, 10, mid + 4)]
+    assert c.diff(c) == []
+
+
+def test_crc32():
+    sc = SegmentChain([
+        LiteralSegment(0, "header\n"),
+        RepeatingSegment(7, 50000, "abc"),
+        HomogenousSegment(50000, 90000, "\x00")])
+    sc.overwrite(LiteralSegment(2000, "XYZ"))
+    sc.append_literal("footer\n")
+    content = str(sc)
+    assert sc.crc32() == zlib.crc32(content) & 0xffffffff
+    for start, stop in [(0, 1), (3, 2002), (2001, 60000), (50000, 90007)]:
+        expected = zlib.crc32(content[start:stop]) & 0xffffffff
+        assert sc.crc32(start, stop) == expected
+    assert SegmentChain().crc32() == 0
+
+    huge = SegmentChain([
+        RepeatingSegment(0, "2G", "abc"),
+        HomogenousSegment("2G", "4G", "\x00")])
+    huge.overwrite(LiteralSegment(12345, "patch"))
+    # Checked against zlib.crc32 of the exported bytes
+    assert huge.crc32() == 2830809149
+
+
+def test_shared_growable_segment():
+    a = SegmentChain()
+    a.append_literal("hello ")
+    b = SegmentChain(a.segments)
+    b.append_literal("world")
+    assert a.segments[-1].stop == a.size == 6
+    a.append_literal("!")
+    assert str(a) == "hello !"
+    assert str(b) == "hello world"
+
+    c = SegmentChain()
+    c.append(a.segments[-1])
+    c.append_literal("Q")
+    d = SegmentChain()
+    d.insert(a.segments[-1])
+    e = SegmentChain()
+    e.overwrite(a.segments[-1])
+    a.append_literal("?")
+    assert str(a) == "hello !?"
+    assert str(c) == "hello !Q"
+    assert type(c.segments[0]) is LiteralSegment
+    assert str(d) == str(e) == "hello !"
+
+
+def test_view():
+    header = SegmentChain([
+        LiteralSegment(0, "header\n"),
+        RepeatingSegment(7, "1M", "abc")])
+    header.append_literal("end of header\n")
+    expected = str(header)
+    view = header.view()
+    assert view.size == header.size
+    # Later changes to the chain don't show in the view
+    header.append_literal("more")
+    header.overwrite(LiteralSegment(0, "HEADER"))
+    assert str(view) == expected
+    assert header.view(3, 20).substring(0, 17) == str(header)[3:20]
+
+    chains = []
+    for i in xrange(100):
+        chain = SegmentChain([LiteralSegment(0, "body {}\n".format(i))])
+        chain.insert(view.copy(start=0))
+        chains.append(chain)
+        assert len(chain.segments) == 2
+        assert chain[:view.size] == expected
+        assert chain.index("end of header\nbody") == view.size - 14
+    assert chains[0].diff(chains[1]) == [
+        ("replace", view.size + 5, view.size + 6,
+         view.size + 5, view.size + 6)]
+
+
+def test_export_gzip():
+    sc = SegmentChain([
+        LiteralSegment(0, "header\n" * 1000),
+        RepeatingSegment(7000, 300000, "abcdefg"),
+        HomogenousSegment(300000, 500000, "\x00")])
+    sc.overwrite(LiteralSegment(20000, "XYZ"))
+    for i in range(1000):
+        sc.append_literal("line {}\n".format(i))
+    sc.gzip_block_size = 10000
+    fd, path = tempfile.mkstemp()
+    try:
+        for workers in (1, 3):
+            size = sc.export_gzip(path, workers=workers)
+            with open(path, "rb") as f:
+                data = f.read()
+            assert size == len(data)
+            assert zlib.decompress(data, 16 + zlib.MAX_WBITS) == str(sc)
+        assert len(data) < 10000
+        SegmentChain().export_gzip(path)
+        with gzip.open(path, "rb") as f:
+            assert f.read() == ""
+        os.write(fd, "prefix")
+        sc.export_gzip(fd, level=1)
+        os.close(fd)
+        with open(path, "rb") as f:
+            assert f.read(6) == "prefix"
+            assert zlib.decompress(
+                f.read(), 16 + zlib.MAX_WBITS) == str(sc)
+    finally:
+        os.remove(path)
@@ -6,7 +6,9 @@ Created on Nov 10, 2014
 
 
 from mock import Mock
-from fakelargefile.segmenttail import OverlapSearcher
+from fakelargefile.segmenttail import (
+    OverlapSearcher, ReverseOverlapSearcher, failure_table)
+from fakelargefile.segment import LiteralSegment, RepeatingSegment
 
 
 def test_index_iter_stop():
@@ -19,3 +21,48 @@ def test_index_iter_stop():
         assert True
     else:
         assert False
+
+
+def test_failure_table():
+    assert failure_table("") == []
+    assert failure_table("abcd") == [0, 0, 0, 0]
+    assert failure_table("aabaaab") == [0, 1, 0, 1, 2, 2, 3]
+
+
+def test_index_iter_across_many_segments():
+    os = OverlapSearcher("abcdef")
+    for i, char in enumerate("xxabcd"):
+        os.append(LiteralSegment(i, char))
+    assert list(os.index_iter(LiteralSegment(6, "efab"), 10)) == [2]
+    assert os.pos == 8
+    assert list(os.index_iter(LiteralSegment(6, "efab"), 7)) == []
+
+
+def test_append_reads_only_the_tail():
+    os = OverlapSearcher("abc")
+    segment = RepeatingSegment(0, 10 ** 12, "xyzab")
+    segment.substring = Mock(wraps=segment.substring)
+    os.append(segment)
+    segment.substring.assert_called_once_with(segment.stop - 2, segment.stop)
+    assert list(os.index_iter(LiteralSegment(segment.stop, "cab"))) == [
+        segment.stop - 2]
+
+
+def test_reverse_index_iter_across_many_segments():
+    os = ReverseOverlapSearcher("abcdef")
+    for i, char in reversed(list(enumerate("cdefxx", 4))):
+        os.appendleft(LiteralSegment(i, char))
+    assert list(os.index_iter(LiteralSegment(0, "efab"))) == [2]
+    assert os.pos == 2
+
+
+def test_reverse_index_iter_start():
+    os = ReverseOverlapSearcher("asdf")
+    segment = Mock()
+    segment.stop = 11
+    try:
+        os.index_iter(segment, start=12).next()
+    except ValueError:
+        assert True
+    else:
+        assert False
@@ -0,0 +1,185 @@
+'''
+Tests for the serialize submodule of FakeLargeFile.
+'''
+
+COPYING = """\
+    Copyright 2014 Lauritz Vesteraas Thaulow
+
+    This file is part of the FakeLargeFile python package.
+
+    FakeLargeFile is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License version 3,
+    as published by the Free Software Foundation.
+
+    FakeLargeFile is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU General Affero Public License
+    along with FakeLargeFile.  If not, see <http://www.gnu.org/licenses/>.
+    """
+
+
+import os
+import tempfile
+
+from fakelargefile.fakelargefile import FakeLargeFile
+from fakelargefile.segment import (
+    AbstractSegment, ChainViewSegment, CompressedLiteralSegment,
+    FileBackedSegment, HomogenousSegment, LiteralSegment, RepeatingSegment,
+    TemplateSegment)
+from fakelargefile.segmentchain import SegmentChain
+from fakelargefile.serialize import (
+    dump, load, register_serializer, serializers,
+    _encode_varints, _decode_varints)
+
+
+def test_varints():
+    numbers = [0, 1, 127, 128, 300, 2 ** 40, 2 ** 64 + 5]
+    assert _decode_varints(_encode_varints(numbers)) == numbers
+    assert len(_encode_varints([127])) == 1
+    assert len(_encode_varints([128])) == 2
+
+
+def test_save_and_load():
+    fd, path = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        abc = LiteralSegment(0, "abc")
+        sc = SegmentChain([
+            abc,
+            RepeatingSegment(3, 100, "xy"),
+            abc.copy(start=100),
+            HomogenousSegment(103, 2 ** 40, "\x00")])
+        sc.append_literal("tail")
+        sc.overwrite(LiteralSegment(50, "patch"))
+        sc.save(path)
+        loaded = SegmentChain.load(path)
+        assert loaded.size == sc.size
+        assert loaded[:200] == sc[:200]
+        assert loaded[-10:] == sc[-10:]
+        assert loaded.segment_start == [seg.start for seg in loaded.segments]
+        types = [type(seg) for seg in loaded.segments]
+        assert types == [
+            FileBackedSegment, RepeatingSegment, FileBackedSegment,
+            RepeatingSegment, FileBackedSegment, HomogenousSegment,
+            FileBackedSegment]
+        # The two "abc" literals share a payload
+        assert loaded.segments[0].offset == loaded.segments[4].offset
+        # Saving over the file it was loaded from is safe
+        loaded.insert_literal(0, ">")
+        loaded.save(path)
+        flf = FakeLargeFile.load(path)
+        assert type(flf) is FakeLargeFile
+        assert flf.read(6) == ">abcxy"
+        assert flf.index("tail") == sc.size - 3
+    finally:
+        os.remove(path)
+
+
+def test_shared_payloads():
+    fd, path = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        literal = LiteralSegment(0, "x" * 300000)
+        segments = [literal.subsegment(0, 100000),
+                    literal.subsegment(0, 100000).copy(start=100000)]
+        dump(segments, path)
+        assert os.path.getsize(path) < 100100
+        loaded = load(path)
+        assert [str(segment) for segment in loaded] == [
+            str(segment) for segment in segments]
+    finally:
+        os.remove(path)
+
+
+def test_save_compressed_template_and_view():
+    fd, path = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        content = "".join("line {}\n".format(i) for i in xrange(100000))
+        compressed = CompressedLiteralSegment(0, content, block_size=1000)
+        sc = SegmentChain([compressed])
+        sc.insert(compressed.subsegment(5000, 6500).copy(start=0))
+        template = "%08d INFO %06d\n"
+        sc.append(TemplateSegment(sc.size, sc.size + 1000000, template))
+        sc.append(TemplateSegment(
+            sc.size, sc.size + 20, "%02d\n", lambda n: (n % 10,)))
+        header = SegmentChain([
+            LiteralSegment(0, "header\n"),
+            RepeatingSegment(7, "1G", "abc")]).view()
+        sc.insert(header.copy(start=0))
+        sc.append(header.copy(start=sc.size))
+        sc.save(path)
+        assert os.path.getsize(path) < len(content) // 2
+        loaded = SegmentChain.load(path)
+        assert loaded.size == sc.size
+        types = [type(segment) for segment in loaded.segments]
+        assert types == [
+            FileBackedSegment, RepeatingSegment, CompressedLiteralSegment,
+            CompressedLiteralSegment, TemplateSegment, FileBackedSegment,
+            FileBackedSegment, RepeatingSegment]
+        templates = header.size + 1500 + len(content)
+        for start, stop in [(0, 100), (header.size - 50, header.size + 1600),
+                            (templates - 100, templates + 200),
+                            (sc.size - header.size - 30,
+                             sc.size - header.size + 100),
+                            (sc.size - 100, sc.size)]:
+            assert loaded[start:stop] == sc[start:stop]
+        assert loaded.segments[4].template == template
+        assert loaded.segments[2].payload.blocks[0] == (
+            compressed.payload.blocks[5])
+    finally:
+        os.remove(path)
+
+
+def test_register_serializer():
+    class CounterSegment(AbstractSegment):
+        def __init__(self, start, stop, step):
+            super(CounterSegment, self).__init__(start, stop)
+            self.step = step
+
+        def substring(self, start, stop):
+            return "".join(chr(i * self.step % 256)
+                           for i in xrange(start, stop))
+
+        def __str__(self):
+            return self.substring(self.start, self.stop)
+
+        index = subsegment = example = copy = None
+
+    fd, path = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        segments = [CounterSegment(0, 1000, 3)]
+        dump(segments, path)
+        assert str(load(path)[0]) == str(segments[0])
+        register_serializer(
+            CounterSegment,
+            lambda segment, add_payload: [segment.step],
+            lambda start, stop, fields, payloads: CounterSegment(
+                start, stop, fields[0]))
+        dump(segments, path)
+        assert os.path.getsize(path) < 100
+        loaded, = load(path)
+        assert type(loaded) is CounterSegment
+        assert loaded.step == 3
+    finally:
+        del serializers["CounterSegment"]
+        os.remove(path)
+
+
+def test_load_invalid():
+    fd, path = tempfile.mkstemp()
+    try:
+        os.write(fd, "not a segment file")
+        os.close(fd)
+        try:
+            load(path)
+        except ValueError:
+            assert True
+        else:
+            assert False
+    finally:
+        os.remove(path)
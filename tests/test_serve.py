@@ -0,0 +1,120 @@
+'''
+Tests for the serve submodule of FakeLargeFile.
+'''
+
+COPYING = """\
+    Copyright 2014 Lauritz Vesteraas Thaulow
+
+    This file is part of the FakeLargeFile python package.
+
+    FakeLargeFile is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License version 3,
+    as published by the Free Software Foundation.
+
+    FakeLargeFile is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU General Affero Public License
+    along with FakeLargeFile.  If not, see <http://www.gnu.org/licenses/>.
+    """
+
+
+
+import httplib
+import threading
+
+from fakelargefile.segment import (
+    HomogenousSegment, LiteralSegment, RepeatingSegment)
+from fakelargefile.segmentchain import SegmentChain
+from fakelargefile.serve import make_server, _parse_range
+
+
+def test_parse_range():
+    assert _parse_range("bytes=0-9", 100) == [(0, 10)]
+    assert _parse_range("bytes=90-", 100) == [(90, 100)]
+    assert _parse_range("bytes=-10", 100) == [(90, 100)]
+    assert _parse_range("bytes=-1000", 100) == [(0, 100)]
+    assert _parse_range("bytes=5-1000", 100) == [(5, 100)]
+    assert _parse_range("bytes= 0-0, 2-3 ,-1", 100) == [
+        (0, 1), (2, 4), (99, 100)]
+    assert _parse_range("bytes=100-200", 100) == []
+    assert _parse_range("bytes=-0", 100) == []
+    for header in ["bytes=5-4", "bytes=a-b", "bytes=5", "lines=0-9", ""]:
+        assert _parse_range(header, 100) is None
+
+
+def request(server, method, path, headers=None):
+    connection = httplib.HTTPConnection(*server.server_address)
+    connection.request(method, path, headers=headers or {})
+    response = connection.getresponse()
+    body = response.read()
+    connection.close()
+    return response, body
+
+
+def test_serve():
+    chain = SegmentChain([
+        LiteralSegment(0, "header\n"),
+        RepeatingSegment(7, 500000, "abc"),
+        HomogenousSegment(500000, 600000, "\x00")])
+    chain.overwrite(LiteralSegment(1000, "XYZ"))
+    content = str(chain)
+    server = make_server({"/data": chain, "/empty": SegmentChain()})
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        response, body = request(server, "GET", "/data")
+        assert response.status == 200
+        assert body == content
+        etag = response.getheader("ETag")
+        assert response.getheader("Accept-Ranges") == "bytes"
+
+        response, body = request(server, "HEAD", "/data")
+        assert response.getheader("Content-Length") == str(len(content))
+        assert body == ""
+
+        response, body = request(
+            server, "GET", "/data", {"Range": "bytes=995-1004"})
+        assert response.status == 206
+        assert body == content[995:1005]
+        assert response.getheader("Content-Range") == "bytes 995-1004/600000"
+
+        response, body = request(
+            server, "GET", "/data", {"Range": "bytes=0-3,-5"})
+        assert response.status == 206
+        content_type = response.getheader("Content-Type")
+        assert content_type.startswith("multipart/byteranges; boundary=")
+        boundary = content_type.split("=", 1)[1]
+        parts = body.split("--{}".format(boundary))
+        assert parts[0] == "" and parts[-1] == "--\r\n"
+        assert parts[1].endswith("\r\n\r\nhead\r\n")
+        assert "Content-Range: bytes 0-3/600000" in parts[1]
+        assert parts[2].endswith("\r\n\r\n\x00\x00\x00\x00\x00\r\n")
+
+        response, body = request(
+            server, "GET", "/data", {"Range": "bytes=600000-"})
+        assert response.status == 416
+        assert response.getheader("Content-Range") == "bytes */600000"
+
+        response, body = request(
+            server, "GET", "/data", {"Range": "bytes=0-3", "If-Range": '"x"'})
+        assert response.status == 200
+        assert body == content
+
+        response, body = request(
+            server, "GET", "/data", {"If-None-Match": etag})
+        assert response.status == 304
+
+        response, body = request(server, "GET", "/empty")
+        assert response.status == 200
+        assert body == ""
+        assert response.getheader("ETag") != etag
+
+        response, body = request(server, "GET", "/missing")
+        assert response.status == 404
+    finally:
+        server.shutdown()
+        server.server_close()